@@ -1,4 +1,30 @@
 from django.contrib import admin
-from .models import Store
+from .models import Job, OpeningInterval, Store
 
-admin.site.register(Store)
+
+class OpeningIntervalInline(admin.TabularInline):
+    model = OpeningInterval
+    fields = ['weekday', 'opens', 'closes']
+    readonly_fields = fields
+    can_delete = False
+    extra = 0
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Store)
+class StoreAdmin(admin.ModelAdmin):
+    inlines = [OpeningIntervalInline]
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'kind', 'status', 'progress', 'total', 'created_at', 'finished_at']
+    list_filter = ['status', 'kind']
+    exclude = ['params']
+    readonly_fields = ['kind', 'progress', 'total', 'result', 'error', 'attempts', 'worker', 'created_by',
+                       'created_at', 'started_at', 'heartbeat_at', 'finished_at']
+
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,11 @@
+from django.apps import AppConfig, apps
+
+
+class StoreApiConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'store_api'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        if apps.is_installed('drf_spectacular'):
+            from . import schema  # noqa: F401
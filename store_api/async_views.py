@@ -0,0 +1,184 @@
+import math
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Count, Max
+from django.http import Http404, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.utils.translation import gettext_lazy as _
+from django.views import View
+from rest_framework import exceptions
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from .authentication import StoreJWTAuthentication
+from .conditional import make_etag, timestamp
+from .fuzzy import StoreFuzzyFilter
+from .geo import StoreGeoFilter
+from .metrics import timer
+from .models import Store
+from .multiget import get_requested_ids, lookup_results
+from .opening_hours import OpeningHoursFilter, get_opening_moment
+from .search import StoreSearchFilter
+from .renderers import StoreJSONRenderer
+from .serializers import StoreSerializer
+from .sparse import get_requested_fields
+
+
+async def authenticate(request):
+    """
+    Async counterpart of the JWT and session authentication of the DRF views.
+    Only the user lookup touches the database, through the async ORM.
+    """
+    authentication = StoreJWTAuthentication()
+    header = authentication.get_header(request)
+    raw_token = authentication.get_raw_token(header) if header is not None else None
+    if raw_token is None:
+        # Without AuthenticationMiddleware (STORE_APP_PROFILE=api) there is no session user.
+        auser = getattr(request, 'auser', None)
+        return await auser() if auser is not None else None
+
+    validated_token = authentication.get_validated_token(raw_token)
+    if settings.STORE_AUTH['STATELESS']:
+        return authentication.get_user(validated_token)
+    if jwt_settings.USER_ID_CLAIM not in validated_token:
+        raise InvalidToken(_('Token contained no recognizable user identification'))
+    try:
+        user = await get_user_model().objects.aget(
+            **{jwt_settings.USER_ID_FIELD: validated_token[jwt_settings.USER_ID_CLAIM]}
+        )
+    except get_user_model().DoesNotExist:
+        raise exceptions.AuthenticationFailed(_('User not found'), code='user_not_found')
+    if not user.is_active:
+        raise exceptions.AuthenticationFailed(_('User is inactive'), code='user_inactive')
+    return user
+
+
+def render(data, status=200):
+    return HttpResponse(StoreJSONRenderer().render(data), status=status, content_type='application/json')
+
+
+class AsyncStoreView(View):
+    """
+    Base for the async store views. Answers with the same JSON, status codes and
+    validators as the DRF views, but queries the database with the async ORM.
+    Only the ``?near`` and ``?fuzzy`` filters of the list run in a thread.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            with timer('auth'):
+                user = await authenticate(request)
+            if user is None or not user.is_authenticated:
+                raise exceptions.NotAuthenticated()
+            request.user = user
+            return await super().dispatch(request, *args, **kwargs)
+        except Http404:
+            return render({'detail': 'No Store matches the given query.'}, status=404)
+        except exceptions.APIException as exc:
+            data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+            response = render(data, status=exc.status_code)
+            if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+                response.status_code = 401
+                response['WWW-Authenticate'] = StoreJWTAuthentication().authenticate_header(request)
+            return response
+
+    def conditional(self, request, etag, last_modified=None):
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp(last_modified))
+        if response is not None:
+            response['ETag'] = etag
+        return response
+
+    def validated(self, response, etag, last_modified=None):
+        response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(timestamp(last_modified))
+        return response
+
+
+class AsyncStoreListView(AsyncStoreView):
+    queryset = Store.objects.all().order_by('id')
+    filter_backends = [StoreSearchFilter, OpeningHoursFilter, StoreGeoFilter, StoreFuzzyFilter]
+    search_fields = ['name', 'address', 'opening_hours']
+    # These filters look stores up while filtering, so they run in a thread.
+    # The others only add conditions to the query.
+    querying_parameters = {'near', 'fuzzy'}
+
+    def filter_queryset(self, request, queryset):
+        for backend in self.filter_backends:
+            queryset = backend().filter_queryset(request, queryset, self)
+        return queryset
+
+    async def get(self, request):
+        drf_request = Request(request)
+        # Like StoreMultiGetMixin, ?ids= skips the other filters.
+        ids = get_requested_ids(drf_request)
+        if ids is not None:
+            queryset = self.queryset.filter(pk__in=ids)
+        elif self.querying_parameters & request.GET.keys():
+            queryset = await sync_to_async(self.filter_queryset)(drf_request, self.queryset)
+        else:
+            queryset = self.filter_queryset(drf_request, self.queryset)
+        fields = get_requested_fields(drf_request) or StoreSerializer.Meta.fields
+
+        # One aggregate serves both the ETag and the count of the pagination.
+        aggregate = await queryset.order_by().aaggregate(count=Count('pk'), last_modified=Max('updated_at'))
+        count = aggregate['count']
+        last_modified = aggregate['last_modified'].isoformat() if aggregate['last_modified'] else None
+        etag = make_etag(count, last_modified, *(get_opening_moment(drf_request) or ()))
+        if response := self.conditional(request, etag):
+            return response
+
+        if ids is not None:
+            requested_fields = get_requested_fields(drf_request)
+            stores = {store.pk: store async for store in queryset.only(*fields)}
+            return self.validated(render(lookup_results(stores, ids, requested_fields)), etag)
+
+        paginator = PageNumberPagination
+        page_size = api_settings.PAGE_SIZE
+        num_pages = max(1, math.ceil(count / page_size))
+        page_number = request.GET.get(paginator.page_query_param, 1)
+        if page_number in paginator.last_page_strings:
+            page_number = num_pages
+        try:
+            page_number = int(page_number)
+        except ValueError:
+            page_number = 0
+        if not 1 <= page_number <= num_pages:
+            raise exceptions.NotFound(paginator.invalid_page_message)
+
+        offset = (page_number - 1) * page_size
+        rows = [row async for row in queryset.values(*fields)[offset:offset + page_size]]
+        url = request.build_absolute_uri()
+        next_link = previous_link = None
+        if page_number < num_pages:
+            next_link = replace_query_param(url, paginator.page_query_param, page_number + 1)
+        if page_number == 2:
+            previous_link = remove_query_param(url, paginator.page_query_param)
+        elif page_number > 2:
+            previous_link = replace_query_param(url, paginator.page_query_param, page_number - 1)
+
+        return self.validated(render({
+            'count': count,
+            'next': next_link,
+            'previous': previous_link,
+            'results': rows,
+        }), etag)
+
+
+class AsyncStoreDetailView(AsyncStoreView):
+
+    async def get(self, request, pk):
+        store = await Store.objects.filter(pk=pk).afirst()
+        if store is None:
+            raise Http404
+        etag = make_etag(pk, store.updated_at.isoformat())
+        if response := self.conditional(request, etag, store.updated_at):
+            return response
+        fields = get_requested_fields(Request(request))
+        return self.validated(render(StoreSerializer(store, fields=fields).data), etag, store.updated_at)
@@ -0,0 +1,113 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from .metrics import timer
+
+
+# Issue time of a token in milliseconds, ``iat`` only has whole seconds.
+ISSUED_AT_MS_CLAIM = 'iat_ms'
+
+
+def revoked_cache_key(user_id):
+    return f'store_api:revoked:{user_id}'
+
+
+def revoke_user_tokens(user_id):
+    """
+    Denies every token of the user issued up to now. Entries expire with the
+    longest token lifetime, after which those tokens are expired anyway.
+    """
+    lifetime = max(api_settings.ACCESS_TOKEN_LIFETIME, api_settings.REFRESH_TOKEN_LIFETIME)
+    cache.set(revoked_cache_key(user_id), int(time.time() * 1000), lifetime.total_seconds())
+
+
+def forget_revoked_tokens(user_id):
+    cache.delete(revoked_cache_key(user_id))
+
+
+def is_token_revoked(token):
+    revoked_at = cache.get(revoked_cache_key(token.get(api_settings.USER_ID_CLAIM)))
+    if revoked_at is None:
+        return False
+    # Tokens without the millisecond claim count as issued at the start of their second.
+    issued_at = token.get(ISSUED_AT_MS_CLAIM, token.get('iat', 0) * 1000)
+    return issued_at <= revoked_at
+
+
+def set_issued_at_ms(token, at_time=None):
+    at_time = token.current_time if at_time is None else at_time
+    token[ISSUED_AT_MS_CLAIM] = int(at_time.timestamp() * 1000)
+
+
+class StoreTokenUser(TokenUser):
+    """
+    User built from the claims of an access token. Anything the token does not
+    carry is read from the ``User`` row, which is only loaded on first access.
+    """
+
+    @cached_property
+    def _user(self):
+        return get_user_model().objects.get(**{api_settings.USER_ID_FIELD: self.id})
+
+    @property
+    def groups(self):
+        return self._user.groups
+
+    @property
+    def user_permissions(self):
+        return self._user.user_permissions
+
+    def get_group_permissions(self, obj=None):
+        return self._user.get_group_permissions(obj)
+
+    def get_all_permissions(self, obj=None):
+        return self._user.get_all_permissions(obj)
+
+    def has_perm(self, perm, obj=None):
+        return self._user.has_perm(perm, obj)
+
+    def has_perms(self, perm_list, obj=None):
+        return self._user.has_perms(perm_list, obj)
+
+    def has_module_perms(self, module):
+        return self._user.has_module_perms(module)
+
+    def __getattr__(self, attr):
+        if attr.startswith('_'):
+            raise AttributeError(attr)
+        if attr in self.token:
+            return self.token[attr]
+        return getattr(self._user, attr)
+
+
+class StoreJWTAuthentication(JWTAuthentication):
+    """
+    ``JWTAuthentication`` that rejects revoked tokens and, with
+    ``STORE_AUTH['STATELESS']`` enabled, builds ``request.user`` from the token
+    claims instead of loading the user row on every request.
+    """
+
+    def authenticate(self, request):
+        with timer('auth'):
+            return super().authenticate(request)
+
+    def get_validated_token(self, raw_token):
+        validated_token = super().get_validated_token(raw_token)
+        if is_token_revoked(validated_token):
+            raise InvalidToken(_('Token has been revoked'))
+        return validated_token
+
+    def get_user(self, validated_token):
+        if not settings.STORE_AUTH['STATELESS']:
+            return super().get_user(validated_token)
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+        return StoreTokenUser(validated_token)
@@ -0,0 +1,239 @@
+import json
+import math
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client
+from rest_framework.renderers import JSONRenderer
+from .models import Store
+from .renderers import StoreJSONRenderer, orjson
+from .serializers import StoreSerializer
+
+BENCHMARK_USER = {'username': 'benchmark', 'password': 'benchmark'}
+
+
+class Endpoint:
+    """
+    A request the benchmark sends over and over. ``url`` is formatted with the
+    benchmark context (a random store ``id``, the ``last_page``, a search
+    ``term``, a comma separated ``id_list`` and a misspelled ``fuzzy_term``)
+    for every request.
+    """
+
+    def __init__(self, name, method, url, data=None, authenticated=True, status=200):
+        self.name = name
+        self.method = method
+        self.url = url
+        self.data = data
+        self.authenticated = authenticated
+        self.status = status
+
+    def request(self, client, context, generator):
+        url = self.url.format(id=generator.choice(context['ids']), **context)
+        kwargs = {}
+        if self.authenticated:
+            kwargs['HTTP_AUTHORIZATION'] = f"Bearer {context['access_token']}"
+        if self.data is not None:
+            kwargs['data'] = json.dumps(self.data)
+            kwargs['content_type'] = 'application/json'
+        return getattr(client, self.method)(url, **kwargs)
+
+
+# Number of stores the multiget endpoint asks for.
+MULTIGET_IDS = 50
+# A misspelled street of the synthetic stores.
+FUZZY_TERM = 'Badstrase'
+
+ENDPOINTS = [
+    Endpoint('token', 'post', '/api/token/', data=BENCHMARK_USER, authenticated=False),
+    Endpoint('list', 'get', '/stores/'),
+    Endpoint('list_last_page', 'get', '/stores/?page={last_page}'),
+    Endpoint('detail', 'get', '/stores/{id}'),
+    Endpoint('search', 'get', '/stores/?search={term}'),
+    Endpoint('multiget', 'get', '/stores/?ids={id_list}'),
+    Endpoint('fuzzy', 'get', '/stores/?fuzzy={fuzzy_term}'),
+    Endpoint('stream', 'get', '/stores/stream'),
+    Endpoint('async_list', 'get', '/async/stores/'),
+    Endpoint('async_detail', 'get', '/async/stores/{id}'),
+    Endpoint('async_search', 'get', '/async/stores/?search={term}'),
+]
+
+# Most SQL queries a single request to each endpoint may run with a cold cache.
+QUERY_BUDGETS = {
+    'token': 1,
+    'list': 4,
+    'list_last_page': 4,
+    'detail': 3,
+    'search': 4,
+    'multiget': 3,
+    'fuzzy': 7,
+    'stream': 2,
+    'async_list': 3,
+    'async_detail': 2,
+    'async_search': 3,
+}
+
+
+class QueryCounter:
+    """
+    Execute wrapper counting the queries and the time spent in the database.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - start
+
+
+def measure(endpoint, client, context, generator):
+    counter = QueryCounter()
+    with connection.execute_wrapper(counter):
+        start = time.perf_counter()
+        response = endpoint.request(client, context, generator)
+        elapsed = time.perf_counter() - start
+    if response.status_code != endpoint.status:
+        raise AssertionError(f'{endpoint.name} answered {response.status_code} instead of {endpoint.status}')
+    return elapsed, counter.count
+
+
+def benchmark_context(search_term='store'):
+    """
+    Prepares what the endpoints need: a user with a token and the store ids.
+    """
+    if not User.objects.filter(username=BENCHMARK_USER['username']).exists():
+        User.objects.create_user(**BENCHMARK_USER)
+    response = Client().post('/api/token/', data=BENCHMARK_USER)
+    ids = list(Store.objects.values_list('id', flat=True))
+    page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+    return {
+        'access_token': response.json()['access'],
+        'ids': ids,
+        'last_page': max(1, math.ceil(len(ids) / page_size)),
+        'term': search_term,
+        'id_list': ','.join(str(pk) for pk in ids[:MULTIGET_IDS]),
+        'fuzzy_term': FUZZY_TERM,
+    }
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    index = max(0, math.ceil(percent / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+def _run_worker(endpoint, requests, context, seed, close_connection):
+    client = Client()
+    generator = random.Random(seed)
+    try:
+        return [measure(endpoint, client, context, generator) for _ in range(requests)]
+    finally:
+        if close_connection:
+            connection.close()
+
+
+def run_endpoint(endpoint, requests, concurrency, context):
+    """
+    Sends ``requests`` requests to the endpoint from ``concurrency`` threads,
+    each with its own client and database connection, and summarizes them.
+    """
+    start = time.perf_counter()
+    if concurrency == 1:
+        samples = _run_worker(endpoint, requests, context, 0, close_connection=False)
+    else:
+        shares = [requests // concurrency + (1 if worker < requests % concurrency else 0) for worker in range(concurrency)]
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = [
+                executor.submit(_run_worker, endpoint, share, context, worker, True)
+                for worker, share in enumerate(shares) if share
+            ]
+            samples = [sample for future in futures for sample in future.result()]
+    wall_time = time.perf_counter() - start
+
+    latencies = [latency * 1000 for latency, _ in samples]
+    queries = [count for _, count in samples]
+    return {
+        'requests': len(samples),
+        'requests_per_second': len(samples) / wall_time,
+        'latency_ms': {
+            'mean': statistics.mean(latencies),
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99),
+        },
+        'queries_per_request': {
+            'mean': statistics.mean(queries),
+            'max': max(queries),
+        },
+    }
+
+
+def run_benchmark(endpoints, requests, concurrency, context):
+    return {endpoint.name: run_endpoint(endpoint, requests, concurrency, context) for endpoint in endpoints}
+
+
+def check_query_budgets(results, budgets=QUERY_BUDGETS):
+    """
+    Returns a message for every endpoint that ran more queries than pinned.
+    """
+    return [
+        f"{name} ran {result['queries_per_request']['max']} queries per request, expected at most {budgets[name]}"
+        for name, result in results.items()
+        if name in budgets and result['queries_per_request']['max'] > budgets[name]
+    ]
+
+
+def compare_results(results, baseline, tolerance):
+    """
+    Returns a message for every endpoint whose p95 latency grew by more than
+    ``tolerance`` (a fraction) or that needs more queries than in the baseline.
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before, after = baseline[name]['latency_ms']['p95'], result['latency_ms']['p95']
+        if after > before * (1 + tolerance):
+            regressions.append(f'{name} p95 latency grew from {before:.2f} ms to {after:.2f} ms')
+        before, after = baseline[name]['queries_per_request']['max'], result['queries_per_request']['max']
+        if after > before:
+            regressions.append(f'{name} queries per request grew from {before} to {after}')
+    return regressions
+
+
+def serialization_benchmark(rows=1000, repeat=5):
+    """
+    Returns the CPU milliseconds spent per 1000 stores to read ``rows`` stores
+    and render them as JSON, through ``StoreSerializer`` and model instances and
+    through the ``values()`` fast path, with the standard and the orjson renderer.
+    """
+    queryset = Store.objects.order_by('id')[:rows]
+    fields = StoreSerializer.Meta.fields
+    paths = {
+        'serializer': lambda: JSONRenderer().render(StoreSerializer(queryset, many=True).data),
+        'values': lambda: JSONRenderer().render(list(queryset.values(*fields))),
+    }
+    if orjson is not None:
+        paths['values_orjson'] = lambda: StoreJSONRenderer().render(list(queryset.values(*fields)))
+
+    count = queryset.count()
+    results = {}
+    for name, path in paths.items():
+        timings = []
+        for _ in range(repeat):
+            start = time.process_time()
+            path()
+            timings.append(time.process_time() - start)
+        results[name] = min(timings) * 1000 * 1000 / max(count, 1)
+    return results
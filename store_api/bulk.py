@@ -0,0 +1,115 @@
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers, status
+from .cache import bump_catalogue_version
+from .changes import record_changes
+from .models import Store, StoreChange
+from .opening_hours import sync_opening_intervals
+from .serializers import StoreSerializer
+
+NOT_FOUND = 'No Store matches the given query.'
+CONFLICT = 'The store is both upserted and deleted in this request.'
+UPDATE_FIELDS = ['name', 'address', 'opening_hours', 'latitude', 'longitude', 'geohash', 'updated_at']
+
+
+def _validate(child, item):
+    try:
+        return child.run_validation(item), None
+    except serializers.ValidationError as exc:
+        return None, exc.detail
+
+
+def apply_bulk(create=(), upsert=(), delete=()):
+    """
+    Creates, upserts and deletes stores with one batched statement per kind of
+    write inside a single transaction. Invalid items are reported and skipped,
+    all valid items are written. Upsert items update the store given by ``id``
+    and are created when they have none. A store cannot be upserted and
+    deleted in the same request, both items are rejected.
+
+    Returns one result per item, in the order of the items.
+    """
+    child = StoreSerializer(many=True).child
+    id_field = serializers.IntegerField()
+    results = {
+        'create': [None] * len(create),
+        'upsert': [None] * len(upsert),
+        'delete': [None] * len(delete),
+    }
+
+    with transaction.atomic():
+        new_stores, new_slots = [], []
+        for index, item in enumerate(create):
+            data, errors = _validate(child, item)
+            if errors:
+                results['create'][index] = {'status': status.HTTP_400_BAD_REQUEST, 'errors': errors}
+            else:
+                new_stores.append(Store(**data))
+                new_slots.append(('create', index))
+
+        upsert_ids = {}
+        for index, item in enumerate(upsert):
+            if 'id' not in item:
+                continue
+            try:
+                upsert_ids[index] = id_field.run_validation(item['id'])
+            except serializers.ValidationError as exc:
+                results['upsert'][index] = {'status': status.HTTP_400_BAD_REQUEST, 'errors': {'id': exc.detail}}
+        existing = Store.objects.select_for_update().in_bulk(set(upsert_ids.values()))
+        conflicts = existing.keys() & set(delete)
+        for index, pk in upsert_ids.items():
+            if pk in conflicts:
+                results['upsert'][index] = {'status': status.HTTP_400_BAD_REQUEST, 'errors': {'id': [CONFLICT]}}
+
+        changed_stores, changed_slots = [], []
+        now = timezone.now()
+        for index, item in enumerate(upsert):
+            if results['upsert'][index] is not None:
+                continue
+            if index in upsert_ids and upsert_ids[index] not in existing:
+                results['upsert'][index] = {'status': status.HTTP_404_NOT_FOUND, 'errors': {'id': [NOT_FOUND]}}
+                continue
+            data, errors = _validate(child, item)
+            if errors:
+                results['upsert'][index] = {'status': status.HTTP_400_BAD_REQUEST, 'errors': errors}
+            elif index in upsert_ids:
+                store = existing[upsert_ids[index]]
+                for field, value in data.items():
+                    setattr(store, field, value)
+                store.set_geohash()
+                store.updated_at = now
+                changed_stores.append(store)
+                changed_slots.append(index)
+            else:
+                new_stores.append(Store(**data))
+                new_slots.append(('upsert', index))
+
+        for store in new_stores:
+            store.set_geohash()
+
+        Store.objects.bulk_create(new_stores)
+        for (kind, index), store in zip(new_slots, new_stores):
+            results[kind][index] = {'status': status.HTTP_201_CREATED, 'store': child.to_representation(store)}
+
+        Store.objects.bulk_update(changed_stores, UPDATE_FIELDS)
+        for index, store in zip(changed_slots, changed_stores):
+            results['upsert'][index] = {'status': status.HTTP_200_OK, 'store': child.to_representation(store)}
+
+        found = set(Store.objects.filter(pk__in=set(delete) - conflicts).values_list('pk', flat=True))
+        Store.objects.filter(pk__in=found).delete()
+        for index, pk in enumerate(delete):
+            if pk in conflicts:
+                results['delete'][index] = {'id': pk, 'status': status.HTTP_400_BAD_REQUEST, 'errors': {'id': [CONFLICT]}}
+            elif pk in found:
+                results['delete'][index] = {'id': pk, 'status': status.HTTP_204_NO_CONTENT}
+            else:
+                results['delete'][index] = {'id': pk, 'status': status.HTTP_404_NOT_FOUND, 'errors': {'id': [NOT_FOUND]}}
+
+        # bulk_create and bulk_update send no model signals.
+        if new_stores or changed_stores:
+            sync_opening_intervals(new_stores + changed_stores)
+            record_changes(new_stores, StoreChange.CREATED)
+            record_changes(changed_stores, StoreChange.UPDATED)
+            transaction.on_commit(bump_catalogue_version)
+
+    return results
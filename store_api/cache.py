@@ -0,0 +1,110 @@
+import hashlib
+import threading
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from rest_framework.response import Response
+
+CATALOGUE_VERSION_KEY = 'store_api:catalogue_version'
+
+# Responses to these parameters depend on the clock, not only on the catalogue.
+UNCACHED_QUERY_PARAMS = {'open_now'}
+
+_stats = {'hits': 0, 'misses': 0}
+_stats_lock = threading.Lock()
+
+
+def get_store_cache():
+    return caches[settings.STORE_CACHE['ALIAS']]
+
+
+def get_catalogue_version():
+    store_cache = get_store_cache()
+    version = store_cache.get(CATALOGUE_VERSION_KEY)
+    if version is None:
+        # Start from the clock so a lost version key never reuses an old version.
+        store_cache.add(CATALOGUE_VERSION_KEY, time.time_ns(), None)
+        version = store_cache.get(CATALOGUE_VERSION_KEY)
+    return version
+
+
+def bump_catalogue_version():
+    """
+    Invalidates every cached store response at once. Called whenever stores are
+    written, including bulk writes that bypass the model signals.
+    """
+    store_cache = get_store_cache()
+    try:
+        store_cache.incr(CATALOGUE_VERSION_KEY)
+    except ValueError:
+        store_cache.add(CATALOGUE_VERSION_KEY, time.time_ns(), None)
+
+
+def get_cache_stats():
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _count(stat):
+    with _stats_lock:
+        _stats[stat] += 1
+
+
+def response_cache_key(request):
+    query = urlencode(sorted(request.query_params.lists()), doseq=True)
+    url = f'{request.get_host()}{request.path}?{query}'
+    return f'store_api:response:{get_catalogue_version()}:{hashlib.md5(url.encode()).hexdigest()}'
+
+
+def can_cache(request):
+    # Rows read inside an open transaction may still be rolled back.
+    return (
+        settings.STORE_CACHE['ENABLED']
+        and not connection.in_atomic_block
+        and not UNCACHED_QUERY_PARAMS & set(request.query_params)
+    )
+
+
+def get_or_compute(request, name, compute):
+    """
+    Returns ``compute()`` cached alongside the response for this request, for
+    values such as validators that are derived from the same rows.
+    """
+    if not can_cache(request):
+        return compute()
+    store_cache = get_store_cache()
+    key = f'{response_cache_key(request)}:{name}'
+    value = store_cache.get(key)
+    if value is None:
+        value = compute()
+        store_cache.set(key, value)
+    return value
+
+
+class StoreCacheMixin:
+    """
+    Serves GET responses from the store cache. Cache keys carry the catalogue
+    version, so any store write makes all earlier entries unreachable.
+    Authentication and permissions still run on every request.
+    """
+
+    def get(self, request, *args, **kwargs):
+        if not can_cache(request):
+            return super().get(request, *args, **kwargs)
+
+        store_cache = get_store_cache()
+        key = response_cache_key(request)
+        data = store_cache.get(key)
+        if data is not None:
+            _count('hits')
+            return Response(data, headers={'X-Cache': 'HIT'})
+
+        _count('misses')
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            store_cache.set(key, response.data)
+        response['X-Cache'] = 'MISS'
+        return response
@@ -0,0 +1,121 @@
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Max
+from rest_framework import exceptions, serializers
+from rest_framework.utils.urls import replace_query_param
+from .models import StoreChange, StoreChangeCompaction
+from .serializers import StoreSerializer
+
+CHANGE_FIELDS = ['seq', 'action', 'store_id', 'data', 'changed_at']
+# Arbitrary key of the PostgreSQL advisory lock serializing the writers of the change log.
+CHANGE_LOG_LOCK = 0x53544f5245
+
+
+class ChangesCompacted(exceptions.APIException):
+    status_code = 410
+    default_detail = 'Changes since this sequence number have been compacted, sync again from since=0.'
+    default_code = 'changes_compacted'
+
+
+def store_snapshot(store):
+    # Every store field is a plain column, see StoreSparseFieldsMixin.
+    return {field: getattr(store, field) for field in StoreSerializer.Meta.fields}
+
+
+def lock_change_log(using):
+    """
+    Makes concurrent transactions write changes one after the other. PostgreSQL
+    hands out sequence numbers when rows are inserted, not when they commit, so
+    without it a reader could see seq 8 before seq 7 commits and skip seq 7
+    for good. SQLite only has one writer at a time anyway.
+    """
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [CHANGE_LOG_LOCK])
+
+
+def record_changes(stores, action):
+    """
+    Appends a change with the current state of every store. Must run in the
+    transaction that writes the stores.
+    """
+    stores = list(stores)
+    if not stores:
+        return
+    using = router.db_for_write(StoreChange)
+    lock_change_log(using)
+    StoreChange.objects.using(using).bulk_create([
+        StoreChange(store_id=store.pk, action=action, data=store_snapshot(store)) for store in stores
+    ])
+
+
+def record_deletions(store_ids):
+    store_ids = list(store_ids)
+    if not store_ids:
+        return
+    using = router.db_for_write(StoreChange)
+    lock_change_log(using)
+    StoreChange.objects.using(using).bulk_create([
+        StoreChange(store_id=store_id, action=StoreChange.DELETED) for store_id in store_ids
+    ])
+
+
+def get_horizon():
+    return StoreChangeCompaction.objects.aggregate(horizon=Max('horizon'))['horizon'] or 0
+
+
+def compact_store_changes(tombstones_before=None):
+    """
+    Deletes every change that a later change of the same store supersedes and,
+    with ``tombstones_before`` (a datetime), the tombstones older than that.
+    Returns the number of deleted changes.
+    """
+    with transaction.atomic():
+        latest = StoreChange.objects.values('store_id').annotate(latest=Max('seq')).values('latest')
+        deleted, _ = StoreChange.objects.exclude(seq__in=latest).delete()
+        if tombstones_before is not None:
+            tombstones = StoreChange.objects.filter(action=StoreChange.DELETED, changed_at__lt=tombstones_before)
+            horizon = tombstones.aggregate(horizon=Max('seq'))['horizon']
+            if horizon is not None:
+                StoreChangeCompaction.objects.create(horizon=horizon)
+                deleted += tombstones.delete()[0]
+    return deleted
+
+
+def _query_integer(request, name, default, **limits):
+    field = serializers.IntegerField(**limits)
+    try:
+        return field.run_validation(request.query_params.get(name, default))
+    except serializers.ValidationError as exc:
+        raise serializers.ValidationError({name: exc.detail})
+
+
+def changes_response_data(request):
+    """
+    Returns the changes after ``?since=`` (default 0), oldest first, at most
+    ``?limit=``. Clients store ``last_seq`` and pass it as ``since`` next time.
+    """
+    since = _query_integer(request, 'since', 0, min_value=0)
+    limit = _query_integer(request, 'limit', settings.STORE_CHANGES['PAGE_SIZE'],
+                           min_value=1, max_value=settings.STORE_CHANGES['MAX_PAGE_SIZE'])
+    if 0 < since < get_horizon():
+        raise ChangesCompacted()
+
+    # One row more than the page tells whether there are more.
+    rows = list(StoreChange.objects.filter(seq__gt=since).order_by('seq').values(*CHANGE_FIELDS)[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    timestamp = serializers.DateTimeField()
+    last_seq = rows[-1]['seq'] if rows else since
+    return {
+        'since': since,
+        'last_seq': last_seq,
+        'has_more': has_more,
+        'next': replace_query_param(request.build_absolute_uri(), 'since', last_seq),
+        'results': [
+            {'seq': row['seq'], 'action': row['action'], 'id': row['store_id'], 'store': row['data'],
+             'changed_at': timestamp.to_representation(row['changed_at'])}
+            for row in rows
+        ],
+    }
@@ -0,0 +1,101 @@
+import hashlib
+from calendar import timegm
+
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.permissions import SAFE_METHODS
+from .cache import get_or_compute
+from .opening_hours import get_opening_moment
+
+
+class PreconditionFailed(APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = _('The store has been changed since it was last fetched.')
+    default_code = 'precondition_failed'
+
+
+def make_etag(*parts):
+    return '"%s"' % hashlib.md5(':'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def store_etag(store):
+    return make_etag(store.pk, store.updated_at.isoformat())
+
+
+def timestamp(value):
+    return timegm(value.utctimetuple()) if value else None
+
+
+class StoreConditionalMixin:
+    """
+    Adds ETag and Last-Modified validators to store responses. GETs answer
+    ``If-None-Match``/``If-Modified-Since`` with a 304 before anything is
+    serialized, and writes refuse to run when ``If-Match`` does not match.
+    """
+
+    def is_detail(self):
+        return (self.lookup_url_kwarg or self.lookup_field) in self.kwargs
+
+    def get_validators(self):
+        if self.is_detail():
+            lookup = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+            updated_at = self.get_queryset().filter(**{self.lookup_field: lookup}) \
+                .values_list('updated_at', flat=True).first()
+            if updated_at is None:
+                return None, None
+            return make_etag(lookup, updated_at.isoformat()), updated_at
+
+        # Deletes do not move the newest timestamp, so lists only get an ETag.
+        aggregate = self.filter_queryset(self.get_queryset()).order_by() \
+            .aggregate(count=Count('pk'), last_modified=Max('updated_at'))
+        last_modified = aggregate['last_modified'].isoformat() if aggregate['last_modified'] else None
+        # Which stores are open also changes with the clock.
+        moment = get_opening_moment(self.request) or ()
+        return make_etag(aggregate['count'], last_modified, *moment), None
+
+    def get(self, request, *args, **kwargs):
+        etag, last_modified = get_or_compute(request, 'validators', self.get_validators)
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp(last_modified))
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+        if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            if etag:
+                response['ETag'] = etag
+            if last_modified:
+                response['Last-Modified'] = http_date(timestamp(last_modified))
+        return response
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.method not in SAFE_METHODS and self.is_detail():
+            queryset = queryset.select_for_update()
+        return queryset
+
+    def get_object(self):
+        instance = super().get_object()
+        if self.request.method not in SAFE_METHODS:
+            response = get_conditional_response(
+                self.request, etag=store_etag(instance), last_modified=timestamp(instance.updated_at)
+            )
+            if response is not None:
+                raise PreconditionFailed()
+        return instance
+
+    def update(self, request, *args, **kwargs):
+        with transaction.atomic():
+            response = super().update(request, *args, **kwargs)
+        response['ETag'] = self.etag
+        return response
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        self.etag = store_etag(serializer.instance)
+
+    def destroy(self, request, *args, **kwargs):
+        with transaction.atomic():
+            return super().destroy(request, *args, **kwargs)
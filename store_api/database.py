@@ -0,0 +1,99 @@
+"""
+Builds the database settings from STORE_DB_* environment variables.
+
+STORE_DB_PROFILE selects one of
+- ``sqlite`` (default): a plain SQLite file, as Django creates it.
+- ``sqlite-wal``: SQLite tuned for concurrent readers and a writer, with WAL
+  journaling, ``synchronous=NORMAL``, memory mapped reads and a busy timeout.
+- ``postgresql``: PostgreSQL through psycopg 3 with a connection pool, or with
+  persistent, health checked connections when STORE_DB_POOL=0.
+
+STORE_DB_REPLICAS adds read replicas of the same profile, given as comma
+separated SQLite files or PostgreSQL hosts (host or host:port).
+"""
+
+from django.core.exceptions import ImproperlyConfigured
+
+PROFILES = ['sqlite', 'sqlite-wal', 'postgresql']
+
+
+def _int(environ, name, default):
+    try:
+        return int(environ.get(name, default))
+    except ValueError:
+        raise ImproperlyConfigured(f'{name} must be an integer.')
+
+
+def _bool(environ, name, default):
+    return environ.get(name, str(int(default))).lower() in ('1', 'true', 'yes', 'on')
+
+
+def sqlite_pragmas(environ):
+    return [
+        'PRAGMA journal_mode=WAL',
+        'PRAGMA synchronous=NORMAL',
+        f"PRAGMA mmap_size={_int(environ, 'STORE_SQLITE_MMAP_SIZE', 256 * 1024 * 1024)}",
+        f"PRAGMA busy_timeout={_int(environ, 'STORE_SQLITE_BUSY_TIMEOUT', 5000)}",
+    ]
+
+
+def database_settings(environ, base_dir):
+    profile = environ.get('STORE_DB_PROFILE', 'sqlite')
+    if profile not in PROFILES:
+        raise ImproperlyConfigured(f"STORE_DB_PROFILE must be one of {', '.join(PROFILES)}, not {profile!r}.")
+
+    if profile == 'postgresql':
+        pool = _bool(environ, 'STORE_DB_POOL', True)
+        database = {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': environ.get('STORE_DB_NAME', 'store_api'),
+            'USER': environ.get('STORE_DB_USER', ''),
+            'PASSWORD': environ.get('STORE_DB_PASSWORD', ''),
+            'HOST': environ.get('STORE_DB_HOST', ''),
+            'PORT': environ.get('STORE_DB_PORT', ''),
+            # The pool keeps the connections open itself and refuses CONN_MAX_AGE.
+            'CONN_MAX_AGE': 0 if pool else _int(environ, 'STORE_DB_CONN_MAX_AGE', 60),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+        }
+        if pool:
+            database['OPTIONS']['pool'] = {
+                'min_size': _int(environ, 'STORE_DB_POOL_MIN_SIZE', 2),
+                'max_size': _int(environ, 'STORE_DB_POOL_MAX_SIZE', 10),
+                'timeout': _int(environ, 'STORE_DB_POOL_TIMEOUT', 10),
+            }
+    else:
+        database = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': environ.get('STORE_DB_NAME', base_dir / 'db.sqlite3'),
+        }
+        if profile == 'sqlite-wal':
+            database['CONN_MAX_AGE'] = _int(environ, 'STORE_DB_CONN_MAX_AGE', 60)
+            database['OPTIONS'] = {
+                'init_command': ';'.join(sqlite_pragmas(environ)),
+                # Take the write lock when a transaction starts rather than failing
+                # with "database is locked" when a reading transaction starts to write.
+                'transaction_mode': 'IMMEDIATE',
+            }
+
+    if 'STORE_DB_TEST_NAME' in environ:
+        database['TEST'] = {'NAME': environ['STORE_DB_TEST_NAME']}
+    return database
+
+
+def replica_settings(environ, primary):
+    """
+    Returns the databases of the replicas, named replica1, replica2 and so on.
+    Tests run them as mirrors of the primary test database.
+    """
+    replicas = {}
+    names = [name.strip() for name in environ.get('STORE_DB_REPLICAS', '').split(',') if name.strip()]
+    for number, name in enumerate(names, start=1):
+        replica = {**primary, 'OPTIONS': dict(primary.get('OPTIONS', {})), 'TEST': {'MIRROR': 'default'}}
+        if primary['ENGINE'] == 'django.db.backends.postgresql':
+            replica['HOST'], _, port = name.partition(':')
+            replica['PORT'] = port or primary['PORT']
+        else:
+            replica['NAME'] = name
+        replicas[f'replica{number}'] = replica
+    return replicas
@@ -0,0 +1,90 @@
+import csv
+import io
+import json
+import re
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence
+from rest_framework.renderers import BaseRenderer
+from .models import Store
+
+EXPORT_FIELDS = ['id', 'name', 'address', 'opening_hours', 'latitude', 'longitude']
+
+accepts_gzip = re.compile(r'\bgzip\b')
+
+
+def export_rows(chunk_size):
+    """
+    Yields the stores as value tuples, reading them from the database in chunks
+    without building model instances.
+    """
+    return Store.objects.order_by('id').values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+
+
+def chunked(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class NDJSONRenderer(BaseRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return self.dump(data).encode(self.charset)
+
+    def dump(self, data):
+        return json.dumps(data, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+    def stream(self, rows, chunk_size):
+        for chunk in chunked(rows, chunk_size):
+            yield ''.join(self.dump(dict(zip(EXPORT_FIELDS, row))) for row in chunk).encode(self.charset)
+
+
+class CSVRenderer(BaseRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Only used for error responses, which are flat dictionaries.
+        data = data or {}
+        return self.dump([list(data.keys()), [str(value) for value in data.values()]]).encode(self.charset)
+
+    def dump(self, rows):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue()
+
+    def stream(self, rows, chunk_size):
+        yield self.dump([EXPORT_FIELDS]).encode(self.charset)
+        for chunk in chunked(rows, chunk_size):
+            yield self.dump(chunk).encode(self.charset)
+
+
+def export_response(request, renderer):
+    """
+    Streams the whole catalogue with the given renderer, gzipped on the fly if
+    the client accepts it. Memory use only depends on the chunk size.
+    """
+    chunk_size = settings.STORE_EXPORT['CHUNK_SIZE']
+    content = renderer.stream(export_rows(chunk_size), chunk_size)
+    gzip = accepts_gzip.search(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    if gzip:
+        content = compress_sequence(content)
+
+    response = StreamingHttpResponse(content, content_type=f'{renderer.media_type}; charset={renderer.charset}')
+    response['Content-Disposition'] = f'attachment; filename="stores.{renderer.format}"'
+    if gzip:
+        response['Content-Encoding'] = 'gzip'
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return response
@@ -0,0 +1,239 @@
+import heapq
+import math
+import re
+import threading
+
+from django.conf import settings
+from django.db import connection, connections
+from django.db.models import Case, Max, When
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+from rest_framework.filters import BaseFilterBackend
+from .changes import get_horizon
+from .models import Store, StoreChange
+
+FUZZY_FIELDS = ['name', 'address']
+FILTER_BATCH_SIZE = 5000
+
+
+def trigrams(text):
+    """
+    Returns the trigrams of the words of ``text`` the way pg_trgm makes them:
+    case folded, every word padded with two spaces in front and one behind.
+    """
+    found = set()
+    for word in re.findall(r'[^\W_]+', text.casefold()):
+        padded = f'  {word} '
+        found.update(padded[index:index + 3] for index in range(len(padded) - 2))
+    return found
+
+
+def similarity(query, text):
+    # The share of the query trigrams found in the text, like pg_trgm's word_similarity().
+    return len(query & text) / len(query)
+
+
+class TrigramIndex:
+    """
+    In-process inverted index from the trigrams of the store names and
+    addresses to store ids. It follows the store change log, so writes made
+    by other processes show up as well. When the log has been compacted or
+    cleared past the last change it saw, it is rebuilt from the store table.
+    """
+
+    def __init__(self, using):
+        self.using = using
+        self.lock = threading.Lock()
+        self.last_seq = None
+        self.postings = {}
+        self.stores = {}
+
+    def add(self, store_id, values):
+        self.remove(store_id)
+        field_trigrams = tuple(trigrams(values.get(field) or '') for field in FUZZY_FIELDS)
+        self.stores[store_id] = field_trigrams
+        for trigram in set().union(*field_trigrams):
+            self.postings.setdefault(trigram, set()).add(store_id)
+
+    def remove(self, store_id):
+        field_trigrams = self.stores.pop(store_id, None)
+        if field_trigrams is None:
+            return
+        for trigram in set().union(*field_trigrams):
+            store_ids = self.postings[trigram]
+            store_ids.discard(store_id)
+            if not store_ids:
+                del self.postings[trigram]
+
+    def rebuild(self):
+        # Changes made during the scan are applied again by the next refresh().
+        last_seq = StoreChange.objects.using(self.using).aggregate(seq=Max('seq'))['seq'] or 0
+        self.postings, self.stores = {}, {}
+        rows = Store.objects.using(self.using).values_list('id', *FUZZY_FIELDS).iterator(chunk_size=2000)
+        for store_id, *values in rows:
+            self.add(store_id, dict(zip(FUZZY_FIELDS, values)))
+        self.last_seq = max(last_seq, get_horizon())
+
+    def refresh(self):
+        if self.last_seq is None or self.last_seq < get_horizon():
+            self.rebuild()
+            return
+        changes = StoreChange.objects.using(self.using).filter(seq__gt=self.last_seq).order_by('seq') \
+            .values_list('seq', 'action', 'store_id', 'data')
+        for seq, action, store_id, data in changes:
+            if action == StoreChange.DELETED:
+                self.remove(store_id)
+            else:
+                self.add(store_id, data)
+            self.last_seq = seq
+
+    def candidates(self, text, threshold):
+        """
+        Returns the ids of the stores that may be at least ``threshold`` similar
+        to ``text``: the ones sharing one of the rarest query trigrams.
+        """
+        query = trigrams(text)
+        if not query:
+            return set()
+        needed = max(1, math.ceil(threshold * len(query)))
+        # A store with ``needed`` of the query trigrams has at least one of any
+        # len(query) - needed + 1 of them, so the rarest ones are enough.
+        rarest = sorted(query, key=lambda trigram: len(self.postings.get(trigram, ())))[:len(query) - needed + 1]
+        return set().union(*(self.postings.get(trigram, ()) for trigram in rarest))
+
+    def rank(self, text, threshold, limit, store_ids):
+        """
+        Returns the ``limit`` stores of ``store_ids`` most similar to ``text``,
+        best first.
+        """
+        query = trigrams(text)
+        ranked = []
+        for store_id in store_ids:
+            if store_id not in self.stores:
+                continue
+            score = max(similarity(query, field_trigrams) for field_trigrams in self.stores[store_id])
+            if score >= threshold:
+                ranked.append((-score, store_id))
+        return [store_id for _, store_id in heapq.nsmallest(limit, ranked)]
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_trigram_index(using):
+    with _indexes_lock:
+        if using not in _indexes:
+            _indexes[using] = TrigramIndex(using)
+        return _indexes[using]
+
+
+def reset_trigram_indexes():
+    with _indexes_lock:
+        _indexes.clear()
+
+
+class BaseFuzzyBackend:
+    """
+    Finds the stores whose name or address is similar to a text with typos.
+    ``similar_store_ids`` returns the ids of at most ``limit`` of them, most
+    similar first.
+    """
+
+    def similar_store_ids(self, queryset, text, threshold, limit):
+        raise NotImplementedError
+
+
+class TrigramIndexFuzzyBackend(BaseFuzzyBackend):
+    """
+    Looks the text up in the in-process ``TrigramIndex``. The candidates are
+    narrowed down to the queryset before they are ranked, so filters never push
+    matches out of the ``limit`` best.
+    """
+
+    def similar_store_ids(self, queryset, text, threshold, limit):
+        index = get_trigram_index(queryset.db)
+        with index.lock:
+            index.refresh()
+            candidates = index.candidates(text, threshold)
+        if candidates and queryset.query.has_filters():
+            candidates = self.filtered_ids(queryset, candidates)
+        if not candidates:
+            return []
+        with index.lock:
+            return index.rank(text, threshold, limit, candidates)
+
+    def filtered_ids(self, queryset, store_ids):
+        # Batched, so a text matching most of the catalogue stays below the query parameter limit.
+        store_ids, found = list(store_ids), set()
+        ids = queryset.order_by().values_list('pk', flat=True)
+        for start in range(0, len(store_ids), FILTER_BATCH_SIZE):
+            found.update(ids.filter(pk__in=store_ids[start:start + FILTER_BATCH_SIZE]))
+        return found
+
+
+class PostgresTrigramFuzzyBackend(BaseFuzzyBackend):
+    """
+    Matches the text with pg_trgm's ``<%`` operator, served by the GIN trigram
+    indexes on the name and address columns, and ranks by word similarity.
+    """
+
+    def similar_store_ids(self, queryset, text, threshold, limit):
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute("SELECT set_config('pg_trgm.word_similarity_threshold', %s, false)", [str(threshold)])
+        table = Store._meta.db_table
+        matches = ' OR '.join(f'%s <%% {field}' for field in FUZZY_FIELDS)
+        score = 'greatest(%s)' % ', '.join(f'word_similarity(%s, {table}.{field})' for field in FUZZY_FIELDS)
+        return list(
+            queryset.filter(pk__in=RawSQL(f'SELECT id FROM {table} WHERE {matches}', [text] * len(FUZZY_FIELDS)))
+            .annotate(fuzzy_rank=RawSQL(score, [text] * len(FUZZY_FIELDS)))
+            .order_by('-fuzzy_rank', 'id').values_list('pk', flat=True)[:limit]
+        )
+
+
+def get_fuzzy_backend():
+    backend = settings.STORE_FUZZY.get('BACKEND')
+    if backend:
+        return import_string(backend)()
+    if connection.vendor == 'postgresql':
+        return PostgresTrigramFuzzyBackend()
+    return TrigramIndexFuzzyBackend()
+
+
+class StoreFuzzyFilter(BaseFilterBackend):
+    """
+    ``?fuzzy=<text>`` keeps the stores whose name or address is similar to the
+    text, e.g. with typos, most similar first. At most
+    ``STORE_FUZZY['MAX_RESULTS']`` stores are returned.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        text = request.query_params.get('fuzzy', '').strip()
+        if not text:
+            return queryset
+
+        # The validators and the page both filter the queryset, search once per request.
+        key = request.query_params.urlencode()
+        if getattr(request, '_store_fuzzy', (None,))[0] != key:
+            store_ids = get_fuzzy_backend().similar_store_ids(
+                queryset, text, settings.STORE_FUZZY['THRESHOLD'], settings.STORE_FUZZY['MAX_RESULTS']
+            )
+            request._store_fuzzy = (key, store_ids)
+        store_ids = request._store_fuzzy[1]
+        if not store_ids:
+            return queryset.none()
+        return queryset.filter(pk__in=store_ids).order_by(
+            Case(*(When(pk=pk, then=rank) for rank, pk in enumerate(store_ids)))
+        )
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': 'fuzzy',
+                'required': False,
+                'in': 'query',
+                'description': 'Only stores with a name or address similar to this text, most similar first. '
+                               'Tolerates typos.',
+                'schema': {'type': 'string'},
+            },
+        ]
+
@@ -0,0 +1,182 @@
+import math
+import operator
+from functools import reduce
+
+from django.conf import settings
+from django.db.models import Case, Q, When
+from rest_framework import serializers
+from rest_framework.filters import BaseFilterBackend
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_LENGTH = 12
+# Sorts after every geohash character, so [prefix, prefix + GEOHASH_END) is a prefix range.
+GEOHASH_END = '{'
+
+EARTH_RADIUS = 6371008.8
+METERS_PER_DEGREE = 111320
+
+# Nearest-neighbour searches start with cells of about 1.2 x 0.6 km and grow
+# them until the neighbourhood is known to hold the nearest stores.
+NEAR_START_PRECISION = 6
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_LENGTH):
+    latitude_range, longitude_range = [-90.0, 90.0], [-180.0, 180.0]
+    characters, value, bits, even = [], 0, 0, True
+    while len(characters) < precision:
+        interval, coordinate = (longitude_range, longitude) if even else (latitude_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        if coordinate >= middle:
+            value, interval[0] = value * 2 + 1, middle
+        else:
+            value, interval[1] = value * 2, middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            characters.append(GEOHASH_ALPHABET[value])
+            value, bits = 0, 0
+    return ''.join(characters)
+
+
+def cell_size(precision):
+    """
+    Returns the height and width in degrees of a geohash cell.
+    """
+    bits = 5 * precision
+    return 180 / 2 ** (bits // 2), 360 / 2 ** (bits - bits // 2)
+
+
+def neighbourhood(latitude, longitude, precision):
+    """
+    Returns the geohash cell of the point and the (up to) eight cells around it.
+    """
+    height, width = cell_size(precision)
+    cells = set()
+    for row in (-1, 0, 1):
+        cell_latitude = latitude + row * height
+        if not -90 <= cell_latitude <= 90:
+            continue
+        for column in (-1, 0, 1):
+            cell_longitude = (longitude + column * width + 180) % 360 - 180
+            cells.add(encode_geohash(cell_latitude, cell_longitude, precision))
+    return cells
+
+
+def safe_radius(latitude, precision):
+    """
+    Distance in meters from the point to the edge of its neighbourhood, at
+    least. Stores closer than that are all inside the neighbourhood.
+    """
+    height, width = cell_size(precision)
+    widest_latitude = min(90.0, abs(latitude) + height)
+    return METERS_PER_DEGREE * min(height, width * math.cos(math.radians(widest_latitude)))
+
+
+def distance(latitude, longitude, other_latitude, other_longitude):
+    """
+    Great-circle distance in meters.
+    """
+    phi, other_phi = math.radians(latitude), math.radians(other_latitude)
+    a = (math.sin((other_phi - phi) / 2) ** 2
+         + math.cos(phi) * math.cos(other_phi) * math.sin(math.radians(other_longitude - longitude) / 2) ** 2)
+    return 2 * EARTH_RADIUS * math.asin(math.sqrt(a))
+
+
+def nearest_store_ids(queryset, latitude, longitude, limit):
+    """
+    Returns the ids of the ``limit`` stores of the queryset closest to the point,
+    nearest first. Only stores in the geohash cells around the point are read,
+    the cells grow until the nearest ones are certainly among them.
+    """
+    located = queryset.order_by().filter(geohash__isnull=False)
+    for precision in range(NEAR_START_PRECISION, 0, -1):
+        cells = neighbourhood(latitude, longitude, precision)
+        candidates = located.filter(reduce(operator.or_, (
+            Q(geohash__gte=cell, geohash__lt=cell + GEOHASH_END) for cell in cells
+        ))).values_list('pk', 'latitude', 'longitude')
+        ranked = sorted((distance(latitude, longitude, *point), pk) for pk, *point in candidates)[:limit]
+        if len(ranked) == limit and ranked[-1][0] <= safe_radius(latitude, precision):
+            return [pk for _, pk in ranked]
+
+    candidates = located.values_list('pk', 'latitude', 'longitude')
+    return [pk for _, pk in sorted((distance(latitude, longitude, *point), pk) for pk, *point in candidates)[:limit]]
+
+
+def _coordinates(request, name, count):
+    try:
+        values = [float(value) for value in request.query_params[name].split(',')]
+        if len(values) != count or not all(math.isfinite(value) for value in values):
+            raise ValueError
+    except ValueError:
+        raise serializers.ValidationError({name: [f'Enter {count} comma separated numbers.']})
+    return values
+
+
+class StoreGeoFilter(BaseFilterBackend):
+    """
+    Filters stores by location. ``?near=<lat>,<lon>`` keeps the ``?limit=``
+    nearest stores ordered by distance, ``?bbox=<min lon>,<min lat>,<max lon>,<max lat>``
+    the stores inside the box. Stores without coordinates never match.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        if 'bbox' in request.query_params:
+            queryset = queryset.filter(self.get_bbox_condition(request))
+        if 'near' not in request.query_params:
+            return queryset
+
+        latitude, longitude = _coordinates(request, 'near', 2)
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            raise serializers.ValidationError({'near': ['Enter a latitude and a longitude.']})
+        limit = self.get_limit(request)
+
+        # The validators and the page both filter the queryset, search once per request.
+        key = request.query_params.urlencode()
+        if getattr(request, '_store_nearest', (None,))[0] != key:
+            request._store_nearest = (key, nearest_store_ids(queryset, latitude, longitude, limit))
+        ids = request._store_nearest[1]
+        if not ids:
+            return queryset.none()
+        return queryset.filter(pk__in=ids).order_by(Case(*(When(pk=pk, then=rank) for rank, pk in enumerate(ids))))
+
+    def get_limit(self, request):
+        field = serializers.IntegerField(min_value=1, max_value=settings.STORE_GEO['MAX_NEAR_LIMIT'])
+        try:
+            return field.run_validation(request.query_params.get('limit', settings.STORE_GEO['NEAR_LIMIT']))
+        except serializers.ValidationError as exc:
+            raise serializers.ValidationError({'limit': exc.detail})
+
+    def get_bbox_condition(self, request):
+        min_longitude, min_latitude, max_longitude, max_latitude = _coordinates(request, 'bbox', 4)
+        if min_latitude > max_latitude:
+            raise serializers.ValidationError({'bbox': ['The minimum latitude is above the maximum latitude.']})
+        condition = Q(latitude__gte=min_latitude, latitude__lte=max_latitude)
+        if min_longitude <= max_longitude:
+            return condition & Q(longitude__gte=min_longitude, longitude__lte=max_longitude)
+        # Boxes crossing the antimeridian.
+        return condition & (Q(longitude__gte=min_longitude) | Q(longitude__lte=max_longitude))
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': 'near',
+                'required': False,
+                'in': 'query',
+                'description': 'Only the stores nearest to this point (latitude,longitude), nearest first.',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': 'limit',
+                'required': False,
+                'in': 'query',
+                'description': 'Number of stores returned with near.',
+                'schema': {'type': 'integer'},
+            },
+            {
+                'name': 'bbox',
+                'required': False,
+                'in': 'query',
+                'description': 'Only stores inside this box (min longitude,min latitude,max longitude,max latitude).',
+                'schema': {'type': 'string'},
+            },
+        ]
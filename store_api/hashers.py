@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher, ScryptPasswordHasher
+
+
+class StoreScryptPasswordHasher(ScryptPasswordHasher):
+    """
+    scrypt with the costs of ``STORE_PASSWORD_HASHING``. Hashes with other
+    costs still verify and are replaced on the next login.
+    """
+
+    @property
+    def work_factor(self):
+        return settings.STORE_PASSWORD_HASHING['SCRYPT_WORK_FACTOR']
+
+    @property
+    def block_size(self):
+        return settings.STORE_PASSWORD_HASHING['SCRYPT_BLOCK_SIZE']
+
+    @property
+    def parallelism(self):
+        return settings.STORE_PASSWORD_HASHING['SCRYPT_PARALLELISM']
+
+    @property
+    def maxmem(self):
+        # scrypt needs 128 * n * r bytes, OpenSSL refuses more than 32 MB by default.
+        # Leave room for verifying hashes made with higher costs than the current ones.
+        return max(256 * 1024 * 1024, 2 * 128 * self.work_factor * self.block_size)
+
+
+class StoreArgon2PasswordHasher(Argon2PasswordHasher):
+    """
+    Argon2 with the costs of ``STORE_PASSWORD_HASHING``. Needs argon2-cffi.
+    """
+
+    @property
+    def time_cost(self):
+        return settings.STORE_PASSWORD_HASHING['ARGON2_TIME_COST']
+
+    @property
+    def memory_cost(self):
+        return settings.STORE_PASSWORD_HASHING['ARGON2_MEMORY_COST']
+
+    @property
+    def parallelism(self):
+        return settings.STORE_PASSWORD_HASHING['ARGON2_PARALLELISM']
@@ -0,0 +1,226 @@
+"""
+Background jobs: long store operations queued in the ``Job`` table and run by
+``python manage.py runworker`` on a thread or process pool, off the request path.
+"""
+
+import logging
+import os
+import socket
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F
+from django.utils import timezone
+from rest_framework import serializers
+from .bulk import apply_bulk
+from .export import CSVRenderer, NDJSONRenderer, export_rows
+from .models import Job, Store
+from .search import rebuild_search_index
+
+logger = logging.getLogger(__name__)
+
+
+class JobKind:
+    """
+    A kind of job: the handler that runs it and the serializer validating its
+    params when it is submitted.
+    """
+
+    def __init__(self, handler, params_serializer=None):
+        self.handler = handler
+        self.params_serializer = params_serializer
+
+    def validate_params(self, params):
+        if self.params_serializer is None:
+            return {}
+        serializer = self.params_serializer(data=params)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data
+
+
+JOB_KINDS = {}
+
+
+def job_kind(name, params_serializer=None):
+    """
+    Registers the decorated function as the handler of the ``name`` jobs. It is
+    called with the job and the validated params and returns the JSON result.
+    """
+    def register(handler):
+        JOB_KINDS[name] = JobKind(handler, params_serializer)
+        return handler
+    return register
+
+
+def submit_job(kind, params=None, user=None):
+    """
+    Validates the params of a ``kind`` job and queues it. Raises a validation
+    error for unknown kinds or invalid params.
+    """
+    if kind not in JOB_KINDS:
+        raise serializers.ValidationError({'kind': [f"Choose from {', '.join(sorted(JOB_KINDS))}."]})
+    try:
+        params = JOB_KINDS[kind].validate_params(params or {})
+    except serializers.ValidationError as exc:
+        raise serializers.ValidationError({'params': exc.detail})
+    # The stateless token user is not a model instance.
+    return Job.objects.create(kind=kind, params=params, created_by_id=user.pk if user is not None else None)
+
+
+def report_progress(job, progress, total=None):
+    """
+    Stores how far a running job got. Handlers call it after every batch.
+    """
+    job.progress = progress
+    fields = {'progress': progress, 'heartbeat_at': timezone.now()}
+    if total is not None:
+        job.total = fields['total'] = total
+    Job.objects.filter(pk=job.pk).update(**fields)
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def claim_jobs(worker, limit):
+    """
+    Marks up to ``limit`` of the oldest queued jobs as running on ``worker`` and
+    returns them. Every job is taken with a conditional UPDATE, so concurrent
+    workers never claim the same job.
+    """
+    candidates = Job.objects.filter(status=Job.QUEUED).order_by('id').values_list('id', flat=True)[:limit]
+    claimed = []
+    for pk in list(candidates):
+        now = timezone.now()
+        if Job.objects.filter(pk=pk, status=Job.QUEUED).update(
+            status=Job.RUNNING, worker=worker, started_at=now, heartbeat_at=now, attempts=F('attempts') + 1,
+        ):
+            claimed.append(pk)
+    return list(Job.objects.filter(pk__in=claimed).order_by('id'))
+
+
+def heartbeat(job_ids):
+    Job.objects.filter(pk__in=job_ids, status=Job.RUNNING).update(heartbeat_at=timezone.now())
+
+
+def requeue_stale_jobs():
+    """
+    Queues the running jobs whose worker has not sent a heartbeat for
+    ``STORE_JOBS['STALE_SECONDS']`` again, or fails them after ``MAX_ATTEMPTS``.
+    Returns the number of jobs queued again.
+    """
+    stale = Job.objects.filter(
+        status=Job.RUNNING,
+        heartbeat_at__lt=timezone.now() - timedelta(seconds=settings.STORE_JOBS['STALE_SECONDS']),
+    )
+    stale.filter(attempts__gte=settings.STORE_JOBS['MAX_ATTEMPTS']).update(
+        status=Job.FAILED, error='The worker running the job stopped.', finished_at=timezone.now(),
+    )
+    return stale.update(status=Job.QUEUED, worker='')
+
+
+def run_job(job_id):
+    """
+    Runs a claimed job and stores its result or error. Returns the new status.
+    """
+    job = Job.objects.get(pk=job_id)
+    kind = JOB_KINDS.get(job.kind)
+    try:
+        if kind is None:
+            raise ValueError(f'Unknown job kind {job.kind!r}.')
+        result = kind.handler(job, **job.params)
+    except Exception as exc:
+        logger.exception('Job %s (%s) failed', job.pk, job.kind)
+        fields = {'status': Job.FAILED, 'error': f'{type(exc).__name__}: {exc}'}
+    else:
+        fields = {'status': Job.SUCCEEDED, 'result': result}
+    # A job queued again by requeue_stale_jobs() belongs to another worker now.
+    Job.objects.filter(pk=job.pk, worker=job.worker).update(finished_at=timezone.now(), **fields)
+    return fields['status']
+
+
+def run_pooled_job(job_id):
+    """
+    Task of the runworker pool. Pool threads and processes keep their database
+    connections between jobs, like request threads between requests.
+    """
+    close_old_connections()
+    try:
+        return run_job(job_id)
+    finally:
+        close_old_connections()
+
+
+class ImportStoresSerializer(serializers.Serializer):
+    stores = serializers.ListField(child=serializers.DictField(), allow_empty=False)
+
+
+@job_kind('import_stores', ImportStoresSerializer)
+def import_stores_job(job, stores):
+    """
+    Creates the stores in batches of ``STORE_JOBS['BATCH_SIZE']``, each in its
+    own transaction. Invalid stores are reported by index and skipped.
+    """
+    batch_size = settings.STORE_JOBS['BATCH_SIZE']
+    created, errors = 0, []
+    report_progress(job, 0, len(stores))
+    for start in range(0, len(stores), batch_size):
+        results = apply_bulk(create=stores[start:start + batch_size])['create']
+        for index, result in enumerate(results, start=start):
+            if 'errors' in result:
+                errors.append({'index': index, 'errors': result['errors']})
+            else:
+                created += 1
+        report_progress(job, start + len(results))
+    return {'created': created, 'errors': errors}
+
+
+class ExportStoresSerializer(serializers.Serializer):
+    format = serializers.ChoiceField(choices=['ndjson', 'csv'], default='ndjson')
+
+
+EXPORT_RENDERERS = {'ndjson': NDJSONRenderer, 'csv': CSVRenderer}
+
+
+def export_file(job):
+    """
+    Returns the path of the file an ``export_stores`` job writes.
+    """
+    return Path(settings.STORE_JOBS['EXPORT_DIR']) / f"stores-{job.pk}.{job.params['format']}"
+
+
+@job_kind('export_stores', ExportStoresSerializer)
+def export_stores_job(job, format):
+    """
+    Writes the whole catalogue to a file in ``STORE_JOBS['EXPORT_DIR']``, in
+    the format of /stores/export. The result links to /jobs/<id>/download.
+    """
+    renderer = EXPORT_RENDERERS[format]()
+    chunk_size = settings.STORE_EXPORT['CHUNK_SIZE']
+    path = export_file(job)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    report_progress(job, 0, Store.objects.count())
+    exported = 0
+
+    def counted(rows):
+        nonlocal exported
+        for row in rows:
+            exported += 1
+            yield row
+
+    with open(path, 'wb') as file:
+        for chunk in renderer.stream(counted(export_rows(chunk_size)), chunk_size):
+            file.write(chunk)
+            report_progress(job, exported)
+    # Stores created during the export are in it as well.
+    report_progress(job, exported, exported)
+    return {'download': f'/jobs/{job.pk}/download', 'stores': exported}
+
+
+@job_kind('rebuild_search_index')
+def rebuild_search_index_job(job):
+    rebuild_search_index()
+    return {}
+
@@ -0,0 +1,90 @@
+import json
+import os
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from store_api.benchmark import (
+    ENDPOINTS, benchmark_context, check_query_budgets, compare_results, run_benchmark, serialization_benchmark,
+)
+from store_api.seeding import create_stores, synthetic_stores
+
+class Command(BaseCommand):
+    help = "Benchmarks the API endpoints against a throwaway database seeded with synthetic stores"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--stores", type=int, default=10000, help="Number of stores to seed")
+        parser.add_argument("--requests", type=int, default=100, help="Requests per endpoint")
+        parser.add_argument("--concurrency", type=int, default=1, help="Threads sending requests")
+        parser.add_argument("--endpoints", help="Comma separated endpoints to run (default: all)")
+        parser.add_argument("--output", help="Write the results as JSON to this file")
+        parser.add_argument("--compare", help="Fail on regressions against the results in this JSON file")
+        parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed p95 latency growth (default 0.2)")
+        parser.add_argument("--no-cache", action="store_true", help="Disable the store response cache")
+        parser.add_argument("--check-queries", action="store_true", help="Fail when an endpoint exceeds its query budget")
+        parser.add_argument("--serialization", action="store_true",
+                            help="Also measure the CPU time to serialize 1000 stores per serialization path")
+
+    def handle(self, *args, **options):
+        endpoints = ENDPOINTS
+        if options["endpoints"]:
+            names = options["endpoints"].split(",")
+            endpoints = [endpoint for endpoint in ENDPOINTS if endpoint.name in names]
+            unknown = set(names) - {endpoint.name for endpoint in endpoints}
+            if unknown:
+                raise CommandError(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+        if options["requests"] < 1 or options["concurrency"] < 1:
+            raise CommandError("--requests and --concurrency must be at least 1")
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.stdout.write(f"Seeding {options['stores']} stores")
+            create_stores(synthetic_stores(options["stores"]), batch_size=1000)
+            # All requests come from one address, throttling would turn them into 429s.
+            no_throttling = override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": {}})
+            no_cache = override_settings(STORE_CACHE={**settings.STORE_CACHE, "ENABLED": False})
+            with no_throttling, no_cache if options["no_cache"] else nullcontext():
+                context = benchmark_context()
+                results = run_benchmark(endpoints, options["requests"], options["concurrency"], context)
+            serialization = serialization_benchmark() if options["serialization"] else None
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.write_table(results)
+        if serialization:
+            self.stdout.write(f"{'serialization':<16}{'CPU ms per 1000 stores':>24}")
+            for name, milliseconds in serialization.items():
+                self.stdout.write(f"{name:<16}{milliseconds:>24.2f}")
+        report = {
+            "config": {key: options[key] for key in ["stores", "requests", "concurrency", "no_cache"]},
+            "vendor": connection.vendor,
+            "profile": os.environ.get("STORE_DB_PROFILE", "sqlite"),
+            "results": results,
+        }
+        if serialization:
+            report["serialization"] = serialization
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                json.dump(report, file, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+        failures = check_query_budgets(results) if options["check_queries"] else []
+        if options["compare"]:
+            with open(options["compare"]) as file:
+                baseline = json.load(file)["results"]
+            failures += compare_results(results, baseline, options["tolerance"])
+        if failures:
+            raise CommandError("Benchmark failed:\n" + "\n".join(failures))
+
+    def write_table(self, results):
+        self.stdout.write(f"{'endpoint':<16}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'queries':>10}")
+        for name, result in results.items():
+            latency = result["latency_ms"]
+            self.stdout.write(
+                f"{name:<16}{result['requests_per_second']:>10.1f}{latency['p50']:>10.2f}{latency['p95']:>10.2f}"
+                f"{latency['p99']:>10.2f}{result['queries_per_request']['mean']:>10.2f}"
+            )
@@ -0,0 +1,23 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from store_api.changes import compact_store_changes
+
+class Command(BaseCommand):
+    help = "Shrinks the store change log to the latest change per store and drops old tombstones"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tombstone-days", type=int, default=settings.STORE_CHANGES["TOMBSTONE_DAYS"],
+                            help="Keep deletions for this many days (default STORE_CHANGES['TOMBSTONE_DAYS'])")
+        parser.add_argument("--keep-tombstones", action="store_true", help="Keep all deletions")
+
+    def handle(self, *args, **kwargs):
+        if kwargs["tombstone_days"] < 0:
+            raise CommandError("--tombstone-days must not be negative")
+        tombstones_before = None
+        if not kwargs["keep_tombstones"]:
+            tombstones_before = timezone.now() - timedelta(days=kwargs["tombstone_days"])
+        deleted = compact_store_changes(tombstones_before)
+        self.stdout.write(f"Deleted {deleted} store changes")
@@ -0,0 +1,89 @@
+import csv
+import json
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from store_api.cache import bump_catalogue_version
+from store_api.changes import record_changes
+from store_api.models import Store, StoreChange
+
+UPDATE_FIELDS = ["latitude", "longitude", "geohash", "updated_at"]
+
+class Command(BaseCommand):
+    help = "Fills in store coordinates from a file or the configured geocoder"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from-file",
+                            help="CSV or NDJSON file with latitude and longitude per store id or address")
+        parser.add_argument("--all", action="store_true", help="Also replace coordinates stores already have")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Stores updated per statement and transaction")
+
+    def handle(self, *args, **kwargs):
+        if kwargs["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1")
+        if kwargs["from_file"]:
+            geocode = file_geocoder(kwargs["from_file"])
+        elif settings.STORE_GEO["GEOCODER"]:
+            geocoder = import_string(settings.STORE_GEO["GEOCODER"])
+            geocode = lambda store: geocoder(store.address)
+        else:
+            raise CommandError("Pass --from-file or configure STORE_GEO['GEOCODER']")
+
+        stores = Store.objects.order_by("id")
+        if not kwargs["all"]:
+            stores = stores.filter(latitude__isnull=True)
+        located = geocode_stores(stores, geocode, kwargs["batch_size"])
+        self.stdout.write(f"Located {located} stores")
+
+def file_geocoder(path):
+    """
+    Reads coordinates from a CSV file with a header row or an NDJSON file and
+    returns a lookup by store id, falling back to the address.
+    """
+    by_id, by_address = {}, {}
+    try:
+        with open(path, newline="", encoding="utf-8") as file:
+            rows = csv.DictReader(file) if path.endswith(".csv") else (json.loads(line) for line in file if line.strip())
+            for line, row in enumerate(rows, start=1):
+                try:
+                    coordinates = float(row["latitude"]), float(row["longitude"])
+                except (KeyError, TypeError, ValueError):
+                    raise CommandError(f"Row {line} of {path} needs a latitude and a longitude")
+                if row.get("id") not in (None, ""):
+                    by_id[int(row["id"])] = coordinates
+                if row.get("address"):
+                    by_address[row["address"]] = coordinates
+    except OSError as exc:
+        raise CommandError(f"Cannot read {path}: {exc}")
+    return lambda store: by_id.get(store.pk) or by_address.get(store.address)
+
+def geocode_stores(stores, geocode, batch_size=1000):
+    """
+    Sets the coordinates ``geocode(store)`` returns on the stores of the queryset.
+    Stores it returns None for are left alone.
+    """
+    # The ids are read up front because the updates move stores out of the queryset.
+    ids = iter(list(stores.values_list("pk", flat=True)))
+    count = 0
+    while chunk := list(islice(ids, batch_size)):
+        batch = Store.objects.filter(pk__in=chunk).order_by("id")
+        changed = []
+        for store in batch:
+            coordinates = geocode(store)
+            if coordinates is None:
+                continue
+            store.latitude, store.longitude = coordinates
+            store.set_geohash()
+            store.updated_at = timezone.now()
+            changed.append(store)
+        with transaction.atomic():
+            Store.objects.bulk_update(changed, UPDATE_FIELDS)
+            record_changes(changed, StoreChange.UPDATED)
+        count += len(changed)
+    if count:
+        bump_catalogue_version()
+    return count
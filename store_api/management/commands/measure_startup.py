@@ -0,0 +1,34 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from store_api.startup import measure_startup
+
+class Command(BaseCommand):
+    help = "Measures the startup time, imported modules and middleware overhead of a worker per STORE_APP_PROFILE"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters started per profile, the fastest counts")
+        parser.add_argument("--profiles", default=",".join(settings.APP_PROFILES),
+                            help="Comma separated profiles to measure (default: all)")
+        parser.add_argument("--output", help="Write the results as JSON to this file")
+
+    def handle(self, *args, **options):
+        profiles = options["profiles"].split(",")
+        unknown = set(profiles) - set(settings.APP_PROFILES)
+        if unknown:
+            raise CommandError(f"Unknown profiles: {', '.join(sorted(unknown))}")
+        if options["repeat"] < 1:
+            raise CommandError("--repeat must be at least 1")
+
+        results = {profile: measure_startup(profile, repeat=options["repeat"]) for profile in profiles}
+        self.stdout.write(f"{'profile':<10}{'startup ms':>12}{'modules':>10}{'warm-up ms':>12}{'middleware us':>15}")
+        for profile, result in results.items():
+            self.stdout.write(
+                f"{profile:<10}{result['startup_ms']:>12.1f}{result['modules']:>10}"
+                f"{result['warm_up_ms']:>12.1f}{result['middleware_us']:>15.1f}"
+            )
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                json.dump(results, file, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
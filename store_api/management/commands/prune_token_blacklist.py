@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from store_api.models import BlacklistedRefreshToken
+
+class Command(BaseCommand):
+    help = "Deletes blacklisted refresh tokens that have expired anyway"
+
+    def handle(self, *args, **kwargs):
+        deleted = prune_token_blacklist()
+        self.stdout.write(f"Deleted {deleted} expired refresh tokens from the blacklist")
+
+def prune_token_blacklist(now=None):
+    """
+    Deletes the blacklist entries of tokens that expired before ``now``, read
+    through the index on ``expires_at``.
+    """
+    deleted, _ = BlacklistedRefreshToken.objects.filter(expires_at__lte=now or timezone.now()).delete()
+    return deleted
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from store_api.search import rebuild_search_index
+
+class Command(BaseCommand):
+    help = "Rebuilds the full-text search index of the stores"
+
+    def handle(self, *args, **kwargs):
+        self.stdout.write("Rebuilding the search index")
+        rebuild_search_index()
+        self.stdout.write("Rebuilding complete")
@@ -0,0 +1,34 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+class Command(BaseCommand):
+    help = "Copies the primary SQLite database over its read replicas"
+
+    def handle(self, *args, **kwargs):
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != "sqlite":
+            raise CommandError("Only SQLite replicas can be refreshed, use the database's own replication otherwise")
+        aliases = settings.STORE_REPLICAS["ALIASES"]
+        if not aliases:
+            raise CommandError("No replicas configured, set STORE_DB_REPLICAS")
+
+        for alias in aliases:
+            # Connections to the replica would keep reading the old file contents.
+            connections[alias].close()
+            copy_sqlite_database(primary, settings.DATABASES[alias]["NAME"])
+            self.stdout.write(f"Refreshed {alias}")
+
+def copy_sqlite_database(source, path):
+    """
+    Copies the database of the SQLite connection ``source`` to the file at
+    ``path`` with SQLite's online backup, which reads a consistent snapshot.
+    """
+    source.ensure_connection()
+    target = sqlite3.connect(path)
+    try:
+        source.connection.backup(target)
+    finally:
+        target.close()
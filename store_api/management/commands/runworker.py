@@ -0,0 +1,85 @@
+import logging
+import multiprocessing
+import signal
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, close_old_connections
+from store_api.jobs import claim_jobs, heartbeat, requeue_stale_jobs, run_pooled_job, worker_name
+
+logger = logging.getLogger("store_api.jobs")
+
+class Command(BaseCommand):
+    help = "Runs queued background jobs on a pool of threads or processes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, help="Jobs run at the same time (default STORE_JOBS['WORKERS'])")
+        parser.add_argument("--processes", action="store_true",
+                            help="Run jobs in separate processes instead of threads, for CPU bound jobs")
+        parser.add_argument("--once", action="store_true", help="Exit once no job is queued or running")
+
+    def handle(self, *args, **options):
+        workers = settings.STORE_JOBS["WORKERS"] if options["workers"] is None else options["workers"]
+        if workers < 1:
+            raise CommandError("--workers must be at least 1")
+        if options["processes"]:
+            # Fresh interpreters set Django up themselves instead of sharing this one's connections.
+            executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"),
+                                           initializer=django.setup)
+        else:
+            executor = ThreadPoolExecutor(workers, thread_name_prefix="store-job")
+
+        self.stopping = False
+        handlers = {signum: signal.signal(signum, self.stop) for signum in (signal.SIGINT, signal.SIGTERM)}
+        name = worker_name()
+        self.stdout.write(f"Worker {name} running up to {workers} jobs at once")
+        try:
+            with executor:
+                self.run(executor, name, workers, options["once"])
+        finally:
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+        self.stdout.write("Worker stopped")
+
+    def stop(self, signum, frame):
+        self.stdout.write("Finishing the running jobs, no new ones are started")
+        self.stopping = True
+
+    def run(self, executor, name, workers, once):
+        poll_interval = settings.STORE_JOBS["POLL_INTERVAL"]
+        running = {}
+        while True:
+            close_old_connections()
+            try:
+                requeue_stale_jobs()
+                if not self.stopping:
+                    for job in claim_jobs(name, workers - len(running)):
+                        self.stdout.write(f"Running job {job.pk} ({job.kind})")
+                        running[executor.submit(run_pooled_job, job.pk)] = job
+                claimed = True
+            except DatabaseError:
+                # The running jobs go on, the next round tries again.
+                logger.exception("Worker %s could not claim jobs", name)
+                claimed = False
+            if not running:
+                if self.stopping or (once and claimed):
+                    return
+                time.sleep(poll_interval)
+                continue
+
+            done, _ = wait(running, timeout=poll_interval, return_when=FIRST_COMPLETED)
+            for future in done:
+                job = running.pop(future)
+                try:
+                    status = future.result()
+                except Exception as exc:
+                    # The job stays running until requeue_stale_jobs() picks it up.
+                    status = f"crashed the worker: {exc!r}"
+                self.stdout.write(f"Job {job.pk} ({job.kind}) {status}")
+            try:
+                heartbeat([job.pk for job in running.values()])
+            except DatabaseError:
+                logger.exception("Worker %s could not send a heartbeat", name)
@@ -1,39 +1,74 @@
-from django.core.management.base import BaseCommand
-from django.contrib.auth.models import User, Group
+import csv
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
 from store_api.models import Store
+from store_api.seeding import fixed_stores, run_seed, synthetic_stores
+
+STORE_FIELDS = ["name", "address", "opening_hours"]
+LOCATION_FIELDS = ["latitude", "longitude"]
 
 class Command(BaseCommand):
     help = "Seeds the database for testing"
 
+    def add_arguments(self, parser):
+        source = parser.add_mutually_exclusive_group()
+        source.add_argument("--count", type=int, help="Create this many synthetic stores instead of the fixed ones")
+        source.add_argument("--from-file", help="Load the stores from a CSV or NDJSON file")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Stores inserted per statement and transaction")
+        parser.add_argument("--fast-sqlite", action="store_true",
+                            help="Relax SQLite journaling and syncing while loading (not crash safe)")
+
     def handle(self, *args, **kwargs):
+        if kwargs["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1")
+        if kwargs["count"] is not None:
+            stores = synthetic_stores(kwargs["count"])
+        elif kwargs["from_file"]:
+            # Check every row before the current catalogue is deleted, then read the file again to load it.
+            for _ in read_stores(kwargs["from_file"]):
+                pass
+            stores = read_stores(kwargs["from_file"])
+        else:
+            stores = fixed_stores()
+
         self.stdout.write("Seeding the database")
-        run_seed()
+        start = time.perf_counter()
+        count = run_seed(stores, batch_size=kwargs["batch_size"], fast_sqlite=kwargs["fast_sqlite"])
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f"Created {count} stores in {elapsed:.2f}s ({count / elapsed:.0f} rows/s)")
         self.stdout.write("Seeding complete")
 
-def clear_database():
-    Store.objects.all().delete()
-    User.objects.all().delete()
-    Group.objects.all().delete()
-
-def create_users():
-    User.objects.create_superuser(username="admin", password="admin")
-    User.objects.create_user(username="store", password="store")
-    manager = User.objects.create_user(username="manager", password="manager")
-    group = Group.objects.create(name="manager")
-    manager.groups.set([group])
-
-def create_stores():
-    for i in range(12):
-        Store.objects.create(
-            name=f"Store {i+1}",
-            address=f"Badstraße {i+1}, 12345 Monopolis",
-            opening_hours="Mo-Fr 6:00 - 18:00, Sa 6:00 - 14:00, So 8:00 - 12:00"
-        )
-    Store.objects.create(name="Super Store", address="Boah Weg 25, 54321 Wowstadt", opening_hours="Mo-Fr 6:00 - 21:00, Sa 7:00 - 19:00")
-    Store.objects.create(name="Amazing Store", address="Grandiosallee 10, 54321 Wowstadt", opening_hours="Mo-Mi 6:00 - 21:00, Do,Fr 6:00 - 18:00, Sa 8:00 - 12:00")
-    Store.objects.create(name="Top Store", address="Megastraße 4, 54321 Wowstadt", opening_hours="Mo,Di 6:00 - 12:00, 13:00 - 18:00, Mi-Fr 8:00 - 14:00")
-
-def run_seed():
-    clear_database()
-    create_users()
-    create_stores()
+def read_stores(path):
+    """
+    Streams stores from a CSV file with a header row or from an NDJSON file,
+    e.g. the output of /stores/export. ``latitude`` and ``longitude`` are
+    optional, other columns such as ``id`` are ignored.
+    """
+    try:
+        file = open(path, newline="", encoding="utf-8")
+    except OSError as exc:
+        raise CommandError(f"Cannot read {path}: {exc}")
+
+    with file:
+        if path.endswith(".csv"):
+            rows = enumerate(csv.DictReader(file), start=1)
+        else:
+            rows = ((line, text) for line, text in enumerate(file, start=1) if text.strip())
+        for line, row in rows:
+            try:
+                if isinstance(row, str):
+                    row = json.loads(row)
+                store = Store(**{field: row[field] for field in STORE_FIELDS})
+                store.latitude, store.longitude = (
+                    float(row[field]) if row.get(field) not in (None, "") else None for field in LOCATION_FIELDS
+                )
+            except json.JSONDecodeError as exc:
+                raise CommandError(f"Row {line} of {path} is not valid JSON: {exc.msg}")
+            except (KeyError, TypeError):
+                raise CommandError(f"Row {line} of {path} needs the fields {', '.join(STORE_FIELDS)}")
+            except ValueError:
+                raise CommandError(f"Row {line} of {path} has invalid coordinates")
+            store.set_geohash()
+            yield store
@@ -0,0 +1,258 @@
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse
+from .cache import get_cache_stats
+
+logger = logging.getLogger(__name__)
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# Requests that match no URL pattern share a label, so random paths cannot grow the metrics.
+UNMATCHED_ROUTE = '<unmatched>'
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+
+_current_metrics = ContextVar('store_api_current_metrics', default=None)
+
+_counters = {}
+_histograms = {}
+_metrics_lock = threading.Lock()
+
+
+class RequestMetrics:
+    """
+    Wall time, SQL queries and named timings (e.g. ``auth``, ``render``) of one
+    request, collected by ``StoreMetricsMiddleware``.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.duration = 0.0
+        self.queries = 0
+        self.db_duration = 0.0
+        self.statements = []
+        self.timings = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        # Called by measure_query() around every statement of the request.
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.queries += 1
+            self.db_duration += duration
+            if len(self.statements) < settings.STORE_METRICS['LOGGED_QUERIES']:
+                self.statements.append((duration, sql))
+
+    def add_timing(self, name, duration):
+        self.timings[name] = self.timings.get(name, 0.0) + duration
+
+    def finish(self):
+        self.duration = time.perf_counter() - self.started
+
+    def server_timing(self):
+        entries = [
+            f'total;dur={self.duration * 1000:.1f}',
+            f'db;dur={self.db_duration * 1000:.1f};desc="{self.queries} queries"',
+        ]
+        entries.extend(f'{name};dur={duration * 1000:.1f}' for name, duration in self.timings.items())
+        return ', '.join(entries)
+
+
+def measure_query(execute, sql, params, many, context):
+    """
+    Database execute wrapper installed on every connection. Hands the statement
+    to the metrics of the current request, also when the async ORM runs it on
+    a connection of another thread.
+    """
+    metrics = _current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics(execute, sql, params, many, context)
+
+
+def install_query_wrapper(connection):
+    # First in the list, so execute_wrapper() blocks that are open while the
+    # connection is made still pop their own wrapper.
+    if measure_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, measure_query)
+
+
+@contextmanager
+def timer(name):
+    """
+    Adds the time spent in the block to the ``name`` timing of the current
+    request, if it is measured.
+    """
+    metrics = _current_metrics.get()
+    if metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add_timing(name, time.perf_counter() - started)
+
+
+def get_route(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.route if match is not None and match.route else UNMATCHED_ROUTE
+
+
+def _increment(name, labels, value=1):
+    key = (name, labels)
+    _counters[key] = _counters.get(key, 0) + value
+
+
+def _observe(name, labels, buckets, value):
+    key = (name, labels)
+    if key not in _histograms:
+        _histograms[key] = {'buckets': buckets, 'counts': [0] * len(buckets), 'sum': 0.0, 'count': 0}
+    histogram = _histograms[key]
+    index = bisect.bisect_left(buckets, value)
+    if index < len(buckets):
+        histogram['counts'][index] += 1
+    histogram['sum'] += value
+    histogram['count'] += 1
+
+
+def record_request(method, route, status, metrics):
+    labels = (('method', method), ('route', route))
+    buckets = tuple(settings.STORE_METRICS['DURATION_BUCKETS'])
+    with _metrics_lock:
+        _increment('store_api_requests_total', (*labels, ('status', str(status))))
+        _observe('store_api_request_duration_seconds', labels, buckets, metrics.duration)
+        _observe('store_api_request_db_duration_seconds', labels, buckets, metrics.db_duration)
+        _observe('store_api_request_db_queries', labels, QUERY_BUCKETS, metrics.queries)
+
+
+def reset_metrics():
+    with _metrics_lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _format_number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_metrics():
+    """
+    Returns the metrics of this process in the Prometheus text format.
+    """
+    with _metrics_lock:
+        counters = sorted(_counters.items())
+        histograms = sorted(_histograms.items(), key=lambda item: item[0])
+        histograms = [(key, {**value, 'counts': list(value['counts'])}) for key, value in histograms]
+    cache_stats = get_cache_stats()
+    counters += [
+        (('store_api_response_cache_total', (('result', 'hit'),)), cache_stats['hits']),
+        (('store_api_response_cache_total', (('result', 'miss'),)), cache_stats['misses']),
+    ]
+
+    lines, declared = [], set()
+    for (name, labels), value in counters:
+        if name not in declared:
+            lines.append(f'# TYPE {name} counter')
+            declared.add(name)
+        lines.append(f'{name}{_format_labels(labels)} {value}')
+    for (name, labels), histogram in histograms:
+        if name not in declared:
+            lines.append(f'# TYPE {name} histogram')
+            declared.add(name)
+        cumulative = 0
+        for bound, count in zip(histogram['buckets'], histogram['counts']):
+            cumulative += count
+            lines.append(f'{name}_bucket{_format_labels((*labels, ("le", _format_number(bound))))} {cumulative}')
+        lines.append(f'{name}_bucket{_format_labels((*labels, ("le", "+Inf")))} {histogram["count"]}')
+        lines.append(f'{name}_sum{_format_labels(labels)} {_format_number(histogram["sum"])}')
+        lines.append(f'{name}_count{_format_labels(labels)} {histogram["count"]}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    return HttpResponse(render_metrics(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+
+class StoreMetricsMiddleware:
+    """
+    Measures the wall time, SQL query count and database time of every request,
+    sends them in a ``Server-Timing`` header, adds them to the per-route
+    histograms served at ``/metrics`` and logs requests slower than
+    ``STORE_METRICS['SLOW_REQUEST_MS']`` with their SQL.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Under ASGI the middleware awaits the chain instead of running it in a thread.
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not settings.STORE_METRICS['ENABLED']:
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        with self.measure(metrics):
+            response = self.get_response(request)
+        return self.process_metrics(request, response, metrics)
+
+    async def __acall__(self, request):
+        if not settings.STORE_METRICS['ENABLED']:
+            return await self.get_response(request)
+
+        metrics = RequestMetrics()
+        with self.measure(metrics):
+            response = await self.get_response(request)
+        return self.process_metrics(request, response, metrics)
+
+    @contextmanager
+    def measure(self, metrics):
+        token = _current_metrics.set(metrics)
+        try:
+            yield
+        finally:
+            _current_metrics.reset(token)
+        metrics.finish()
+
+    def process_metrics(self, request, response, metrics):
+        if settings.STORE_METRICS['SERVER_TIMING']:
+            response['Server-Timing'] = metrics.server_timing()
+        route = get_route(request)
+        record_request(request.method, route, response.status_code, metrics)
+        if metrics.duration * 1000 >= settings.STORE_METRICS['SLOW_REQUEST_MS']:
+            self.log_slow_request(request, route, response, metrics)
+        return response
+
+    def log_slow_request(self, request, route, response, metrics):
+        statements = '\n'.join(f'  {duration * 1000:.1f} ms: {sql}' for duration, sql in metrics.statements)
+        if metrics.queries > len(metrics.statements):
+            statements += f'\n  ... {metrics.queries - len(metrics.statements)} more'
+        logger.warning(
+            'Slow request %s %s (route %s, status %s): %.1f ms, %s queries in %.1f ms\n%s',
+            request.method, request.get_full_path(), route, response.status_code,
+            metrics.duration * 1000, metrics.queries, metrics.db_duration * 1000, statements,
+        )
@@ -0,0 +1,71 @@
+import sqlite3
+
+from django.db import migrations
+
+# Frozen copy of the search index DDL, later changes to store_api.search must
+# not change what this migration creates.
+SEARCH_COLUMNS = ['name', 'address', 'opening_hours']
+
+
+def fts5_supported():
+    return sqlite3.sqlite_version_info >= (3, 34, 0)
+
+
+def create_search_index(apps, schema_editor):
+    table = apps.get_model('store_api', 'Store')._meta.db_table
+    fts_table = f'{table}_fts'
+    columns = ', '.join(SEARCH_COLUMNS)
+    new_values = ', '.join(f'new.{column}' for column in SEARCH_COLUMNS)
+    old_values = ', '.join(f'old.{column}' for column in SEARCH_COLUMNS)
+
+    if schema_editor.connection.vendor == 'sqlite' and fts5_supported():
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5("
+            f"{columns}, content='{table}', content_rowid='id', tokenize='trigram')"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ai AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO {fts_table}(rowid, {columns}) VALUES (new.id, {new_values}); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ad AFTER DELETE ON {table} BEGIN "
+            f"INSERT INTO {fts_table}({fts_table}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {fts_table}_au AFTER UPDATE ON {table} BEGIN "
+            f"INSERT INTO {fts_table}({fts_table}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); "
+            f"INSERT INTO {fts_table}(rowid, {columns}) VALUES (new.id, {new_values}); END"
+        )
+        schema_editor.execute(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')")
+    elif schema_editor.connection.vendor == 'postgresql':
+        document = " || ' ' || ".join(f"coalesce({column}, '')" for column in SEARCH_COLUMNS)
+        schema_editor.execute(
+            f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector "
+            f"GENERATED ALWAYS AS (to_tsvector('simple', {document})) STORED"
+        )
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {table}_search_vector_idx ON {table} USING GIN (search_vector)"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    table = apps.get_model('store_api', 'Store')._meta.db_table
+    fts_table = f'{table}_fts'
+    if schema_editor.connection.vendor == 'sqlite':
+        for suffix in ['ai', 'ad', 'au']:
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {fts_table}_{suffix}')
+        schema_editor.execute(f'DROP TABLE IF EXISTS {fts_table}')
+    elif schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS {table}_search_vector_idx')
+        schema_editor.execute(f'ALTER TABLE {table} DROP COLUMN IF EXISTS search_vector')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store_api', '0002_alter_store_address_alter_store_name_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
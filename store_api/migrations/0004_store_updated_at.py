@@ -0,0 +1,52 @@
+# Generated by Django 5.1.6 on 2026-10-18 17:11
+
+import sqlite3
+
+from django.db import migrations, models
+
+# Frozen copy of the search index triggers of 0003_store_search_index.
+SEARCH_COLUMNS = ['name', 'address', 'opening_hours']
+
+
+def reinstall_search_index(apps, schema_editor):
+    # Only SQLite drops the triggers when it rebuilds the table.
+    if schema_editor.connection.vendor != 'sqlite' or sqlite3.sqlite_version_info < (3, 34, 0):
+        return
+    table = apps.get_model('store_api', 'Store')._meta.db_table
+    fts_table = f'{table}_fts'
+    columns = ', '.join(SEARCH_COLUMNS)
+    new_values = ', '.join(f'new.{column}' for column in SEARCH_COLUMNS)
+    old_values = ', '.join(f'old.{column}' for column in SEARCH_COLUMNS)
+    schema_editor.execute(
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts_table}(rowid, {columns}) VALUES (new.id, {new_values}); END"
+    )
+    schema_editor.execute(
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts_table}({fts_table}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); END"
+    )
+    schema_editor.execute(
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_au AFTER UPDATE ON {table} BEGIN "
+        f"INSERT INTO {fts_table}({fts_table}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO {fts_table}(rowid, {columns}) VALUES (new.id, {new_values}); END"
+    )
+    schema_editor.execute(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store_api', '0003_store_search_index'),
+    ]
+
+    # SQLite rebuilds the store table to add the column, which drops the search
+    # index triggers, so they are reinstalled in both directions.
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, reinstall_search_index),
+        migrations.AddField(
+            model_name='store',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.RunPython(reinstall_search_index, migrations.RunPython.noop),
+    ]
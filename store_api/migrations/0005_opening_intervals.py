@@ -0,0 +1,98 @@
+# Generated by Django 5.1.6 on 2026-10-18 17:30
+
+import django.db.models.deletion
+import re
+
+from django.db import migrations, models
+
+# Frozen copy of store_api.opening_hours.parse_opening_hours() as of this
+# migration, so later changes to the parser do not change the backfill.
+WEEKDAYS = {
+    'mo': 0, 'di': 1, 'tu': 1, 'mi': 2, 'we': 2, 'do': 3, 'th': 3,
+    'fr': 4, 'sa': 5, 'so': 6, 'su': 6,
+}
+MINUTES_PER_DAY = 24 * 60
+
+DAYS_PATTERN = re.compile(r'^(?P<first>[a-z]{2})(?:\s*-\s*(?P<last>[a-z]{2}))?$')
+RULE_PATTERN = re.compile(
+    r'^(?:(?P<days>[a-z]{2}(?:\s*-\s*[a-z]{2})?)\s+)?'
+    r'(?P<opens>\d{1,2}:\d{2})\s*-\s*(?P<closes>\d{1,2}:\d{2})$'
+)
+
+
+def _weekdays(spec):
+    match = DAYS_PATTERN.match(spec)
+    if not match or match['first'] not in WEEKDAYS or (match['last'] or match['first']) not in WEEKDAYS:
+        raise ValueError(spec)
+    first, last = WEEKDAYS[match['first']], WEEKDAYS[match['last'] or match['first']]
+    return [(first + offset) % 7 for offset in range((last - first) % 7 + 1)]
+
+
+def _minutes(value):
+    hours, minutes = map(int, value.split(':'))
+    if hours > 24 or minutes > 59 or (hours == 24 and minutes):
+        raise ValueError(value)
+    return hours * 60 + minutes
+
+
+def parse_opening_hours(text):
+    intervals = []
+    pending, days = [], []
+    try:
+        for part in text.lower().split(','):
+            part = part.strip()
+            if DAYS_PATTERN.match(part):
+                pending.extend(_weekdays(part))
+                continue
+            match = RULE_PATTERN.match(part)
+            if not match:
+                return []
+            if match['days']:
+                days, pending = pending + _weekdays(match['days']), []
+            elif pending or not days:
+                return []
+            opens, closes = _minutes(match['opens']), _minutes(match['closes']) or MINUTES_PER_DAY
+            for weekday in days:
+                if closes > opens:
+                    intervals.append((weekday, opens, closes))
+                else:
+                    intervals.append((weekday, opens, MINUTES_PER_DAY))
+                    intervals.append(((weekday + 1) % 7, 0, closes))
+    except ValueError:
+        return []
+    return [] if pending else sorted(set(intervals))
+
+
+def backfill_opening_intervals(apps, schema_editor):
+    Store = apps.get_model('store_api', 'Store')
+    OpeningInterval = apps.get_model('store_api', 'OpeningInterval')
+    intervals = (
+        OpeningInterval(store_id=store_id, weekday=weekday, opens=opens, closes=closes)
+        for store_id, opening_hours in Store.objects.values_list('id', 'opening_hours').iterator()
+        for weekday, opens, closes in parse_opening_hours(opening_hours)
+    )
+    OpeningInterval.objects.bulk_create(intervals, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store_api', '0004_store_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OpeningInterval',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.PositiveSmallIntegerField()),
+                ('opens', models.PositiveSmallIntegerField()),
+                ('closes', models.PositiveSmallIntegerField()),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='opening_intervals', to='store_api.store')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['weekday', 'opens', 'closes'], name='store_api_o_weekday_47707e_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_opening_intervals, migrations.RunPython.noop),
+    ]
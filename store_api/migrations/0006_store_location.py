@@ -0,0 +1,65 @@
+# Generated by Django 5.1.6 on 2026-10-18 17:36
+
+import sqlite3
+
+from django.db import migrations, models
+
+# Frozen copy of the search index triggers of 0003_store_search_index.
+SEARCH_COLUMNS = ['name', 'address', 'opening_hours']
+
+
+def reinstall_search_index(apps, schema_editor):
+    # Only SQLite drops the triggers when it rebuilds the table.
+    if schema_editor.connection.vendor != 'sqlite' or sqlite3.sqlite_version_info < (3, 34, 0):
+        return
+    table = apps.get_model('store_api', 'Store')._meta.db_table
+    fts_table = f'{table}_fts'
+    columns = ', '.join(SEARCH_COLUMNS)
+    new_values = ', '.join(f'new.{column}' for column in SEARCH_COLUMNS)
+    old_values = ', '.join(f'old.{column}' for column in SEARCH_COLUMNS)
+    schema_editor.execute(
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts_table}(rowid, {columns}) VALUES (new.id, {new_values}); END"
+    )
+    schema_editor.execute(
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts_table}({fts_table}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); END"
+    )
+    schema_editor.execute(
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_au AFTER UPDATE ON {table} BEGIN "
+        f"INSERT INTO {fts_table}({fts_table}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO {fts_table}(rowid, {columns}) VALUES (new.id, {new_values}); END"
+    )
+    schema_editor.execute(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store_api', '0005_opening_intervals'),
+    ]
+
+    # Adding the nullable columns is a plain ALTER TABLE, but SQLite rebuilds the
+    # store table to remove them again, which drops the search index triggers.
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, reinstall_search_index),
+        migrations.AddField(
+            model_name='store',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='store',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='store',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='store',
+            index=models.Index(fields=['latitude', 'longitude'], name='store_api_s_latitud_e21798_idx'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.1.6 on 2026-10-18 18:12
+
+import django.utils.timezone
+from django.db import migrations, models
+
+SNAPSHOT_FIELDS = ['id', 'name', 'address', 'opening_hours', 'latitude', 'longitude']
+
+
+def backfill_store_changes(apps, schema_editor):
+    # Syncing from since=0 then returns the whole existing catalogue.
+    Store = apps.get_model('store_api', 'Store')
+    StoreChange = apps.get_model('store_api', 'StoreChange')
+    changes = (
+        StoreChange(store_id=store['id'], action='created', data=store)
+        for store in Store.objects.order_by('id').values(*SNAPSHOT_FIELDS).iterator()
+    )
+    StoreChange.objects.bulk_create(changes, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store_api', '0007_refresh_token_blacklist'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoreChangeCompaction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('compacted_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('horizon', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StoreChange',
+            fields=[
+                ('seq', models.BigAutoField(primary_key=True, serialize=False)),
+                ('store_id', models.BigIntegerField()),
+                ('action', models.CharField(choices=[('created', 'Created'), ('updated', 'Updated'), ('deleted', 'Deleted')], max_length=7)),
+                ('data', models.JSONField(null=True)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['store_id', 'seq'], name='store_api_s_store_i_ad1861_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_store_changes, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,131 @@
-from django.db import models
+from django.conf import settings
+from django.db import models, router, transaction
+from django.utils import timezone
+from .geo import GEOHASH_LENGTH, encode_geohash
 
 class Store(models.Model):
     name = models.CharField(max_length=255)
     address = models.CharField(max_length=255)
     opening_hours = models.CharField(max_length=255)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    geohash = models.CharField(max_length=GEOHASH_LENGTH, null=True, blank=True, editable=False, db_index=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['latitude', 'longitude'])]
 
     def __str__(self):
         return self.name
+
+    def set_geohash(self):
+        located = self.latitude is not None and self.longitude is not None
+        self.geohash = encode_geohash(self.latitude, self.longitude) if located else None
+
+    def save(self, *args, **kwargs):
+        self.set_geohash()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'geohash'}
+        # The StoreChange written by the post_save receiver commits with the store.
+        with transaction.atomic(using=kwargs.get('using') or router.db_for_write(Store, instance=self), savepoint=False):
+            super().save(*args, **kwargs)
+
+
+class OpeningInterval(models.Model):
+    """
+    One opening interval of a store on one weekday, parsed from ``opening_hours``.
+    ``opens`` and ``closes`` are minutes since midnight, Monday is weekday 0.
+    """
+    store = models.ForeignKey(Store, on_delete=models.CASCADE, related_name='opening_intervals')
+    weekday = models.PositiveSmallIntegerField()
+    opens = models.PositiveSmallIntegerField()
+    closes = models.PositiveSmallIntegerField()
+
+    class Meta:
+        indexes = [models.Index(fields=['weekday', 'opens', 'closes'])]
+
+    def __str__(self):
+        return f'{self.weekday} {self.opens // 60}:{self.opens % 60:02d}-{self.closes // 60}:{self.closes % 60:02d}'
+
+
+class StoreChange(models.Model):
+    """
+    One entry of the append-only log of store changes, written in the same
+    transaction as the change. ``seq`` grows with every change, deletions are
+    kept as tombstones without ``data``.
+    """
+    CREATED = 'created'
+    UPDATED = 'updated'
+    DELETED = 'deleted'
+    ACTIONS = [(CREATED, 'Created'), (UPDATED, 'Updated'), (DELETED, 'Deleted')]
+
+    seq = models.BigAutoField(primary_key=True)
+    # No foreign key, tombstones outlive their store.
+    store_id = models.BigIntegerField()
+    action = models.CharField(max_length=7, choices=ACTIONS)
+    data = models.JSONField(null=True)
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [models.Index(fields=['store_id', 'seq'])]
+
+    def __str__(self):
+        return f'{self.seq} {self.action} {self.store_id}'
+
+
+class StoreChangeCompaction(models.Model):
+    """
+    A run of compact_store_changes. Tombstones up to ``horizon`` are gone, so
+    clients that synced before it have to start over.
+    """
+    compacted_at = models.DateTimeField(default=timezone.now)
+    horizon = models.BigIntegerField(default=0)
+
+
+class BlacklistedRefreshToken(models.Model):
+    """
+    A refresh token that has been rotated and must not be used again. Rows are
+    only needed until the token expires, see the prune_token_blacklist command.
+    """
+    jti = models.CharField(max_length=255, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.jti
+
+
+class Job(models.Model):
+    """
+    Background work run by the runworker command. ``kind`` selects the handler
+    in ``store_api.jobs.JOB_KINDS``, which reports its ``progress`` out of
+    ``total`` while it runs. Workers refresh ``heartbeat_at`` of their running
+    jobs, jobs of workers that stopped are queued again.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUSES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (SUCCEEDED, 'Succeeded'), (FAILED, 'Failed')]
+
+    kind = models.CharField(max_length=50)
+    params = models.JSONField(default=dict)
+    status = models.CharField(max_length=9, choices=STATUSES, default=QUEUED)
+    progress = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(null=True)
+    result = models.JSONField(null=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    worker = models.CharField(max_length=255, blank=True)
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, on_delete=models.SET_NULL, related_name='+')
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True)
+    heartbeat_at = models.DateTimeField(null=True)
+    finished_at = models.DateTimeField(null=True)
+
+    class Meta:
+        # Workers look for the oldest queued jobs.
+        indexes = [models.Index(fields=['status', 'id'])]
+
+    def __str__(self):
+        return f'{self.pk} {self.kind} {self.status}'
@@ -0,0 +1,70 @@
+from drf_spectacular.utils import OpenApiParameter
+from rest_framework import status
+from rest_framework.response import Response
+from .bulk import NOT_FOUND
+from .serializers import StoreLookupSerializer, StoreSerializer
+
+IDS_PARAMETER = OpenApiParameter(
+    'ids', str, description='Comma separated store ids, e.g. 1,5,9. Returns these stores in this order instead of '
+                            'a page, with a 404 result for every missing id. Other filters are ignored.'
+)
+
+
+def get_requested_ids(request):
+    """
+    Returns the store ids given with ``?ids=1,5,9`` in the given order, or None
+    if the parameter is missing.
+    """
+    if 'ids' not in request.query_params:
+        return None
+    ids = [pk.strip() for pk in request.query_params['ids'].split(',') if pk.strip()]
+    serializer = StoreLookupSerializer(data={'ids': ids})
+    serializer.is_valid(raise_exception=True)
+    return serializer.validated_data['ids']
+
+
+def get_stores(queryset, ids, fields=None):
+    """
+    Fetches the stores with the given ids from ``queryset`` with one ``id__in``
+    query and returns one result per id, in the order of the ids.
+    """
+    if fields:
+        queryset = queryset.only(*fields)
+    return lookup_results(queryset.in_bulk(ids), ids, fields)
+
+
+def lookup_results(stores, ids, fields=None):
+    """
+    Returns one result per id for the stores found, a dictionary by id.
+    """
+    serializer = StoreSerializer(fields=fields)
+    results = []
+    for pk in ids:
+        if pk in stores:
+            results.append({'id': pk, 'status': status.HTTP_200_OK, 'store': serializer.to_representation(stores[pk])})
+        else:
+            results.append({'id': pk, 'status': status.HTTP_404_NOT_FOUND, 'errors': {'id': [NOT_FOUND]}})
+    return {'results': results}
+
+
+class StoreMultiGetMixin:
+    """
+    Answers ``GET ?ids=1,5,9`` with the stores of these ids instead of a page.
+    The other filters are skipped, so validators and cache entries only depend
+    on the requested stores. Goes before ``StoreSparseFieldsMixin``.
+    """
+
+    def get_ids(self):
+        return get_requested_ids(self.request) if self.request.method == 'GET' else None
+
+    def filter_queryset(self, queryset):
+        ids = self.get_ids()
+        if ids is None:
+            return super().filter_queryset(queryset)
+        return queryset.filter(pk__in=ids)
+
+    def list(self, request, *args, **kwargs):
+        ids = self.get_ids()
+        if ids is None:
+            return super().list(request, *args, **kwargs)
+        return Response(get_stores(self.get_queryset(), ids, self.get_fields()))
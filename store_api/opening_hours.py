@@ -0,0 +1,151 @@
+import re
+import zoneinfo
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.filters import BaseFilterBackend
+from .models import OpeningInterval
+
+# German and English two letter weekday abbreviations, Monday is 0 like datetime.weekday().
+WEEKDAYS = {
+    'mo': 0, 'di': 1, 'tu': 1, 'mi': 2, 'we': 2, 'do': 3, 'th': 3,
+    'fr': 4, 'sa': 5, 'so': 6, 'su': 6,
+}
+MINUTES_PER_DAY = 24 * 60
+
+DAYS_PATTERN = re.compile(r'^(?P<first>[a-z]{2})(?:\s*-\s*(?P<last>[a-z]{2}))?$')
+RULE_PATTERN = re.compile(
+    r'^(?:(?P<days>[a-z]{2}(?:\s*-\s*[a-z]{2})?)\s+)?'
+    r'(?P<opens>\d{1,2}:\d{2})\s*-\s*(?P<closes>\d{1,2}:\d{2})$'
+)
+
+
+def _weekdays(spec):
+    match = DAYS_PATTERN.match(spec)
+    if not match or match['first'] not in WEEKDAYS or (match['last'] or match['first']) not in WEEKDAYS:
+        raise ValueError(spec)
+    first, last = WEEKDAYS[match['first']], WEEKDAYS[match['last'] or match['first']]
+    return [(first + offset) % 7 for offset in range((last - first) % 7 + 1)]
+
+
+def _minutes(value):
+    hours, minutes = map(int, value.split(':'))
+    if hours > 24 or minutes > 59 or (hours == 24 and minutes):
+        raise ValueError(value)
+    return hours * 60 + minutes
+
+
+def parse_opening_hours(text):
+    """
+    Turns opening hours like ``Mo-Fr 6:00 - 18:00, Sa 6:00 - 14:00`` into
+    ``(weekday, opens, closes)`` tuples with minutes since midnight.
+
+    Days listed without hours (``Do,Fr 6:00 - 18:00``) share the hours that
+    follow, hours without days (``Mo 6:00 - 12:00, 13:00 - 18:00``) belong to
+    the days before. Hours past midnight continue on the next day. Returns an
+    empty list for text that does not follow this format.
+    """
+    intervals = []
+    pending, days = [], []
+    try:
+        for part in text.lower().split(','):
+            part = part.strip()
+            if DAYS_PATTERN.match(part):
+                pending.extend(_weekdays(part))
+                continue
+            match = RULE_PATTERN.match(part)
+            if not match:
+                return []
+            if match['days']:
+                days, pending = pending + _weekdays(match['days']), []
+            elif pending or not days:
+                return []
+            opens, closes = _minutes(match['opens']), _minutes(match['closes']) or MINUTES_PER_DAY
+            for weekday in days:
+                if closes > opens:
+                    intervals.append((weekday, opens, closes))
+                else:
+                    intervals.append((weekday, opens, MINUTES_PER_DAY))
+                    intervals.append(((weekday + 1) % 7, 0, closes))
+    except ValueError:
+        return []
+    return [] if pending else sorted(set(intervals))
+
+
+def sync_opening_intervals(stores):
+    """
+    Replaces the opening intervals of the given saved stores with the ones parsed
+    from their ``opening_hours``. Used wherever stores are written without the
+    model signals, such as bulk writes.
+    """
+    OpeningInterval.objects.filter(store_id__in=[store.pk for store in stores]).delete()
+    OpeningInterval.objects.bulk_create([
+        OpeningInterval(store_id=store.pk, weekday=weekday, opens=opens, closes=closes)
+        for store in stores
+        for weekday, opens, closes in parse_opening_hours(store.opening_hours)
+    ])
+
+
+def store_timezone():
+    name = settings.STORE_OPENING_HOURS.get('TIME_ZONE')
+    return zoneinfo.ZoneInfo(name) if name else timezone.get_current_timezone()
+
+
+def get_opening_moment(request):
+    """
+    Returns the ``(weekday, minute)`` in store local time requested with
+    ``open_at`` or ``open_now``, or None if neither is given. Times without an
+    offset are store local times.
+    """
+    if 'open_at' in request.query_params:
+        field = serializers.DateTimeField(default_timezone=store_timezone())
+        try:
+            moment = field.run_validation(request.query_params['open_at'])
+        except serializers.ValidationError as exc:
+            raise serializers.ValidationError({'open_at': exc.detail})
+    elif 'open_now' in request.query_params:
+        try:
+            if not serializers.BooleanField().run_validation(request.query_params['open_now']):
+                return None
+        except serializers.ValidationError as exc:
+            raise serializers.ValidationError({'open_now': exc.detail})
+        moment = timezone.now()
+    else:
+        return None
+    moment = timezone.localtime(moment, store_timezone())
+    return moment.weekday(), moment.hour * 60 + moment.minute
+
+
+class OpeningHoursFilter(BaseFilterBackend):
+    """
+    Keeps the stores open at ``?open_at=<ISO 8601 date/time>`` or, with
+    ``?open_now=true``, at the current time, using the indexed opening intervals.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        moment = get_opening_moment(request)
+        if moment is None:
+            return queryset
+        weekday, minute = moment
+        return queryset.filter(pk__in=OpeningInterval.objects.filter(
+            weekday=weekday, opens__lte=minute, closes__gt=minute
+        ).values('store_id'))
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': 'open_at',
+                'required': False,
+                'in': 'query',
+                'description': 'Only stores open at this date and time (ISO 8601).',
+                'schema': {'type': 'string', 'format': 'date-time'},
+            },
+            {
+                'name': 'open_now',
+                'required': False,
+                'in': 'query',
+                'description': 'Only stores open right now.',
+                'schema': {'type': 'boolean'},
+            },
+        ]
@@ -0,0 +1,16 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class StoreCursorPagination(CursorPagination):
+    """
+    Keyset pagination over the primary key. Pages are found by seeking past the
+    last seen id, so there is no COUNT(*) and no OFFSET however deep a client
+    walks into the catalogue.
+    """
+    ordering = 'id'
+    page_size_query_param = 'page_size'
+
+    def __init__(self):
+        self.page_size = settings.STORE_PAGINATION['PAGE_SIZE']
+        self.max_page_size = settings.STORE_PAGINATION['MAX_PAGE_SIZE']
@@ -0,0 +1,70 @@
+from django.conf import settings
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from rest_framework.permissions import BasePermission, SAFE_METHODS
+
+MANAGER_ROLE = 'manager'
+
+
+def role_cache_key(user_id):
+    return f'store_api:roles:{user_id}'
+
+
+def get_user_roles(user_id):
+    """
+    Returns the group names of the user, served from the role cache whenever
+    possible. The cache is invalidated by the signals in ``store_api.signals``.
+    """
+    key = role_cache_key(user_id)
+    roles = cache.get(key)
+    if roles is None:
+        roles = list(Group.objects.filter(user=user_id).values_list('name', flat=True))
+        cache.set(key, roles, settings.STORE_ROLES['CACHE_TIMEOUT'])
+    return roles
+
+
+def invalidate_user_roles(user_ids):
+    cache.delete_many([role_cache_key(user_id) for user_id in user_ids])
+
+
+def get_request_roles(request):
+    """
+    Resolves the roles of the requesting user once per request. Roles signed
+    into the access token are trusted as they are, everything else goes through
+    the role cache.
+    """
+    if not hasattr(request, '_store_roles'):
+        claim = settings.STORE_ROLES['TOKEN_CLAIM']
+        token = request.auth
+        if claim and token is not None and hasattr(token, 'get') and claim in token:
+            request._store_roles = list(token.get(claim))
+        else:
+            request._store_roles = get_user_roles(request.user.pk)
+    return request._store_roles
+
+
+class IsManagerOrAdmin(BasePermission):
+    """
+    Allows read access to any authenticated user and write access to admins
+    and members of the manager group.
+    """
+
+    def has_permission(self, request, view):
+        user = request.user
+        if not (user and user.is_authenticated):
+            return False
+        if request.method in SAFE_METHODS:
+            return True
+        return user.is_staff or MANAGER_ROLE in get_request_roles(request)
+
+
+class IsManager(BasePermission):
+    """
+    Allows access to admins and members of the manager group only.
+    """
+
+    def has_permission(self, request, view):
+        user = request.user
+        if not (user and user.is_authenticated):
+            return False
+        return user.is_staff or MANAGER_ROLE in get_request_roles(request)
@@ -0,0 +1,25 @@
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+from .metrics import timer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class StoreJSONRenderer(JSONRenderer):
+    """
+    Renders compact JSON with orjson when it is installed and falls back to the
+    standard ``JSONRenderer`` otherwise, or when indented output is requested.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timer('render'):
+            return self._render(data, accepted_media_type, renderer_context)
+
+    def _render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        # Errors of list items are keyed by index, the json module turns those keys into strings too.
+        return orjson.dumps(data, default=JSONEncoder().default, option=orjson.OPT_NON_STR_KEYS)
@@ -0,0 +1,113 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_current_request = ContextVar('store_api_current_request', default=None)
+
+
+def sticky_cache_key(user_id):
+    return f'store_api:primary:{user_id}'
+
+
+def get_replica_aliases():
+    return settings.STORE_REPLICAS['ALIASES']
+
+
+@contextmanager
+def routed_request(request):
+    token = _current_request.set(request)
+    try:
+        yield
+    finally:
+        _current_request.reset(token)
+
+
+def _user_id(request):
+    user = getattr(request, 'user', None)
+    return user.pk if user is not None and user.is_authenticated else None
+
+
+def stick_to_primary(request):
+    """
+    Sends the reads of this request and, for ``STORE_REPLICAS['STICKY_SECONDS']``,
+    of later requests of the same user to the primary, so they see their writes.
+    """
+    request._store_primary = True
+    user_id = _user_id(request)
+    if user_id is not None:
+        cache.set(sticky_cache_key(user_id), True, settings.STORE_REPLICAS['STICKY_SECONDS'])
+
+
+def reads_from_primary(request):
+    if not hasattr(request, '_store_primary'):
+        user_id = _user_id(request)
+        request._store_primary = user_id is not None and cache.get(sticky_cache_key(user_id), False)
+    return request._store_primary
+
+
+class StoreReplicaRouter:
+    """
+    Sends reads of the store models made while handling a request to a random
+    replica from ``STORE_REPLICAS['ALIASES']`` and all writes to the primary.
+    Reads stay on the primary inside transactions, after a write in the same
+    request and, for a short while, for the user who wrote.
+    """
+
+    def _is_routed(self, model):
+        return model._meta.app_label == 'store_api'
+
+    def db_for_read(self, model, **hints):
+        replicas = get_replica_aliases()
+        request = _current_request.get()
+        if not replicas or request is None or not self._is_routed(model):
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block or reads_from_primary(request):
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        request = _current_request.get()
+        if request is not None and self._is_routed(model) and get_replica_aliases():
+            stick_to_primary(request)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *get_replica_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas are copies of the primary and never migrated themselves.
+        return False if db in get_replica_aliases() else None
+
+
+class StoreReplicaMiddleware:
+    """
+    Makes the current request known to ``StoreReplicaRouter``. Runs in async
+    mode under ASGI, so async views are not handed to a thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        with routed_request(request):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with routed_request(request):
+            return await self.get_response(request)
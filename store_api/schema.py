@@ -0,0 +1,113 @@
+import gzip
+import hashlib
+import os
+import re
+from functools import lru_cache
+
+import yaml
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags
+from drf_spectacular.contrib.rest_framework_simplejwt import (
+    SimpleJWTScheme, TokenObtainPairSerializerExtension, TokenRefreshSerializerExtension,
+)
+from drf_spectacular.generators import SchemaGenerator
+from drf_spectacular.renderers import OpenApiJsonRenderer, OpenApiYamlRenderer
+from drf_spectacular.utils import extend_schema
+from drf_spectacular.views import SCHEMA_KWARGS, SpectacularAPIView
+from .export import accepts_gzip
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+accepts_brotli = re.compile(r'\bbr\b')
+
+
+class StoreJWTScheme(SimpleJWTScheme):
+    target_class = 'store_api.authentication.StoreJWTAuthentication'
+
+
+class StoreTokenObtainPairSerializerExtension(TokenObtainPairSerializerExtension):
+    target_class = 'store_api.serializers.StoreTokenObtainPairSerializer'
+
+
+class StoreTokenRefreshSerializerExtension(TokenRefreshSerializerExtension):
+    target_class = 'store_api.serializers.StoreTokenRefreshSerializer'
+
+
+class SchemaDocument:
+    """
+    A rendered OpenAPI document with its ETag and its gzip and, if the brotli
+    package is installed, brotli compressed variants, all made up front.
+    """
+
+    def __init__(self, body):
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        self.etags = {'identity': f'"{digest}"'}
+        self.bodies = {'identity': body}
+        encoders = {'gzip': lambda body: gzip.compress(body, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            encoders['br'] = lambda body: brotli.compress(body, quality=11)
+        for encoding, compress in encoders.items():
+            self.etags[encoding] = f'"{digest}-{encoding}"'
+            self.bodies[encoding] = compress(body)
+
+    def choose_encoding(self, request):
+        accepted = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        for encoding, pattern in (('br', accepts_brotli), ('gzip', accepts_gzip)):
+            if encoding in self.bodies and pattern.search(accepted):
+                return encoding
+        return 'identity'
+
+    def response(self, request, content_type):
+        encoding = self.choose_encoding(request)
+        # All variants are the same document, a client holding any of them is up to date.
+        if set(parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))) & set(self.etags.values()):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(self.bodies[encoding], content_type=content_type)
+            if encoding != 'identity':
+                response['Content-Encoding'] = encoding
+        response['ETag'] = self.etags[encoding]
+        patch_cache_control(response, public=True, no_cache=True)
+        patch_vary_headers(response, ['Accept', 'Accept-Encoding'])
+        return response
+
+
+@lru_cache
+def get_schema_documents(path=None):
+    """
+    Returns the YAML and JSON schema documents, read from the file written by
+    ``manage.py spectacular --file`` at ``path`` or, without one, generated from
+    the views. Built once per process.
+    """
+    if path is not None and os.path.exists(path):
+        with open(path, 'rb') as file:
+            yaml_body = file.read()
+        data = yaml.safe_load(yaml_body)
+    else:
+        data = SchemaGenerator().get_schema(request=None, public=True)
+        yaml_body = OpenApiYamlRenderer().render(data)
+    json_body = OpenApiJsonRenderer().render(data, OpenApiJsonRenderer.media_type)
+    return {'yaml': SchemaDocument(yaml_body), 'json': SchemaDocument(json_body)}
+
+
+class StoreSchemaView(SpectacularAPIView):
+    """
+    Serves the OpenAPI schema from ``STORE_SCHEMA['FILE']``, or generated once
+    per process if there is none, instead of inspecting every view again for
+    every request.
+    """
+
+    @extend_schema(**SCHEMA_KWARGS)
+    def get(self, request, *args, **kwargs):
+        path = settings.STORE_SCHEMA['FILE']
+        documents = get_schema_documents(str(path) if path else None)
+        renderer = request.accepted_renderer
+        document = documents['json' if 'json' in renderer.media_type else 'yaml']
+        response = document.response(request, renderer.media_type)
+        response['Content-Disposition'] = f'inline; filename="{self._get_filename(request, None)}"'
+        return response
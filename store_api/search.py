@@ -0,0 +1,132 @@
+import operator
+import re
+import sqlite3
+from functools import reduce
+
+from django.conf import settings
+from django.db import connection, models
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+from rest_framework.filters import SearchFilter
+from .models import Store
+
+SEARCH_COLUMNS = ['name', 'address', 'opening_hours']
+FTS_TABLE = f'{Store._meta.db_table}_fts'
+
+# The trigram tokenizer needs at least three characters to look a term up.
+TRIGRAM_MIN_LENGTH = 3
+
+
+def fts5_supported():
+    return sqlite3.sqlite_version_info >= (3, 34, 0)
+
+
+class BaseSearchBackend:
+    """
+    Narrows a store queryset down to the rows matching the given search terms.
+
+    ``search`` returns the filtered queryset together with the terms the
+    backend could not handle itself. Those are left to the plain ``icontains``
+    lookups of ``StoreSearchFilter``.
+    """
+
+    def search(self, queryset, terms, rank=False):
+        return queryset, terms
+
+
+class IContainsSearchBackend(BaseSearchBackend):
+    pass
+
+
+class SQLiteFTS5SearchBackend(BaseSearchBackend):
+    """
+    Looks terms up in an FTS5 trigram index kept in sync with the store table by
+    triggers, so every term of three or more characters is a substring match.
+    """
+
+    def search(self, queryset, terms, rank=False):
+        indexed = [term for term in terms if len(term) >= TRIGRAM_MIN_LENGTH]
+        remaining = [term for term in terms if len(term) < TRIGRAM_MIN_LENGTH]
+        if not indexed:
+            return queryset, remaining
+
+        query = ' '.join('"%s"' % term.replace('"', '""') for term in indexed)
+        queryset = queryset.filter(pk__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', (query,)
+        ))
+        if rank:
+            # bm25() only works next to the MATCH, so the matches are ranked once
+            # and looked up per row. LIMIT -1 keeps SQLite from flattening the
+            # ranking into a MATCH per row. bm25() is negative and lower is better.
+            queryset = queryset.annotate(search_rank=RawSQL(
+                f'SELECT ranked.rank FROM (SELECT rowid, bm25({FTS_TABLE}) AS rank FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s LIMIT -1) AS ranked WHERE ranked.rowid = {Store._meta.db_table}.id',
+                (query,)
+            )).order_by('search_rank', 'id')
+        return queryset, remaining
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """
+    Matches terms as prefixes against the GIN indexed ``search_vector`` column.
+    """
+
+    def search(self, queryset, terms, rank=False):
+        lexemes = [word for term in terms for word in re.findall(r'\w+', term)]
+        if not lexemes:
+            return queryset, terms
+
+        query = ' & '.join(f'{lexeme}:*' for lexeme in lexemes)
+        table = Store._meta.db_table
+        queryset = queryset.filter(pk__in=RawSQL(
+            f"SELECT id FROM {table} WHERE search_vector @@ to_tsquery('simple', %s)", (query,)
+        ))
+        if rank:
+            queryset = queryset.annotate(search_rank=RawSQL(
+                f"ts_rank({table}.search_vector, to_tsquery('simple', %s))", (query,)
+            )).order_by('-search_rank', 'id')
+        return queryset, []
+
+
+def get_search_backend():
+    backend = settings.STORE_SEARCH.get('BACKEND')
+    if backend:
+        return import_string(backend)()
+    if connection.vendor == 'sqlite' and fts5_supported():
+        return SQLiteFTS5SearchBackend()
+    if connection.vendor == 'postgresql':
+        return PostgresSearchBackend()
+    return IContainsSearchBackend()
+
+
+class StoreSearchFilter(SearchFilter):
+    """
+    Accepts the same ``search`` parameter as ``SearchFilter`` but resolves terms
+    through the configured search index instead of scanning the table.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        search_fields = self.get_search_fields(view, request)
+        search_terms = self.get_search_terms(request)
+
+        if not search_fields or not search_terms:
+            return queryset
+
+        queryset, search_terms = get_search_backend().search(
+            queryset, search_terms, rank=settings.STORE_SEARCH.get('RANK_RESULTS', False)
+        )
+        if not search_terms:
+            return queryset
+
+        orm_lookups = [self.construct_search(str(search_field), queryset) for search_field in search_fields]
+        conditions = (
+            reduce(operator.or_, (models.Q(**{orm_lookup: term}) for orm_lookup in orm_lookups))
+            for term in search_terms
+        )
+        return queryset.filter(reduce(operator.and_, conditions))
+
+
+def rebuild_search_index():
+    if connection.vendor == 'sqlite' and fts5_supported():
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
@@ -0,0 +1,129 @@
+"""
+Filling the database with the fixed demo stores or synthetic ones, shared by
+``manage.py seed`` and the benchmark.
+"""
+
+import random
+from contextlib import contextmanager, nullcontext
+from itertools import islice
+
+from django.contrib.auth.models import Group, User
+from django.db import connection, transaction
+from .cache import bump_catalogue_version
+from .changes import record_changes
+from .models import OpeningInterval, Store, StoreChange, StoreChangeCompaction
+from .opening_hours import sync_opening_intervals
+
+STREETS = ['Badstraße', 'Boah Weg', 'Grandiosallee', 'Megastraße', 'Hauptstraße', 'Bahnhofstraße', 'Schulweg', 'Marktplatz']
+# Made-up cities with made-up centres that synthetic stores are scattered around.
+CITIES = {
+    '12345 Monopolis': (52.52, 13.40),
+    '54321 Wowstadt': (48.14, 11.58),
+    '24680 Neudorf': (53.55, 9.99),
+    '13579 Altstadt': (50.94, 6.96),
+}
+OPENING_HOURS = [
+    'Mo-Fr 6:00 - 18:00, Sa 6:00 - 14:00, So 8:00 - 12:00',
+    'Mo-Fr 6:00 - 21:00, Sa 7:00 - 19:00',
+    'Mo-Mi 6:00 - 21:00, Do,Fr 6:00 - 18:00, Sa 8:00 - 12:00',
+    'Mo,Di 6:00 - 12:00, 13:00 - 18:00, Mi-Fr 8:00 - 14:00',
+]
+
+
+def clear_database():
+    # The stores go without tombstones, mirrors of the old catalogue have to sync again from the start.
+    last_change = StoreChange.objects.order_by('-seq').values_list('seq', flat=True).first()
+    if last_change is not None:
+        StoreChangeCompaction.objects.create(horizon=last_change + 1)
+    # A plain DELETE skips fetching every store for the model signals.
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {OpeningInterval._meta.db_table}')
+        cursor.execute(f'DELETE FROM {Store._meta.db_table}')
+        cursor.execute(f'DELETE FROM {StoreChange._meta.db_table}')
+    User.objects.all().delete()
+    Group.objects.all().delete()
+
+
+def create_users():
+    User.objects.create_superuser(username='admin', password='admin')
+    User.objects.create_user(username='store', password='store')
+    manager = User.objects.create_user(username='manager', password='manager')
+    group = Group.objects.create(name='manager')
+    manager.groups.set([group])
+
+
+def fixed_stores():
+    for i in range(12):
+        yield Store(
+            name=f'Store {i+1}',
+            address=f'Badstraße {i+1}, 12345 Monopolis',
+            opening_hours='Mo-Fr 6:00 - 18:00, Sa 6:00 - 14:00, So 8:00 - 12:00'
+        )
+    yield Store(name='Super Store', address='Boah Weg 25, 54321 Wowstadt', opening_hours='Mo-Fr 6:00 - 21:00, Sa 7:00 - 19:00')
+    yield Store(name='Amazing Store', address='Grandiosallee 10, 54321 Wowstadt', opening_hours='Mo-Mi 6:00 - 21:00, Do,Fr 6:00 - 18:00, Sa 8:00 - 12:00')
+    yield Store(name='Top Store', address='Megastraße 4, 54321 Wowstadt', opening_hours='Mo,Di 6:00 - 12:00, 13:00 - 18:00, Mi-Fr 8:00 - 14:00')
+
+
+def synthetic_stores(count):
+    generator = random.Random(count)
+    for i in range(count):
+        city = generator.choice(list(CITIES))
+        latitude, longitude = CITIES[city]
+        store = Store(
+            name=f'Store {i+1}',
+            address=f'{generator.choice(STREETS)} {generator.randint(1, 200)}, {city}',
+            opening_hours=generator.choice(OPENING_HOURS),
+            latitude=round(latitude + generator.uniform(-0.1, 0.1), 6),
+            longitude=round(longitude + generator.uniform(-0.15, 0.15), 6),
+        )
+        store.set_geohash()
+        yield store
+
+
+def create_stores(stores, batch_size=1000):
+    count = 0
+    while batch := list(islice(stores, batch_size)):
+        with transaction.atomic():
+            Store.objects.bulk_create(batch)
+            sync_opening_intervals(batch)
+            record_changes(batch, StoreChange.CREATED)
+        count += len(batch)
+    return count
+
+
+@contextmanager
+def sqlite_bulk_load():
+    """
+    Turns off SQLite's rollback journal fsyncs for the duration of a load and
+    restores the previous settings afterwards.
+    """
+    if connection.vendor != 'sqlite':
+        yield
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA journal_mode')
+        journal_mode = cursor.fetchone()[0]
+        cursor.execute('PRAGMA synchronous')
+        synchronous = cursor.fetchone()[0]
+        cursor.execute('PRAGMA journal_mode = MEMORY')
+        cursor.execute('PRAGMA synchronous = OFF')
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA journal_mode = {journal_mode}')
+            cursor.execute(f'PRAGMA synchronous = {synchronous}')
+
+
+def run_seed(stores=None, batch_size=1000, fast_sqlite=False):
+    """
+    Replaces the catalogue and the users with ``stores``, the fixed ones by
+    default, and the demo users. Returns the number of stores created.
+    """
+    stores = fixed_stores() if stores is None else stores
+    clear_database()
+    create_users()
+    with sqlite_bulk_load() if fast_sqlite else nullcontext():
+        count = create_stores(stores, batch_size)
+    bump_catalogue_version()
+    return count
@@ -1,7 +1,92 @@
+from django.conf import settings
 from rest_framework import serializers
-from .models import Store
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from .models import Job, Store, StoreChange
+from .tokens import StoreRefreshToken
 
 class StoreSerializer(serializers.ModelSerializer):
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
     class Meta:
         model = Store
-        fields = ['id', 'name', 'address', 'opening_hours']
+        fields = ['id', 'name', 'address', 'opening_hours', 'latitude', 'longitude']
+        extra_kwargs = {
+            'latitude': {'min_value': -90, 'max_value': 90},
+            'longitude': {'min_value': -180, 'max_value': 180},
+        }
+
+    def validate(self, attrs):
+        latitude = attrs.get('latitude', getattr(self.instance, 'latitude', None))
+        longitude = attrs.get('longitude', getattr(self.instance, 'longitude', None))
+        if (latitude is None) != (longitude is None):
+            raise serializers.ValidationError('Latitude and longitude must be given together.')
+        return attrs
+
+class StoreBulkSerializer(serializers.Serializer):
+    create = serializers.ListField(child=serializers.DictField(), required=False, default=list)
+    upsert = serializers.ListField(child=serializers.DictField(), required=False, default=list)
+    delete = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+
+    def validate(self, attrs):
+        limit = settings.STORE_BULK['MAX_ITEMS']
+        if sum(len(items) for items in attrs.values()) > limit:
+            raise serializers.ValidationError(f'A bulk request can contain at most {limit} items.')
+        return attrs
+
+class StoreBulkResultSerializer(serializers.Serializer):
+    create = serializers.ListField(child=serializers.DictField())
+    upsert = serializers.ListField(child=serializers.DictField())
+    delete = serializers.ListField(child=serializers.DictField())
+
+class StoreLookupSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False)
+
+    def validate_ids(self, ids):
+        limit = settings.STORE_MULTIGET['MAX_IDS']
+        if len(ids) > limit:
+            raise serializers.ValidationError(f'At most {limit} ids can be fetched at once.')
+        return ids
+
+class StoreLookupItemSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    status = serializers.IntegerField(help_text='200, or 404 if there is no store with this id.')
+    store = StoreSerializer(required=False)
+    errors = serializers.DictField(required=False)
+
+class StoreLookupResultSerializer(serializers.Serializer):
+    results = StoreLookupItemSerializer(many=True)
+
+class StoreChangeSerializer(serializers.Serializer):
+    seq = serializers.IntegerField()
+    action = serializers.ChoiceField(choices=StoreChange.ACTIONS)
+    id = serializers.IntegerField()
+    store = StoreSerializer(allow_null=True, help_text='The store after the change, null for deletions.')
+    changed_at = serializers.DateTimeField()
+
+class StoreChangeFeedSerializer(serializers.Serializer):
+    since = serializers.IntegerField()
+    last_seq = serializers.IntegerField()
+    has_more = serializers.BooleanField()
+    next = serializers.URLField()
+    results = StoreChangeSerializer(many=True)
+
+class JobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Job
+        fields = ['id', 'kind', 'status', 'progress', 'total', 'result', 'error', 'attempts',
+                  'created_at', 'started_at', 'finished_at']
+        read_only_fields = fields
+
+class JobSubmitSerializer(serializers.Serializer):
+    kind = serializers.CharField(help_text='import_stores, export_stores or rebuild_search_index.')
+    params = serializers.DictField(required=False, default=dict)
+
+class StoreTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = StoreRefreshToken
+
+class StoreTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = StoreRefreshToken
@@ -10,9 +10,14 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from datetime import timedelta
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
+from store_api.database import database_settings, replica_settings
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -28,6 +33,17 @@ DEBUG = True
 
 ALLOWED_HOSTS = []
 
+# STORE_APP_PROFILE selects what a worker loads:
+# - ``full`` (default): everything, including the admin, the browsable API and the schema docs.
+# - ``api``: only what the JSON API needs, for nodes that serve neither /admin/ nor /schema/.
+#   Without sessions, clients authenticate with tokens only.
+APP_PROFILES = ['full', 'api']
+STORE_APP_PROFILE = os.environ.get('STORE_APP_PROFILE', 'full')
+if STORE_APP_PROFILE not in APP_PROFILES:
+    raise ImproperlyConfigured(
+        f"STORE_APP_PROFILE must be one of {', '.join(APP_PROFILES)}, not {STORE_APP_PROFILE!r}."
+    )
+
 
 # Application definition
 
@@ -44,6 +60,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'store_api.metrics.StoreMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -51,8 +68,24 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'store_api.routers.StoreReplicaMiddleware',
 ]
 
+if STORE_APP_PROFILE == 'api':
+    INSTALLED_APPS = [
+        app for app in INSTALLED_APPS
+        if app not in ['django.contrib.admin', 'django.contrib.sessions', 'django.contrib.messages',
+                       'django.contrib.staticfiles', 'drf_spectacular']
+    ]
+    MIDDLEWARE = [
+        middleware for middleware in MIDDLEWARE
+        if middleware not in ['django.contrib.sessions.middleware.SessionMiddleware',
+                              'django.middleware.csrf.CsrfViewMiddleware',
+                              'django.contrib.auth.middleware.AuthenticationMiddleware',
+                              'django.contrib.messages.middleware.MessageMiddleware',
+                              'django.middleware.clickjacking.XFrameOptionsMiddleware']
+    ]
+
 ROOT_URLCONF = 'store_api.urls'
 
 TEMPLATES = [
@@ -76,12 +109,57 @@ WSGI_APPLICATION = 'store_api.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
+# Configured with STORE_DB_* environment variables, see store_api/database.py.
+# Without any, this is the SQLite file db.sqlite3.
 
 DATABASES = {
+    'default': database_settings(os.environ, BASE_DIR),
+}
+DATABASES.update(replica_settings(os.environ, DATABASES['default']))
+
+DATABASE_ROUTERS = ['store_api.routers.StoreReplicaRouter']
+
+
+# Caches
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# The "stores" cache holds GET /stores/ responses. Use a shared backend when running
+# several workers, e.g. 'django.core.cache.backends.filebased.FileBasedCache' with a
+# directory as LOCATION or 'django.core.cache.backends.redis.RedisCache' with a
+# redis:// URL.
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'stores': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'stores',
+        'TIMEOUT': 300,
+    },
+}
+
+
+# Password hashing
+# https://docs.djangoproject.com/en/5.1/topics/auth/passwords/
+# New passwords are hashed with the first hasher, at the costs of STORE_PASSWORD_HASHING.
+# Hashes made by the other hashers or with other costs are replaced when the user logs in.
+# Put StoreArgon2PasswordHasher first to use Argon2 (pip install argon2-cffi).
+
+PASSWORD_HASHERS = [
+    'store_api.hashers.StoreScryptPasswordHasher',
+    'store_api.hashers.StoreArgon2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+
+# SCRYPT_WORK_FACTOR * SCRYPT_BLOCK_SIZE * 128 bytes of memory per hash (32 MB), ARGON2_MEMORY_COST in KiB.
+STORE_PASSWORD_HASHING = {
+    'SCRYPT_WORK_FACTOR': 2 ** 15,
+    'SCRYPT_BLOCK_SIZE': 8,
+    'SCRYPT_PARALLELISM': 1,
+    'ARGON2_TIME_COST': 2,
+    'ARGON2_MEMORY_COST': 64 * 1024,
+    'ARGON2_PARALLELISM': 1,
 }
 
 
@@ -133,10 +211,163 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'store_api.authentication.StoreJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    # StoreJSONRenderer uses orjson if it is installed (pip install orjson).
+    'DEFAULT_RENDERER_CLASSES': [
+        'store_api.renderers.StoreJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    # Token requests per client address ("token") and failed logins per username
+    # ("token_username"). Counted in the default cache, None turns a limit off.
+    'DEFAULT_THROTTLE_RATES': {
+        'token': '60/minute',
+        'token_username': '10/minute',
+    },
+}
+
+if STORE_APP_PROFILE == 'api':
+    REST_FRAMEWORK['DEFAULT_AUTHENTICATION_CLASSES'] = ['store_api.authentication.StoreJWTAuthentication']
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] = ['store_api.renderers.StoreJSONRenderer']
+
+# Store startup settings
+# With WARM_UP, store_api/wsgi.py and store_api/asgi.py resolve the URLconf and import the DRF
+# classes when the worker starts, instead of during its first request.
+
+STORE_STARTUP = {
+    'WARM_UP': os.environ.get('STORE_WARM_UP', '1').lower() in ('1', 'true', 'yes', 'on'),
+}
+
+# Store metrics settings
+# Every request gets a Server-Timing header and is counted in the histograms served at /metrics.
+# Requests slower than SLOW_REQUEST_MS are logged with up to LOGGED_QUERIES of their SQL statements.
+
+STORE_METRICS = {
+    'ENABLED': True,
+    'SERVER_TIMING': True,
+    'SLOW_REQUEST_MS': 500,
+    'LOGGED_QUERIES': 50,
+    'DURATION_BUCKETS': [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10],
+}
+
+# Store read replica settings
+# Reads of stores made by requests go to one of ALIASES (see STORE_DB_REPLICAS). After a
+# write, the user reads from the primary for STICKY_SECONDS to see their own changes.
+
+STORE_REPLICAS = {
+    'ALIASES': [alias for alias in DATABASES if alias != 'default'],
+    'STICKY_SECONDS': 5,
+}
+
+# Store search settings
+# BACKEND is picked from the database vendor when set to None.
+
+STORE_SEARCH = {
+    'BACKEND': None,
+    'RANK_RESULTS': True,
+}
+
+# Store fuzzy search settings (?fuzzy=)
+# BACKEND is picked from the database vendor when set to None: pg_trgm on PostgreSQL, an
+# in-process trigram index otherwise. THRESHOLD is the share of the trigrams of the text a
+# name or address must contain, MAX_RESULTS the number of stores returned at most.
+
+STORE_FUZZY = {
+    'BACKEND': None,
+    'THRESHOLD': 0.5,
+    'MAX_RESULTS': 100,
+}
+
+# Store response cache settings
+
+STORE_CACHE = {
+    'ALIAS': 'stores',
+    'ENABLED': True,
+}
+
+# Store bulk endpoint settings (/stores/bulk)
+
+STORE_BULK = {
+    'MAX_ITEMS': 1000,
+}
+
+# Store multi-get settings (/stores/?ids= and /stores/lookup)
+
+STORE_MULTIGET = {
+    'MAX_IDS': 500,
+}
+
+# Store export settings (/stores/export)
+# CHUNK_SIZE is the number of rows fetched from the database and written at once.
+
+STORE_EXPORT = {
+    'CHUNK_SIZE': 2000,
+}
+
+# Store keyset pagination settings (/stores/stream)
+
+STORE_PAGINATION = {
+    'PAGE_SIZE': 10,
+    'MAX_PAGE_SIZE': 100,
+}
+
+# Store change feed settings (/stores/changes)
+# TOMBSTONE_DAYS is how long compact_store_changes keeps deletions, clients have to sync more often.
+
+STORE_CHANGES = {
+    'PAGE_SIZE': 100,
+    'MAX_PAGE_SIZE': 1000,
+    'TOMBSTONE_DAYS': 30,
+}
+
+# Store background job settings (/jobs/, run by `python manage.py runworker`)
+# Running jobs get a heartbeat every POLL_INTERVAL seconds. Jobs without one for STALE_SECONDS
+# are queued again, up to MAX_ATTEMPTS runs. export_stores jobs write their files to EXPORT_DIR.
+
+STORE_JOBS = {
+    'WORKERS': 2,
+    'POLL_INTERVAL': 1.0,
+    'STALE_SECONDS': 60,
+    'MAX_ATTEMPTS': 3,
+    'BATCH_SIZE': 1000,
+    'EXPORT_DIR': BASE_DIR / 'exports',
+}
+
+# Store opening hours settings
+# TIME_ZONE is the time zone opening hours are given in (None uses TIME_ZONE).
+
+STORE_OPENING_HOURS = {
+    'TIME_ZONE': None,
+}
+
+# Store location settings
+# NEAR_LIMIT is the number of stores ?near= returns without ?limit=, at most MAX_NEAR_LIMIT.
+# GEOCODER is the dotted path of a callable turning an address into (latitude, longitude)
+# or None, used by the geocode_stores command.
+
+STORE_GEO = {
+    'NEAR_LIMIT': 10,
+    'MAX_NEAR_LIMIT': 100,
+    'GEOCODER': None,
+}
+
+# Store authentication settings
+# With STATELESS enabled, request.user is built from the access token claims and the
+# user row is only loaded when something reads a field the token does not carry.
+
+STORE_AUTH = {
+    'STATELESS': False,
+}
+
+# Store role settings
+# TOKEN_CLAIM is the access token claim the roles are signed into (None disables it).
+# Roles of users without that claim are cached for CACHE_TIMEOUT seconds.
+
+STORE_ROLES = {
+    'TOKEN_CLAIM': 'roles',
+    'CACHE_TIMEOUT': 300,
 }
 
 # Simple JWT settings
@@ -145,9 +376,19 @@ SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(days=1),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=7),
     "ROTATE_REFRESH_TOKENS": True,
+    # Rotated refresh tokens are kept in BlacklistedRefreshToken until they expire.
+    "BLACKLIST_AFTER_ROTATION": True,
+    "TOKEN_OBTAIN_SERIALIZER": "store_api.serializers.StoreTokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "store_api.serializers.StoreTokenRefreshSerializer",
 }
 
 # Spectacular settings
+# /schema/ serves STORE_SCHEMA['FILE'], regenerate it with `python manage.py spectacular --file schema.yml`.
+# Without a file (None or missing), the schema is generated once per process.
+
+STORE_SCHEMA = {
+    'FILE': BASE_DIR / 'schema.yml',
+}
 
 SPECTACULAR_SETTINGS = {
     'TITLE': 'Store API',
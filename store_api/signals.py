@@ -0,0 +1,108 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import get_hasher, identify_hasher
+from django.contrib.auth.models import Group
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_delete
+from django.dispatch import receiver
+from .authentication import forget_revoked_tokens, revoke_user_tokens
+from .cache import bump_catalogue_version
+from .changes import record_changes, record_deletions
+from .metrics import install_query_wrapper
+from .models import Store, StoreChange
+from .opening_hours import sync_opening_intervals
+from .permissions import invalidate_user_roles
+
+User = get_user_model()
+
+# Saving any of these revokes the tokens already handed out to the user.
+TOKEN_REVOKING_FIELDS = {'username', 'password', 'is_active', 'is_staff', 'is_superuser'}
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_roles_on_membership_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        invalidate_user_roles([instance.pk])
+    elif action == 'pre_clear':
+        invalidate_user_roles(instance.user_set.values_list('pk', flat=True))
+    else:
+        invalidate_user_roles(pk_set)
+
+
+@receiver(post_save, sender=User)
+def reset_user_state_on_creation(sender, instance, created, **kwargs):
+    # Primary keys of deleted users can be handed out again.
+    if created:
+        invalidate_user_roles([instance.pk])
+        forget_revoked_tokens(instance.pk)
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def invalidate_roles_on_group_change(sender, instance, created=False, **kwargs):
+    if created:
+        return
+    invalidate_user_roles(instance.user_set.values_list('pk', flat=True))
+
+
+def is_password_upgrade(instance, update_fields):
+    """
+    Tells whether a save only stores a new hash of the same password, as
+    ``check_password()`` does when the stored hash is outdated. Unlike
+    ``set_password()`` it leaves no raw password on the instance.
+    """
+    if update_fields is None or set(update_fields) != {'password'} or instance._password is not None:
+        return False
+    try:
+        hasher = identify_hasher(instance._loaded_password)
+    except (AttributeError, ValueError):
+        return False
+    return hasher.algorithm != get_hasher().algorithm or hasher.must_update(instance._loaded_password)
+
+
+@receiver(post_init, sender=User)
+def remember_loaded_password(sender, instance, **kwargs):
+    # Read from __dict__, a deferred password must not be loaded here.
+    instance._loaded_password = instance.__dict__.get('password')
+
+
+@receiver(post_save, sender=User)
+def revoke_tokens_on_user_change(sender, instance, created, update_fields=None, **kwargs):
+    if not created and (update_fields is None or TOKEN_REVOKING_FIELDS & set(update_fields)):
+        if not is_password_upgrade(instance, update_fields):
+            revoke_user_tokens(instance.pk)
+    remember_loaded_password(sender, instance)
+
+
+@receiver(post_delete, sender=User)
+def revoke_tokens_on_user_deletion(sender, instance, **kwargs):
+    revoke_user_tokens(instance.pk)
+
+
+@receiver(post_save, sender=Store)
+@receiver(post_delete, sender=Store)
+def bump_catalogue_version_on_store_change(sender, **kwargs):
+    transaction.on_commit(bump_catalogue_version)
+
+
+@receiver(post_save, sender=Store)
+def sync_opening_intervals_on_store_save(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or 'opening_hours' in update_fields:
+        sync_opening_intervals([instance])
+
+
+@receiver(post_save, sender=Store)
+def record_store_save(sender, instance, created, **kwargs):
+    record_changes([instance], StoreChange.CREATED if created else StoreChange.UPDATED)
+
+
+@receiver(post_delete, sender=Store)
+def record_store_deletion(sender, instance, **kwargs):
+    record_deletions([instance.pk])
+
+
+@receiver(connection_created)
+def measure_queries_on_connection(sender, connection, **kwargs):
+    install_query_wrapper(connection)
@@ -0,0 +1,61 @@
+from drf_spectacular.utils import OpenApiParameter
+from rest_framework import serializers
+from rest_framework.response import Response
+from .serializers import StoreSerializer
+
+FIELDS_PARAMETER = OpenApiParameter(
+    'fields', str, description='Comma separated store fields to return, e.g. id,name (default: all).'
+)
+
+
+def get_requested_fields(request):
+    """
+    Returns the store fields selected with ``?fields=id,name`` in serializer
+    order, or None if the parameter is missing.
+    """
+    if 'fields' not in request.query_params:
+        return None
+    names = {name.strip() for name in request.query_params['fields'].split(',') if name.strip()}
+    available = StoreSerializer.Meta.fields
+    unknown = sorted(names - set(available))
+    if unknown or not names:
+        raise serializers.ValidationError(
+            {'fields': [f"Choose from {', '.join(available)}." + (f" Unknown: {', '.join(unknown)}." if unknown else '')]}
+        )
+    return [name for name in available if name in names]
+
+
+class StoreSparseFieldsMixin:
+    """
+    Returns only the store fields given with ``?fields=`` and fetches only those
+    columns. Lists are read with ``values()`` and returned as they are, without
+    building model instances, which matches the serializer output because every
+    store field is a plain column.
+    """
+
+    def get_fields(self):
+        return get_requested_fields(self.request) if self.request.method == 'GET' else None
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fields = self.get_fields()
+        return queryset.only(*fields) if fields else queryset
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault('fields', self.get_fields())
+        return super().get_serializer(*args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        fields = self.get_fields() or StoreSerializer.Meta.fields
+        # Pagination positions are read from the id.
+        columns = fields if 'id' in fields else ['id', *fields]
+        queryset = self.filter_queryset(self.get_queryset()).values(*columns)
+
+        page = self.paginate_queryset(queryset)
+        rows = list(queryset if page is None else page)
+        if 'id' not in fields:
+            # Copies, the paginator still reads the id of the page rows for its links.
+            rows = [{field: row[field] for field in fields} for row in rows]
+        if page is None:
+            return Response(rows)
+        return self.get_paginated_response(rows)
@@ -0,0 +1,92 @@
+"""
+Worker startup: warming up a freshly started worker and measuring how long
+starting one takes. Imports Django lazily, so ``probe()`` can time the setup.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import time
+
+PROBE_REQUESTS = 2000
+
+
+def warm_up():
+    """
+    Does the work the first request would otherwise pay for: resolving the
+    URLconf, which imports every view, and importing DRF's configured classes.
+
+    Database connections are left to the threads serving requests. A connection
+    made here would be shared by forked workers or sit unused in this thread.
+    """
+    from django.urls import get_resolver
+    from rest_framework.settings import api_settings
+
+    get_resolver().url_patterns
+    for name in ['DEFAULT_RENDERER_CLASSES', 'DEFAULT_PARSER_CLASSES', 'DEFAULT_AUTHENTICATION_CLASSES',
+                 'DEFAULT_PERMISSION_CLASSES', 'DEFAULT_CONTENT_NEGOTIATION_CLASS', 'DEFAULT_PAGINATION_CLASS']:
+        getattr(api_settings, name)
+
+
+def middleware_overhead(path='/stores/', requests=PROBE_REQUESTS):
+    """
+    Returns the microseconds per request spent in ``MIDDLEWARE`` around a view
+    that does nothing.
+    """
+    from django.conf import settings
+    from django.http import HttpResponse
+    from django.test import RequestFactory
+    from django.utils.module_loading import import_string
+
+    handler = lambda request: HttpResponse()  # noqa: E731
+    for middleware in reversed(settings.MIDDLEWARE):
+        handler = import_string(middleware)(handler)
+    factory = RequestFactory()
+    host = next((host for host in settings.ALLOWED_HOSTS if host != '*' and not host.startswith('.')), 'localhost')
+    start = time.perf_counter()
+    for _ in range(requests):
+        handler(factory.get(path, HTTP_HOST=host))
+    return (time.perf_counter() - start) / requests * 1000 * 1000
+
+
+def probe():
+    """
+    Starts the WSGI application the way a worker does and prints the startup
+    time, the number of imported modules, the warm-up time and the middleware
+    overhead as JSON. Run in a fresh interpreter, see ``measure_startup()``.
+    """
+    start = time.perf_counter()
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'store_api.settings')
+    from django.core.wsgi import get_wsgi_application
+    get_wsgi_application()
+    startup = time.perf_counter() - start
+    modules = len(sys.modules)
+
+    start = time.perf_counter()
+    warm_up()
+    warm_up_time = time.perf_counter() - start
+    print(json.dumps({
+        'startup_ms': startup * 1000,
+        'modules': modules,
+        'warm_up_ms': warm_up_time * 1000,
+        'middleware_us': middleware_overhead(),
+    }))
+
+
+def measure_startup(profile, repeat=5):
+    """
+    Runs ``probe()`` ``repeat`` times in new interpreters with the given
+    STORE_APP_PROFILE and returns the fastest run. Unless STORE_DB_NAME is set,
+    the probe connects to an in-memory SQLite database.
+    """
+    environ = {'STORE_DB_NAME': ':memory:', **os.environ, 'STORE_APP_PROFILE': profile}
+    project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, '-c', 'from store_api.startup import probe; probe()'],
+            env=environ, cwd=project_dir, capture_output=True, text=True, check=True,
+        ).stdout
+        runs.append(json.loads(output.splitlines()[-1]))
+    return {key: min(run[key] for run in runs) for key in runs[0]}
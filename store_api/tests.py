@@ -1,7 +1,58 @@
-from django.test import TestCase
+from asgiref.sync import iscoroutinefunction
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.core.cache import cache
+from django.core.handlers.base import BaseHandler
+from django.db import OperationalError, connection, transaction
+from django.db.utils import ConnectionHandler
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from django.contrib.auth.models import User, Group
-from store_api.models import Store
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ErrorDetail
+from rest_framework.renderers import JSONRenderer
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import AccessToken
+from store_api.authentication import StoreTokenUser
+from store_api.benchmark import (
+    ENDPOINTS, QUERY_BUDGETS, benchmark_context, check_query_budgets, compare_results, run_benchmark, serialization_benchmark,
+)
+from store_api import geo
+from store_api.bulk import apply_bulk
+from store_api.cache import get_cache_stats, get_store_cache
+from store_api.database import database_settings, replica_settings
+from store_api.fuzzy import get_trigram_index, reset_trigram_indexes, similarity, trigrams
+from store_api.geo import encode_geohash, nearest_store_ids, neighbourhood
+from store_api.management.commands.refresh_replicas import copy_sqlite_database
+from store_api.metrics import reset_metrics
+from store_api.jobs import claim_jobs, requeue_stale_jobs, run_job, submit_job
+from store_api.models import BlacklistedRefreshToken, Job, OpeningInterval, Store, StoreChange, StoreChangeCompaction
+from store_api.opening_hours import parse_opening_hours
+from store_api.permissions import get_user_roles
+from store_api.renderers import StoreJSONRenderer
+from store_api.routers import StoreReplicaRouter, routed_request, sticky_cache_key
+from store_api.serializers import StoreSerializer
+from store_api.startup import measure_startup, middleware_overhead, warm_up
+from store_api.tokens import StoreRefreshToken
+from unittest import mock, skipUnless
+import asyncio
+import csv
+import datetime
+import gzip
+import io
 import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import yaml
+from pathlib import Path
 
 USERDATA = {
     "username": "user",
@@ -14,6 +65,17 @@ STOREDATA = {
     "opening_hours": "9am-5pm"
 }
 
+# The tests log in far more often than the token throttles allow, TestTokenThrottling sets its own rates.
+without_throttling = override_settings(
+    REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": {"token": None, "token_username": None}}
+)
+
+def setUpModule():
+    without_throttling.enable()
+
+def tearDownModule():
+    without_throttling.disable()
+
 def assert_401(self, response):
     self.assertEqual(response.status_code, 401)
     self.assertIn("Authentication credentials were not provided.", response.json()["detail"])
@@ -109,13 +171,17 @@ class TestStoreAPI(TestCase):
                 "id": 11,
                 "name": "Store 11",
                 "address": "Address 11",
-                "opening_hours": "9am-5pm"
+                "opening_hours": "9am-5pm",
+                "latitude": None,
+                "longitude": None
             },
             {
                 "id": 12,
                 "name": "Store 12",
                 "address": "Address 12",
-                "opening_hours": "9am-5pm"
+                "opening_hours": "9am-5pm",
+                "latitude": None,
+                "longitude": None
             }
         ]
 
@@ -130,13 +196,17 @@ class TestStoreAPI(TestCase):
                 "id": 2,
                 "name": "Store 2",
                 "address": "Address 2",
-                "opening_hours": "9am-5pm"
+                "opening_hours": "9am-5pm",
+                "latitude": None,
+                "longitude": None
             },
             {
                 "id": 12,
                 "name": "Store 12",
                 "address": "Address 12",
-                "opening_hours": "9am-5pm"
+                "opening_hours": "9am-5pm",
+                "latitude": None,
+                "longitude": None
             }
         ]
 
@@ -248,3 +318,1659 @@ class TestStoreAPI(TestCase):
 
         self.assertEqual(response.status_code, 403)
         self.assertIn("You do not have permission to perform this action.", response.json()["detail"])
+
+class TestStoreSearch(TestCase):
+
+    def setUp(self):
+        User.objects.create_user(username="user", password="password")
+        token_response = self.client.post("/api/token/", data=USERDATA)
+        self.access_token = token_response.json()["access"]
+
+    def search(self, term):
+        response = self.client.get(f"/stores/?search={term}", HTTP_AUTHORIZATION=f"Bearer {self.access_token}")
+        self.assertEqual(response.status_code, 200)
+        return [store["name"] for store in response.json()["results"]]
+
+    def test_search_matches_substrings_case_insensitive(self):
+        Store.objects.create(name="Top Store", address="Megastraße 4, 54321 Wowstadt", opening_hours="Mo-Fr 8:00 - 14:00")
+        Store.objects.create(name="Super Store", address="Boah Weg 25, 54321 Wowstadt", opening_hours="Mo-Fr 6:00 - 21:00")
+
+        self.assertEqual(["Top Store"], self.search("megastr"))
+        self.assertEqual(["Top Store", "Super Store"], self.search("wowstadt"))
+        self.assertEqual(["Super Store"], self.search("boah 25"))
+
+    def test_search_ranks_best_match_first(self):
+        Store.objects.create(name="Corner Shop", address="Bakery Lane 1", opening_hours="Mo-Fr 6:00 - 18:00")
+        Store.objects.create(name="Bakery Bakery", address="Bakery Lane 2", opening_hours="Mo-Fr 6:00 - 18:00")
+
+        self.assertEqual(["Bakery Bakery", "Corner Shop"], self.search("bakery"))
+
+    def test_search_index_follows_updates_and_deletes(self):
+        store = Store.objects.create(name="Old Name", address="Somewhere 1", opening_hours="Mo-Fr 6:00 - 18:00")
+        other = Store.objects.create(name="Old Timer", address="Somewhere 2", opening_hours="Mo-Fr 6:00 - 18:00")
+
+        store.name = "New Name"
+        store.save()
+        other.delete()
+
+        self.assertEqual([], self.search("old"))
+        self.assertEqual(["New Name"], self.search("new"))
+
+class TestStoreStream(TestCase):
+
+    def setUp(self):
+        for i in range(25):
+            Store.objects.create(name=f"Store {i+1}", address=f"Address {i+1}", opening_hours="9am-5pm")
+        User.objects.create_user(username="user", password="password")
+        token_response = self.client.post("/api/token/", data=USERDATA)
+        self.access_token = token_response.json()["access"]
+
+    def get(self, url):
+        response = self.client.get(url, HTTP_AUTHORIZATION=f"Bearer {self.access_token}")
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_api_get_stream_unauthorized(self):
+        response = self.client.get("/stores/stream")
+        assert_401(self, response)
+
+    def test_stream_walks_catalogue_with_cursors(self):
+        ids = []
+        url = "/stores/stream?page_size=10"
+        while url:
+            page = self.get(url)
+            self.assertNotIn("count", page)
+            ids += [store["id"] for store in page["results"]]
+            url = page["next"]
+        self.assertEqual(list(Store.objects.order_by("id").values_list("id", flat=True)), ids)
+
+        last_page = self.get("/stores/stream?page_size=10")
+        second_page = self.get(last_page["next"])
+        previous_page = self.get(second_page["previous"])
+        self.assertEqual(last_page["results"], previous_page["results"])
+
+    def test_stream_does_not_count(self):
+        # One query loads the JWT user, the other fetches the page.
+        with self.assertNumQueries(2):
+            self.get("/stores/stream")
+
+    @override_settings(STORE_PAGINATION={"PAGE_SIZE": 10, "MAX_PAGE_SIZE": 5})
+    def test_stream_caps_page_size(self):
+        page = self.get("/stores/stream?page_size=50")
+        self.assertEqual(5, len(page["results"]))
+
+class TestStoreRoles(TestCase):
+
+    def setUp(self):
+        self.manager_group = Group.objects.create(name="manager")
+        self.user = User.objects.create_user(username="user", password="password")
+        self.user.groups.set([self.manager_group])
+
+    def test_access_token_carries_roles(self):
+        token_response = self.client.post("/api/token/", data=USERDATA)
+        access_token = AccessToken(token_response.json()["access"])
+
+        self.assertEqual(["manager"], access_token["roles"])
+
+    def test_login_reads_the_user_once(self):
+        get_user_roles(self.user.pk)
+        with CaptureQueriesContext(connection) as queries:
+            token_response = self.client.post("/api/token/", data=USERDATA)
+        self.assertEqual(200, token_response.status_code)
+        self.assertEqual(1, len([query for query in queries.captured_queries if "auth_user" in query["sql"]]))
+        self.assertEqual(["manager"], AccessToken(token_response.json()["access"])["roles"])
+
+    def test_write_permission_check_does_not_query_groups(self):
+        store = Store.objects.create(name="Store 1", address="123 Main St", opening_hours="9am-5pm")
+        token_response = self.client.post("/api/token/", data=USERDATA)
+        access_token = token_response.json()["access"]
+
+        # The manager role comes from the token, not from a group lookup.
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.put(f"/stores/{store.id}", data=json.dumps(STOREDATA), content_type="application/json", HTTP_AUTHORIZATION=f"Bearer {access_token}")
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([query for query in queries.captured_queries if "auth_group" in query["sql"]])
+
+    def test_role_cache_is_invalidated_by_group_changes(self):
+        self.assertEqual(["manager"], get_user_roles(self.user.pk))
+        with self.assertNumQueries(0):
+            get_user_roles(self.user.pk)
+
+        self.user.groups.remove(self.manager_group)
+        self.assertEqual([], get_user_roles(self.user.pk))
+
+        self.manager_group.user_set.add(self.user)
+        self.assertEqual(["manager"], get_user_roles(self.user.pk))
+
+    def test_refreshed_access_token_picks_up_role_changes(self):
+        token_response = self.client.post("/api/token/", data=USERDATA)
+        self.user.groups.clear()
+
+        response = self.client.post("/api/token/refresh/", data={"refresh": token_response.json()["refresh"]})
+        access_token = response.json()["access"]
+        self.assertEqual([], AccessToken(access_token)["roles"])
+
+        response = self.client.post("/stores/", data=STOREDATA, HTTP_AUTHORIZATION=f"Bearer {access_token}")
+        self.assertEqual(response.status_code, 403)
+
+class TestStoreAuthentication(TestCase):
+
+    def setUp(self):
+        Store.objects.create(name="Store 1", address="123 Main St", opening_hours="9am-5pm")
+        self.user = User.objects.create_user(username="user", password="password", email="user@example.com")
+        token_response = self.client.post("/api/token/", data=USERDATA)
+        self.access_token = token_response.json()["access"]
+        self.refresh_token = token_response.json()["refresh"]
+
+    @override_settings(STORE_AUTH={"STATELESS": True})
+    def test_stateless_authentication_does_not_load_user(self):
+        # Validators, count and page, but no user row.
+        with self.assertNumQueries(3):
+            response = self.client.get("/stores/", HTTP_AUTHORIZATION=f"Bearer {self.access_token}")
+        self.assertEqual(response.status_code, 200)
+
+    def test_token_user_loads_user_row_on_demand(self):
+        token_user = StoreTokenUser(AccessToken(self.access_token))
+
+        with self.assertNumQueries(0):
+            self.assertEqual("user", token_user.username)
+            self.assertFalse(token_user.is_staff)
+            self.assertEqual([], token_user.roles)
+        with self.assertNumQueries(1):
+            self.assertEqual("user@example.com", token_user.email)
+            self.assertEqual("user@example.com", token_user.email)
+
+    def test_changed_user_tokens_are_revoked(self):
+        self.user.is_active = False
+        with mock.patch("store_api.authentication.time.time", return_value=time.time() + 5):
+            self.user.save()
+
+        response = self.client.get("/stores/", HTTP_AUTHORIZATION=f"Bearer {self.access_token}")
+        self.assertEqual(response.status_code, 401)
+        response = self.client.post("/api/token/refresh/", data={"refresh": self.refresh_token})
+        self.assertEqual(response.status_code, 401)
+
+    @override_settings(STORE_AUTH={"STATELESS": True})
+    def test_tokens_issued_in_the_millisecond_of_the_revocation_are_revoked(self):
+        issued_at = AccessToken(self.access_token)["iat_ms"]
+        self.user.is_active = False
+        with mock.patch("store_api.authentication.time.time", return_value=(issued_at + 0.5) / 1000):
+            self.user.save()
+
+        response = self.client.get("/stores/", HTTP_AUTHORIZATION=f"Bearer {self.access_token}")
+        self.assertEqual(response.status_code, 401)
+        response = self.client.post("/api/token/refresh/", data={"refresh": self.refresh_token})
+        self.assertEqual(response.status_code, 401)
+
+    def test_tokens_issued_after_the_revocation_are_accepted(self):
+        self.user.set_password("password")
+        self.user.save()
+
+        token_response = self.client.post("/api/token/", data=USERDATA)
+        response = self.client.get("/stores/", HTTP_AUTHORIZATION=f"Bearer {token_response.json()['access']}")
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post("/api/token/refresh/", data={"refresh": token_response.json()["refresh"]})
+        self.assertEqual(response.status_code, 200)
+
+    def test_last_login_update_does_not_revoke_tokens(self):
+        with mock.patch("store_api.authentication.time.time", return_value=time.time() + 5):
+            self.user.save(update_fields=["last_login"])
+
+        response = self.client.get("/stores/", HTTP_AUTHORIZATION=f"Bearer {self.access_token}")
+        self.assertEqual(response.status_code, 200)
+
+class TestStoreResponseCache(TransactionTestCase):
+    # Reads go to the replicas when STORE_DB_REPLICAS is set.
+    databases = "__all__"
+
+    def setUp(self):
+        get_store_cache().clear()
+        self.store = Store.objects.create(name="Store 1", address="123 Main St", opening_hours="9am-5pm")
+        manager_group = Group.objects.create(name="manager")
+        user = User.objects.create_user(username="user", password="password")
+        user.groups.set([manager_group])
+        token_response = self.client.post("/api/token/", data=USERDATA)
+        self.access_token = token_response.json()["access"]
+
+    def get(self, url):
+        return self.client.get(url, HTTP_AUTHORIZATION=f"Bearer {self.access_token}")
+
+    def test_repeated_get_is_served_from_cache(self):
+        stats = get_cache_stats()
+        first = self.get(f"/stores/{self.store.id}")
+        # Only the JWT user is loaded for the cached response.
+        with self.assertNumQueries(1):
+            second = self.get(f"/stores/{self.store.id}")
+
+        self.assertEqual("MISS", first["X-Cache"])
+        self.assertEqual("HIT", second["X-Cache"])
+        self.assertEqual(first.json(), second.json())
+        self.assertEqual(stats["hits"] + 1, get_cache_stats()["hits"])
+        self.assertEqual(stats["misses"] + 1, get_cache_stats()["misses"])
+
+    def test_query_string_is_part_of_the_key(self):
+        self.get("/stores/?search=store")
+        self.assertEqual("MISS", self.get("/stores/?search=main")["X-Cache"])
+        self.assertEqual("HIT", self.get("/stores/?search=store")["X-Cache"])
+
+    def test_store_writes_invalidate_cached_responses(self):
+        self.get("/stores/")
+        self.get(f"/stores/{self.store.id}")
+
+        response = self.client.put(f"/stores/{self.store.id}", data=json.dumps(STOREDATA), content_type="application/json", HTTP_AUTHORIZATION=f"Bearer {self.access_token}")
+        self.assertEqual(response.status_code, 200)
+
+        detail = self.get(f"/stores/{self.store.id}")
+        self.assertEqual("MISS", detail["X-Cache"])
+        self.assertEqual(STOREDATA["address"], detail.json()["address"])
+
+        Store.objects.create(name="Store 2", address="456 Side St", opening_hours="9am-5pm")
+        listing = self.get("/stores/")
+        self.assertEqual("MISS", listing["X-Cache"])
+        self.assertEqual(2, listing.json()["count"])
+
+    def test_open_now_is_not_cached(self):
+        self.get("/stores/?open_now=true")
+        self.assertNotIn("X-Cache", self.get("/stores/?open_now=true"))
+        self.get("/stores/?open_at=2026-10-19T11:00")
+        self.assertEqual("HIT", self.get("/stores/?open_at=2026-10-19T11:00")["X-Cache"])
+
+class TestStoreConditionalRequests(TestCase):
+
+    def setUp(self):
+        self.store = Store.objects.create(name="Store 1", address="123 Main St", opening_hours="9am-5pm")
+        manager_group = Group.objects.create(name="manager")
+        user = User.objects.create_user(username="user", password="password")
+        user.groups.set([manager_group])
+        token_response = self.client.post("/api/token/", data=USERDATA)
+        self.access_token = token_response.json()["access"]
+
+    def get(self, url, **headers):
+        return self.client.get(url, HTTP_AUTHORIZATION=f"Bearer {self.access_token}", **headers)
+
+    def test_get_store_not_modified(self):
+        response = self.get(f"/stores/{self.store.id}")
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+
+        response = self.get(f"/stores/{self.store.id}", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(b"", response.content)
+        self.assertEqual(etag, response["ETag"])
+
+        response = self.get(f"/stores/{self.store.id}", HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        self.assertEqual(response.status_code, 304)
+
+        self.store.name = "Store 2"
+        self.store.save()
+        response = self.get(f"/stores/{self.store.id}", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(etag, response["ETag"])
+
+    def test_get_stores_not_modified(self):
+        etag = self.get("/stores/")["ETag"]
+        self.assertEqual(304, self.get("/stores/", HTTP_IF_NONE_MATCH=etag).status_code)
+
+        other = Store.objects.create(name="Store 2", address="456 Side St", opening_hours="9am-5pm")
+        response = self.get("/stores/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        other.delete()
+        self.assertEqual(304, self.get("/stores/", HTTP_IF_NONE_MATCH=etag).status_code)
+        self.store.delete()
+        self.assertEqual(200, self.get("/stores/", HTTP_IF_NONE_MATCH=etag).status_code)
+
+    def test_put_store_with_stale_etag_fails(self):
+        etag = self.get(f"/stores/{self.store.id}")["ETag"]
+        Store.objects.filter(id=self.store.id).update(name="Changed elsewhere", updated_at=timezone.now())
+
+        response = self.client.put(f"/stores/{self.store.id}", data=json.dumps(STOREDATA), content_type="application/json", HTTP_AUTHORIZATION=f"Bearer {self.access_token}", HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual("Changed elsewhere", Store.objects.get(id=self.store.id).name)
+
+        response = self.client.delete(f"/stores/{self.store.id}", HTTP_AUTHORIZATION=f"Bearer {self.access_token}", HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 412)
+
+    def test_put_store_with_current_etag_succeeds(self):
+        etag = self.get(f"/stores/{self.store.id}")["ETag"]
+
+        response = self.client.put(f"/stores/{self.store.id}", data=json.dumps(STOREDATA), content_type="application/json", HTTP_AUTHORIZATION=f"Bearer {self.access_token}", HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get(f"/stores/{self.store.id}")["ETag"], response["ETag"])
+
+class TestStoreBulk(TestCase):
+
+    def setUp(self):
+        manager_group = Group.objects.create(name="manager")
+        user = User.objects.create_user(username="user", password="password")
+        user.groups.set([manager_group])
+        token_response = self.client.post("/api/token/", data=USERDATA)
+        self.access_token = token_response.json()["access"]
+
+    def bulk(self, data, access_token=None):
+        return self.client.post("/stores/bulk", data=json.dumps(data), content_type="application/json", HTTP_AUTHORIZATION=f"Bearer {access_token or self.access_token}")
+
+    def test_api_post_bulk_unauthorized(self):
+        response = self.client.post("/stores/bulk", data={})
+        assert_401(self, response)
+
+    def test_api_post_bulk_not_as_manager(self):
+        User.objects.create_user(username="other", password="password")
+        token_response = self.client.post("/api/token/", data={"username": "other", "password": "password"})
+
+        response = self.bulk({"create": [STOREDATA]}, access_token=token_response.json()["access"])
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(0, Store.objects.count())
+
+    def test_bulk_reports_every_item(self):
+        kept = Store.objects.create(name="Kept", address="1 Main St", opening_hours="9am-5pm")
+        removed = Store.objects.create(name="Removed", address="2 Main St", opening_hours="9am-5pm")
+
+        response = self.bulk({
+            "create": [STOREDATA, {"name": "No address"}],
+            "upsert": [{**STOREDATA, "id": kept.id, "name": "Renamed"}, {**STOREDATA, "name": "Upserted"}, {**STOREDATA, "id": 999}],
+            "delete": [removed.id, 999],
+        })
+        self.assertEqual(response.status_code, 200)
+        results = response.json()
+
+        self.assertEqual([201, 400], [result["status"] for result in results["create"]])
+        self.assertEqual(STOREDATA["name"], results["create"][0]["store"]["name"])
+        self.assertIn("address", results["create"][1]["errors"])
+        self.assertEqual([200, 201, 404], [result["status"] for result in results["upsert"]])
+        self.assertEqual("Renamed", results["upsert"][0]["store"]["name"])
+        self.assertEqual([204, 404], [result["status"] for result in results["delete"]])
+
+        self.assertEqual(["Renamed", STOREDATA["name"], "Upserted"], list(Store.objects.order_by("id").values_list("name", flat=True)))
+        self.assertGreater(Store.objects.get(id=kept.id).updated_at, kept.updated_at)
+
+    def test_bulk_query_count_does_not_grow_with_items(self):
+        stores = [Store.objects.create(name=f"Store {i}", address="Main St", opening_hours="9am-5pm") for i in range(20)]
+        data = {
+            "create": [STOREDATA] * 20,
+            "upsert": [{**STOREDATA, "id": store.id} for store in stores[:10]],
+        }
+        with CaptureQueriesContext(connection) as queries:
+            response = self.bulk(data)
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(len(queries.captured_queries), 10)
+        self.assertEqual(40, Store.objects.count())
+
+    def test_bulk_rejects_stores_upserted_and_deleted(self):
+        store = Store.objects.create(name="Store", address="1 Main St", opening_hours="Mo-Fr 8:00 - 18:00")
+        since = StoreChange.objects.order_by("-seq").values_list("seq", flat=True).first()
+
+        response = self.bulk({"upsert": [{**STOREDATA, "id": store.id, "name": "Renamed"}], "delete": [store.id]})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()
+        self.assertEqual([400], [result["status"] for result in results["upsert"]])
+        self.assertEqual([400], [result["status"] for result in results["delete"]])
+        self.assertEqual("Store", Store.objects.get(id=store.id).name)
+        self.assertFalse(StoreChange.objects.filter(seq__gt=since).exists())
+
+    @override_settings(STORE_BULK={"MAX_ITEMS": 2})
+    def test_bulk_limits_items(self):
+        response = self.bulk({"create": [STOREDATA] * 3})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(0, Store.objects.count())
+
+class TestStoreExport(TestCase):
+
+    def setUp(self):
+        for i in range(5):
+            Store.objects.create(name=f"Store {i+1}", address=f"Badstraße {i+1}, 12345 Monopolis", opening_hours="Mo-Fr 6:00 - 18:00")
+        User.objects.create_user(username="user", password="password")
+        token_response = self.client.post("/api/token/", data=USERDATA)
+        self.access_token = token_response.json()["access"]
+
+    def export(self, url, **headers):
+        response = self.client.get(url, HTTP_AUTHORIZATION=f"Bearer {self.access_token}", **headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response
+
+    def test_api_get_export_unauthorized(self):
+        response = self.client.get("/stores/export")
+        self.assertEqual(response.status_code, 401)
+
+    @override_settings(STORE_EXPORT={"CHUNK_SIZE": 2})
+    def test_export_ndjson(self):
+        response = self.export("/stores/export")
+        self.assertEqual("application/x-ndjson; charset=utf-8", response["Content-Type"])
+
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        expected = list(Store.objects.order_by("id").values("id", "name", "address", "opening_hours", "latitude", "longitude"))
+        self.assertEqual(expected, [json.loads(line) for line in lines])
+
+    def test_export_csv(self):
+        response = self.export("/stores/export?format=csv")
+        self.assertEqual("text/csv; charset=utf-8", response["Content-Type"])
+
+        rows = list(csv.reader(io.StringIO(b"".join(response.streaming_content).decode())))
+        self.assertEqual(["id", "name", "address", "opening_hours", "latitude", "longitude"], rows[0])
+        self.assertEqual(["Store 1", "Badstraße 1, 12345 Monopolis"], rows[1][1:3])
+        self.assertEqual(6, len(rows))
+
+    def test_export_gzip(self):
+        response = self.export("/stores/export", HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual("gzip", response["Content-Encoding"])
+
+        lines = gzip.decompress(b"".join(response.streaming_content)).decode().splitlines()
+        self.assertEqual(5, len(lines))
+
+class TestSeedCommand(TestCase):
+
+    def seed(self, **options):
+        output = io.StringIO()
+        call_command("seed", stdout=output, **options)
+        return output.getvalue()
+
+    def test_seed_fixed_stores(self):
+        output = self.seed()
+        self.assertEqual(15, Store.objects.count())
+        self.assertEqual(3, User.objects.count())
+        self.assertIn("Created 15 stores", output)
+        self.assertIn("rows/s", output)
+
+    def test_seed_synthetic_stores_in_batches(self):
+        self.seed(count=50, batch_size=7)
+        self.assertEqual(50, Store.objects.count())
+        self.assertEqual("Store 50", Store.objects.order_by("id").last().name)
+
+    def test_seed_from_files(self):
+        rows = [{"id": 7, "name": "Imported", "address": "Importweg 1", "opening_hours": "Mo-Fr 8:00 - 16:00"}]
+        with tempfile.TemporaryDirectory() as directory:
+            ndjson_path = os.path.join(directory, "stores.ndjson")
+            with open(ndjson_path, "w") as file:
+                file.write("\n".join(json.dumps(row) for row in rows * 3))
+            self.seed(from_file=ndjson_path)
+            self.assertEqual(["Imported"] * 3, list(Store.objects.values_list("name", flat=True)))
+
+            csv_path = os.path.join(directory, "stores.csv")
+            with open(csv_path, "w", newline="") as file:
+                writer = csv.DictWriter(file, fieldnames=rows[0].keys())
+                writer.writeheader()
+                writer.writerows(rows * 2)
+            self.seed(from_file=csv_path)
+            self.assertEqual(2, Store.objects.filter(address="Importweg 1").count())
+
+    def test_seed_rejects_incomplete_rows(self):
+        self.seed()
+        with tempfile.NamedTemporaryFile("w", suffix=".ndjson") as file:
+            file.write(json.dumps(STOREDATA) + "\n" + json.dumps({"name": "No address"}))
+            file.flush()
+            with self.assertRaisesMessage(CommandError, "Row 2 of"):
+                self.seed(from_file=file.name)
+        self.assertEqual(15, Store.objects.count())
+        self.assertEqual(3, User.objects.count())
+
+    def test_seed_rejects_invalid_json(self):
+        self.seed()
+        with tempfile.NamedTemporaryFile("w", suffix=".ndjson") as file:
+            file.write(json.dumps(STOREDATA) + "\n\n{\"name\": \n")
+            file.flush()
+            with self.assertRaisesMessage(CommandError, "Row 3 of"):
+                self.seed(from_file=file.name)
+        self.assertEqual(15, Store.objects.count())
+
+class TestBenchmark(TestCase):
+
+    def setUp(self):
+        # The fuzzy endpoint has to build its trigram index, whichever tests ran before.
+        reset_trigram_indexes()
+        self.addCleanup(reset_trigram_indexes)
+        # Addresses like the seeded ones, so the fuzzy endpoint finds stores.
+        for i in range(15):
+            Store.objects.create(name=f"Store {i+1}", address=f"Badstraße {i+1}", opening_hours="9am-5pm")
+
+    def test_benchmark_reports_every_endpoint(self):
+        results = run_benchmark(ENDPOINTS, 3, 1, benchmark_context())
+
+        self.assertEqual([endpoint.name for endpoint in ENDPOINTS], list(results))
+        for result in results.values():
+            self.assertEqual(3, result["requests"])
+            self.assertLessEqual(result["latency_ms"]["p50"], result["latency_ms"]["p99"])
+
+    def test_endpoints_stay_within_query_budgets(self):
+        # Nothing is cached inside the test transaction, so these are cold requests.
+        results = run_benchmark(ENDPOINTS, 2, 1, benchmark_context())
+
+        self.assertEqual([], check_query_budgets(results))
+        self.assertEqual(QUERY_BUDGETS, {name: result["queries_per_request"]["max"] for name, result in results.items()})
+
+    def test_compare_results_flags_regressions(self):
+        baseline = {"list": {"latency_ms": {"p95": 10.0}, "queries_per_request": {"max": 4}}}
+        faster = {"list": {"latency_ms": {"p95": 11.0}, "queries_per_request": {"max": 4}}}
+        slower = {"list": {"latency_ms": {"p95": 13.0}, "queries_per_request": {"max": 5}}}
+
+        self.assertEqual([], compare_results(faster, baseline, tolerance=0.2))
+        self.assertEqual(2, len(compare_results(slower, baseline, tolerance=0.2)))
+
+class TestStoreAsyncViews(TestCase):
+
+    def setUp(self):
+        for i in range(15):
+            Store.objects.create(name=f"Store {i+1}", address=f"Address {i+1}", opening_hours="9am-5pm")
+        User.objects.create_user(username="user", password="password")
+        token_response = self.client.post("/api/token/", data=USERDATA)
+        self.access_token = token_response.json()["access"]
+
+    def get(self, url, **headers):
+        return self.client.get(url, HTTP_AUTHORIZATION=f"Bearer {self.access_token}", **headers)
+
+    def test_async_views_answer_like_sync_views(self):
+        store_id = Store.objects.first().id
+        for query in ["", "?page=2", "?page=last", "?page=3", "?page=x", "?search=store 1", "?search=2"]:
+            sync_response = self.get(f"/stores/{query}")
+            async_response = self.get(f"/async/stores/{query}")
+            self.assertEqual(sync_response.status_code, async_response.status_code, query)
+            self.assertEqual(sync_response.json(), json.loads(async_response.content.decode().replace("/async/stores/", "/stores/")), query)
+            self.assertEqual(sync_response.get("ETag"), async_response.get("ETag"), query)
+
+        for url in [f"{store_id}", "999"]:
+            sync_response = self.get(f"/stores/{url}")
+            async_response = self.get(f"/async/stores/{url}")
+            self.assertEqual(sync_response.status_code, async_response.status_code)
+            self.assertEqual(sync_response.content, async_response.content)
+
+    def assert_async_list_like_sync(self, query):
+        sync_response = self.get(f"/stores/{query}")
+        async_response = self.get(f"/async/stores/{query}")
+        self.assertEqual(sync_response.status_code, async_response.status_code, query)
+        self.assertEqual(sync_response.json(), json.loads(async_response.content.decode().replace("/async/stores/", "/stores/")), query)
+        self.assertEqual(sync_response.get("ETag"), async_response.get("ETag"), query)
+        return async_response
+
+    def test_async_list_filters_by_location(self):
+        for i, (latitude, longitude) in enumerate([(52.52, 13.40), (52.53, 13.41), (48.14, 11.58)]):
+            store = Store.objects.get(name=f"Store {i+1}")
+            store.latitude, store.longitude = latitude, longitude
+            store.set_geohash()
+            store.save()
+
+        response = self.assert_async_list_like_sync("?near=52.52,13.40&limit=2")
+        self.assertEqual(["Store 1", "Store 2"], [store["name"] for store in response.json()["results"]])
+        response = self.assert_async_list_like_sync("?bbox=11,48,12,49")
+        self.assertEqual(["Store 3"], [store["name"] for store in response.json()["results"]])
+        self.assertEqual(400, self.assert_async_list_like_sync("?near=north").status_code)
+        self.assertEqual(400, self.assert_async_list_like_sync("?bbox=1,2,3").status_code)
+
+    def test_async_list_fetches_stores_by_id(self):
+        first, second = Store.objects.order_by("id").values_list("id", flat=True)[:2]
+        response = self.assert_async_list_like_sync(f"?ids={second},{first},999&search=nothing")
+        self.assertEqual([second, first, 999], [result["id"] for result in response.json()["results"]])
+        self.assertEqual(["Store 2", "Store 1"], [result["store"]["name"] for result in response.json()["results"][:2]])
+        self.assert_async_list_like_sync(f"?ids={first}&fields=id,name")
+        self.assertEqual(400, self.assert_async_list_like_sync("?ids=one").status_code)
+
+    def test_async_list_fuzzy_search(self):
+        reset_trigram_indexes()
+        self.addCleanup(reset_trigram_indexes)
+        Store.objects.filter(name="Store 3").update(address="Badstraße 3")
+
+        response = self.assert_async_list_like_sync("?fuzzy=Badstrase")
+        self.assertEqual(["Store 3"], [store["name"] for store in response.json()["results"]])
+        self.assertEqual(0, self.assert_async_list_like_sync("?fuzzy=Badstrase&search=Store 1").json()["count"])
+
+    def test_async_views_require_authentication(self):
+        response = self.client.get("/async/stores/")
+        assert_401(self, response)
+        self.assertEqual(self.client.get("/stores/")["WWW-Authenticate"], response["WWW-Authenticate"])
+
+        response = self.client.get("/async/stores/1", HTTP_AUTHORIZATION="Bearer wrong")
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual("token_not_valid", response.json()["code"])
+
+    def test_async_views_answer_conditional_requests(self):
+        store_id = Store.objects.first().id
+        etag = self.get(f"/stores/{store_id}")["ETag"]
+        self.assertEqual(304, self.get(f"/async/stores/{store_id}", HTTP_IF_NONE_MATCH=etag).status_code)
+        etag = self.get("/async/stores/")["ETag"]
+        self.assertEqual(304, self.get("/stores/", HTTP_IF_NONE_MATCH=etag).status_code)
+
+    @override_settings(STORE_AUTH={"STATELESS": True})
+    def test_async_views_with_stateless_authentication(self):
+        store_id = Store.objects.first().id
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get(f"/async/stores/{store_id}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(1, len(queries))
+
+    async def test_concurrent_async_requests(self):
+        headers = {"Authorization": f"Bearer {self.access_token}"}
+        responses = await asyncio.gather(*[
+            self.async_client.get(f"/async/stores/?page={page % 2 + 1}", headers=headers) for page in range(20)
+        ])
+        self.assertEqual({200}, {response.status_code for response in responses})
+        self.assertEqual({10, 5}, {len(response.json()["results"]) for response in responses})
+
+class TestStoreOpeningHours(TestCase):
+
+    def setUp(self):
+        self.early = Store.objects.create(name="Early Store", address="Address 1", opening_hours="Mo-Fr 6:00 - 18:00, Sa 6:00 - 14:00, So 8:00 - 12:00")
+        self.split = Store.objects.create(name="Split Store", address="Address 2", opening_hours="Mo,Di 6:00 - 12:00, 13:00 - 18:00, Mi-Fr 8:00 - 14:00")
+        self.late = Store.objects.create(name="Late Store", address="Address 3", opening_hours="Do,Fr 18:00 - 2:00")
+        self.unknown = Store.objects.create(name="Unknown Store", address="Address 4", opening_hours="9am-5pm")
+        User.objects.create_user(username="user", password="password")
+        token_response = self.client.post("/api/token/", data=USERDATA)
+        self.access_token = token_response.json()["access"]
+
+    def get_names(self, url):
+        response = self.client.get(url, HTTP_AUTHORIZATION=f"Bearer {self.access_token}")
+        self.assertEqual(response.status_code, 200)
+        return [store["name"] for store in response.json()["results"]]
+
+    def test_parse_opening_hours(self):
+        self.assertEqual([(0, 360, 720), (0, 780, 1080), (1, 360, 720), (1, 780, 1080), (2, 480, 840), (3, 480, 840), (4, 480, 840)],
+                         parse_opening_hours("Mo,Di 6:00 - 12:00, 13:00 - 18:00, Mi-Fr 8:00 - 14:00"))
+        self.assertEqual([(3, 360, 1080), (4, 360, 1080), (5, 480, 720)], parse_opening_hours("Do,Fr 6:00 - 18:00, Sa 8:00 - 12:00"))
+        self.assertEqual([(0, 0, 120), (5, 1320, 1440), (6, 0, 120), (6, 1320, 1440)], parse_opening_hours("Sa-Su 22:00-02:00"))
+        self.assertEqual([(4, 480, 1440)], parse_opening_hours("Fr 08:00-24:00"))
+        for text in ["9am-5pm", "", "Mo-Fr", "Xy 6:00 - 18:00", "Mo 25:00 - 26:00", "13:00 - 18:00"]:
+            self.assertEqual([], parse_opening_hours(text), text)
+
+    def test_intervals_follow_store_writes(self):
+        self.assertEqual(7, self.early.opening_intervals.count())
+        self.assertEqual(0, self.unknown.opening_intervals.count())
+
+        self.unknown.opening_hours = "Mo 9:00 - 17:00"
+        self.unknown.save()
+        self.assertEqual([(0, 540, 1020)], list(self.unknown.opening_intervals.values_list("weekday", "opens", "closes")))
+
+        self.unknown.name = "Known Store"
+        self.unknown.save(update_fields=["name"])
+        self.assertEqual(1, self.unknown.opening_intervals.count())
+
+        apply_bulk(create=[{"name": "Bulk Store", "address": "Address 5", "opening_hours": "Sa 10:00 - 16:00"}],
+                   upsert=[{"id": self.unknown.id, "name": "Known Store", "address": "Address 4", "opening_hours": "Sa 9:00 - 12:00"}])
+        self.assertEqual([(5, 600, 960)], list(Store.objects.get(name="Bulk Store").opening_intervals.values_list("weekday", "opens", "closes")))
+        self.assertEqual([(5, 540, 720)], list(self.unknown.opening_intervals.values_list("weekday", "opens", "closes")))
+
+    def test_get_stores_open_at(self):
+        # 2026-10-19 is a Monday.
+        self.assertEqual(["Early Store", "Split Store"], self.get_names("/stores/?open_at=2026-10-19T11:00"))
+        self.assertEqual(["Early Store"], self.get_names("/stores/?open_at=2026-10-19T12:30"))
+        self.assertEqual(["Late Store"], self.get_names("/stores/?open_at=2026-10-23T23:59"))
+        self.assertEqual(["Late Store"], self.get_names("/stores/?open_at=2026-10-24T01:00"))
+        self.assertEqual([], self.get_names("/stores/?open_at=2026-10-24T02:00"))
+        self.assertEqual(["Early Store"], self.get_names("/stores/?open_at=2026-10-25T10:00%2B00:00&search=store"))
+        self.assertEqual(["Early Store", "Split Store"], self.get_names("/async/stores/?open_at=2026-10-19T11:00"))
+
+    @override_settings(STORE_OPENING_HOURS={"TIME_ZONE": "Europe/Berlin"})
+    def test_get_stores_open_at_in_store_time_zone(self):
+        self.assertEqual(["Early Store"], self.get_names("/stores/?open_at=2026-10-19T12:30"))
+        self.assertEqual(["Early Store", "Split Store"], self.get_names("/stores/?open_at=2026-10-19T09:30Z"))
+
+    def test_get_stores_open_now(self):
+        with mock.patch("django.utils.timezone.now", return_value=datetime.datetime(2026, 10, 19, 12, 30, tzinfo=datetime.timezone.utc)):
+            self.assertEqual(["Early Store"], self.get_names("/stores/?open_now=true"))
+            self.assertEqual(["Early Store"], self.get_names("/stores/stream?open_now=1"))
+        self.assertEqual(4, len(self.get_names("/stores/?open_now=false")))
+
+    def test_get_stores_open_at_filters_in_the_store_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.get_names("/stores/?open_at=2026-10-19T11:00")
+        interval_queries = [query["sql"] for query in queries if "store_api_openinginterval" in query["sql"]]
+        self.assertTrue(interval_queries)
+        self.assertTrue(all("store_api_store" in sql for sql in interval_queries))
+
+    def test_get_stores_with_invalid_moment(self):
+        for url, parameter in [("/stores/?open_at=monday", "open_at"), ("/async/stores/?open_at=monday", "open_at"), ("/stores/?open_now=maybe", "open_now")]:
+            response = self.client.get(url, HTTP_AUTHORIZATION=f"Bearer {self.access_token}")
+            self.assertEqual(response.status_code, 400, url)
+            self.assertIn(parameter, response.json())
+
+class TestStoreLocation(TestCase):
+
+    def setUp(self):
+        # Stores along a line east of the origin, 0.01 degrees (about 1.1 km) apart.
+        for i in range(20):
+            Store.objects.create(name=f"Store {i+1}", address=f"Address {i+1}", opening_hours="9am-5pm", latitude=50.0, longitude=8.0 + i * 0.01)
+        Store.objects.create(name="Far Store", address="Far away", opening_hours="9am-5pm", latitude=-33.9, longitude=151.2)
+        Store.objects.create(name="Nowhere Store", address="Unknown", opening_hours="9am-5pm")
+        User.objects.create_user(username="user", password="password")
+        token_response = self.client.post("/api/token/", data=USERDATA)
+        self.access_token = token_response.json()["access"]
+
+    def get(self, url):
+        return self.client.get(url, HTTP_AUTHORIZATION=f"Bearer {self.access_token}")
+
+    def get_names(self, url):
+        response = self.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [store["name"] for store in response.json()["results"]]
+
+    def test_encode_geohash(self):
+        self.assertEqual("u4pruydqqvj", encode_geohash(57.64911, 10.40744, 11))
+        self.assertEqual("ezs42", encode_geohash(42.6, -5.6, 5))
+        self.assertEqual(9, len(neighbourhood(50.0, 8.0, 6)))
+        self.assertEqual(6, len(neighbourhood(89.99, 8.0, 3)))
+
+    def test_geohash_follows_coordinates(self):
+        store = Store.objects.get(name="Nowhere Store")
+        self.assertIsNone(store.geohash)
+        store.latitude, store.longitude = 57.64911, 10.40744
+        store.save(update_fields=["latitude", "longitude"])
+        self.assertEqual("u4pruydqqv", Store.objects.get(id=store.id).geohash[:10])
+
+    def test_get_stores_near(self):
+        self.assertEqual(["Store 11", "Store 12", "Store 10"], self.get_names("/stores/?near=50.0,8.101&limit=3"))
+        self.assertEqual(10, len(self.get_names("/stores/?near=50.0,8.0")))
+        self.assertEqual(["Far Store", "Store 20"], self.get_names("/stores/?near=-33.0,150.0&limit=2"))
+        self.assertEqual(["Store 2"], self.get_names("/stores/?near=50.0,8.0&limit=1&search=store 2"))
+
+    def test_near_reads_only_nearby_stores(self):
+        far_stores = [Store(name="Far", address="Far", opening_hours="", latitude=40.0 + i * 0.01, longitude=-3.7) for i in range(500)]
+        for store in far_stores:
+            store.set_geohash()
+        Store.objects.bulk_create(far_stores)
+
+        stores = Store.objects.all()
+        with mock.patch("store_api.geo.distance", wraps=geo.distance) as distance:
+            self.assertEqual(3, len(nearest_store_ids(stores, 50.0, 8.101, 3)))
+        self.assertLess(distance.call_count, 20)
+
+        # Matches a full scan wherever the nearest stores are.
+        for latitude, longitude, limit in [(50.0, 8.05, 5), (49.0, 7.0, 4), (0.0, 0.0, 21)]:
+            expected = sorted(stores.exclude(latitude=None), key=lambda store: geo.distance(latitude, longitude, store.latitude, store.longitude))
+            self.assertEqual([store.id for store in expected[:limit]], nearest_store_ids(stores, latitude, longitude, limit))
+
+    def test_get_stores_in_bbox(self):
+        self.assertEqual(["Store 1", "Store 2", "Store 3"], self.get_names("/stores/?bbox=7.99,49.9,8.025,50.1"))
+        self.assertEqual(["Far Store"], self.get_names("/stores/?bbox=150,-34,-170,-33"))
+        self.assertEqual(["Store 2", "Store 1"], self.get_names("/stores/?bbox=7.99,49.9,8.015,50.1&near=50,8.012&limit=3"))
+
+    def test_get_stores_with_invalid_location(self):
+        for url, parameter in [("/stores/?near=50", "near"), ("/stores/?near=91,8", "near"), ("/stores/?near=50,8&limit=0", "limit"),
+                               ("/stores/?bbox=1,2,3", "bbox"), ("/stores/?bbox=8,51,9,50", "bbox")]:
+            response = self.get(url)
+            self.assertEqual(response.status_code, 400, url)
+            self.assertIn(parameter, response.json())
+
+    def test_coordinates_are_validated(self):
+        serializer = StoreSerializer(data={**STOREDATA, "latitude": 50.0})
+        self.assertFalse(serializer.is_valid())
+        serializer = StoreSerializer(data={**STOREDATA, "latitude": 91.0, "longitude": 8.0})
+        self.assertFalse(serializer.is_valid())
+        self.assertIn("latitude", serializer.errors)
+        serializer = StoreSerializer(Store.objects.first(), data={"longitude": 9.0}, partial=True)
+        self.assertTrue(serializer.is_valid())
+
+    def test_geocode_stores_command(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", newline="") as file:
+            writer = csv.DictWriter(file, fieldnames=["address", "latitude", "longitude"])
+            writer.writeheader()
+            writer.writerow({"address": "Unknown", "latitude": 52.5, "longitude": 13.4})
+            file.flush()
+            call_command("geocode_stores", from_file=file.name, stdout=io.StringIO())
+
+        store = Store.objects.get(name="Nowhere Store")
+        self.assertEqual((52.5, 13.4), (store.latitude, store.longitude))
+        self.assertEqual(["Nowhere Store"], self.get_names("/stores/?near=52.5,13.4&limit=1"))
+        with self.assertRaises(CommandError):
+            call_command("geocode_stores", stdout=io.StringIO())
+
+class TestStoreSparseFields(TestCase):
+
+    def setUp(self):
+        for i in range(12):
+            Store.objects.create(name=f"Störe {i+1}", address=f"Address {i+1}", opening_hours="9am-5pm", latitude=50.0 + i, longitude=8.5)
+        User.objects.create_user(username="user", password="password")
+        token_response = self.client.post("/api/token/", data=USERDATA)
+        self.access_token = token_response.json()["access"]
+
+    def get(self, url):
+        return self.client.get(url, HTTP_AUTHORIZATION=f"Bearer {self.access_token}")
+
+    def test_list_fast_path_matches_serializer(self):
+        stores = Store.objects.order_by("id")[:10]
+        self.assertEqual(StoreSerializer(stores, many=True).data, self.get("/stores/").json()["results"])
+
+    def test_get_stores_with_fields(self):
+        store = Store.objects.order_by("id").first()
+        for url in ["/stores/?fields=name,id", "/stores/stream?fields=id,name", "/async/stores/?fields=id,name"]:
+            self.assertEqual({"id": store.id, "name": store.name}, self.get(url).json()["results"][0], url)
+        self.assertEqual({"name": store.name}, self.get(f"/stores/{store.id}?fields=name").json())
+        self.assertEqual({"name": store.name}, self.get(f"/async/stores/{store.id}?fields=name").json())
+
+        response = self.get("/stores/stream?fields=name&page_size=5")
+        self.assertEqual([{"name": f"Störe {i+1}"} for i in range(5)], response.json()["results"])
+        self.assertEqual([{"name": f"Störe {i+6}"} for i in range(5)], self.client.get(response.json()["next"], HTTP_AUTHORIZATION=f"Bearer {self.access_token}").json()["results"])
+
+    def test_unrequested_columns_are_not_fetched(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.get("/stores/?fields=id,name")
+        page_query = queries[-1]["sql"]
+        self.assertIn('"name"', page_query)
+        self.assertNotIn('"address"', page_query)
+
+    def test_get_stores_with_unknown_fields(self):
+        for url in ["/stores/?fields=name,password", "/stores/?fields=", "/async/stores/?fields=secret", "/stores/1?fields=secret"]:
+            response = self.get(url)
+            self.assertEqual(response.status_code, 400, url)
+            self.assertIn("fields", response.json())
+
+    def test_renderer_matches_json_renderer(self):
+        data = {"results": StoreSerializer(Store.objects.all(), many=True).data, "detail": ErrorDetail("Ä"), "lazy": gettext_lazy("Store")}
+        self.assertEqual(JSONRenderer().render(data), StoreJSONRenderer().render(data))
+        self.assertEqual(b"", StoreJSONRenderer().render(None))
+
+    def test_serialization_benchmark(self):
+        results = serialization_benchmark(rows=10, repeat=1)
+        self.assertIn("serializer", results)
+        self.assertIn("values", results)
+
+class TestDatabaseSettings(TestCase):
+
+    def test_default_profile_is_plain_sqlite(self):
+        database = database_settings({}, Path("/srv"))
+        self.assertEqual({"ENGINE": "django.db.backends.sqlite3", "NAME": Path("/srv/db.sqlite3")}, database)
+
+    def test_postgresql_profile(self):
+        database = database_settings({"STORE_DB_PROFILE": "postgresql", "STORE_DB_HOST": "db", "STORE_DB_POOL_MAX_SIZE": "20"}, Path("/srv"))
+        self.assertEqual("django.db.backends.postgresql", database["ENGINE"])
+        self.assertEqual("db", database["HOST"])
+        self.assertEqual(0, database["CONN_MAX_AGE"])
+        self.assertTrue(database["CONN_HEALTH_CHECKS"])
+        self.assertEqual(20, database["OPTIONS"]["pool"]["max_size"])
+
+        database = database_settings({"STORE_DB_PROFILE": "postgresql", "STORE_DB_POOL": "0"}, Path("/srv"))
+        self.assertEqual(60, database["CONN_MAX_AGE"])
+        self.assertNotIn("pool", database["OPTIONS"])
+
+    def test_replicas(self):
+        self.assertEqual({}, replica_settings({}, database_settings({}, Path("/srv"))))
+
+        replicas = replica_settings({"STORE_DB_REPLICAS": "/srv/a.sqlite3, /srv/b.sqlite3"}, database_settings({}, Path("/srv")))
+        self.assertEqual(["replica1", "replica2"], list(replicas))
+        self.assertEqual("/srv/b.sqlite3", replicas["replica2"]["NAME"])
+        self.assertEqual({"MIRROR": "default"}, replicas["replica1"]["TEST"])
+
+        primary = database_settings({"STORE_DB_PROFILE": "postgresql", "STORE_DB_PORT": "5432"}, Path("/srv"))
+        replicas = replica_settings({"STORE_DB_REPLICAS": "replica-a,replica-b:6432"}, primary)
+        self.assertEqual(("replica-a", "5432"), (replicas["replica1"]["HOST"], replicas["replica1"]["PORT"]))
+        self.assertEqual(("replica-b", "6432"), (replicas["replica2"]["HOST"], replicas["replica2"]["PORT"]))
+
+    def test_invalid_settings(self):
+        with self.assertRaises(ImproperlyConfigured):
+            database_settings({"STORE_DB_PROFILE": "oracle"}, Path("/srv"))
+        with self.assertRaises(ImproperlyConfigured):
+            database_settings({"STORE_DB_PROFILE": "sqlite-wal", "STORE_SQLITE_BUSY_TIMEOUT": "long"}, Path("/srv"))
+
+    def test_sqlite_wal_profile_tunes_new_connections(self):
+        with tempfile.TemporaryDirectory() as directory:
+            database = database_settings({"STORE_DB_PROFILE": "sqlite-wal", "STORE_DB_NAME": os.path.join(directory, "db.sqlite3")}, Path(directory))
+            wal_connection = ConnectionHandler({"default": database})["default"]
+            try:
+                with wal_connection.cursor() as cursor:
+                    pragmas = {}
+                    for pragma in ["journal_mode", "synchronous", "mmap_size", "busy_timeout"]:
+                        cursor.execute(f"PRAGMA {pragma}")
+                        pragmas[pragma] = cursor.fetchone()[0]
+            finally:
+                wal_connection.close()
+        self.assertEqual({"journal_mode": "wal", "synchronous": 1, "mmap_size": 256 * 1024 * 1024, "busy_timeout": 5000}, pragmas)
+        self.assertEqual("IMMEDIATE", wal_connection.transaction_mode)
+
+@override_settings(STORE_REPLICAS={"ALIASES": ["replica1"], "STICKY_SECONDS": 5})
+class TestStoreReplicaRouter(TransactionTestCase):
+
+    def setUp(self):
+        self.router = StoreReplicaRouter()
+        self.user = User.objects.create_user(username="user", password="password")
+        self.other_user = User.objects.create_user(username="other", password="password")
+
+    def request(self, user):
+        request = RequestFactory().get("/stores/")
+        request.user = user
+        return request
+
+    def test_reads_go_to_replicas_during_requests(self):
+        self.assertIsNone(self.router.db_for_read(Store))
+        with routed_request(self.request(self.user)):
+            self.assertEqual("replica1", self.router.db_for_read(Store))
+            self.assertEqual("replica1", self.router.db_for_read(OpeningInterval))
+            self.assertIsNone(self.router.db_for_read(User))
+            with transaction.atomic():
+                self.assertEqual("default", self.router.db_for_read(Store))
+
+    def test_writers_read_their_writes(self):
+        with routed_request(self.request(self.user)):
+            self.assertEqual("default", self.router.db_for_write(Store))
+            self.assertEqual("default", self.router.db_for_read(Store))
+        with routed_request(self.request(self.user)):
+            self.assertEqual("default", self.router.db_for_read(Store))
+        with routed_request(self.request(self.other_user)):
+            self.assertEqual("replica1", self.router.db_for_read(Store))
+
+        cache.delete(sticky_cache_key(self.user.pk))
+        with routed_request(self.request(self.user)):
+            self.assertEqual("replica1", self.router.db_for_read(Store))
+
+    def test_replicas_are_not_migrated(self):
+        self.assertFalse(self.router.allow_migrate("replica1", "store_api"))
+        self.assertIsNone(self.router.allow_migrate("default", "store_api"))
+
+    def test_copy_sqlite_database(self):
+        Store.objects.create(name="Store 1", address="Address 1", opening_hours="9am-5pm")
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "replica.sqlite3")
+            copy_sqlite_database(connection, path)
+            replica = sqlite3.connect(path)
+            try:
+                self.assertEqual([("Store 1",)], replica.execute("SELECT name FROM store_api_store").fetchall())
+            finally:
+                replica.close()
+
+class TestStoreMetrics(TestCase):
+
+    def setUp(self):
+        reset_metrics()
+        for i in range(3):
+            Store.objects.create(name=f"Store {i+1}", address=f"Address {i+1}", opening_hours="9am-5pm")
+        User.objects.create_user(username="user", password="password")
+        token_response = self.client.post("/api/token/", data=USERDATA)
+        self.access_token = token_response.json()["access"]
+
+    def get(self, url):
+        return self.client.get(url, HTTP_AUTHORIZATION=f"Bearer {self.access_token}")
+
+    def test_server_timing_header(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get("/stores/")
+        timings = dict(entry.split(";", 1) for entry in response["Server-Timing"].split(", "))
+        self.assertEqual({"total", "db", "auth", "render"}, set(timings))
+        self.assertIn(f'desc="{len(queries)} queries"', timings["db"])
+
+    def test_async_server_timing_header(self):
+        response = self.get("/async/stores/")
+        self.assertIn("auth;dur=", response["Server-Timing"])
+        self.assertNotIn('desc="0 queries"', response["Server-Timing"])
+
+    @override_settings(DEBUG=True)
+    def test_async_middleware_chain_is_not_adapted(self):
+        handler = BaseHandler()
+        with self.assertNoLogs("django.request", "DEBUG"):
+            handler.load_middleware(is_async=True)
+        self.assertTrue(iscoroutinefunction(handler._middleware_chain))
+
+    async def test_async_requests_are_measured_without_a_thread(self):
+        response = await self.async_client.get("/async/stores/", headers={"Authorization": f"Bearer {self.access_token}"})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("auth;dur=", response["Server-Timing"])
+        self.assertNotIn('desc="0 queries"', response["Server-Timing"])
+
+    def test_metrics_endpoint(self):
+        self.get("/stores/")
+        self.get("/stores/")
+        self.get(f"/stores/{Store.objects.first().id}")
+        self.client.get("/no-such-page/")
+
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        text = response.content.decode()
+        self.assertIn('store_api_requests_total{method="GET",route="stores/",status="200"} 2', text)
+        self.assertIn('store_api_requests_total{method="GET",route="stores/<int:pk>",status="200"} 1', text)
+        self.assertIn('store_api_requests_total{method="GET",route="<unmatched>",status="404"} 1', text)
+        self.assertIn('store_api_request_duration_seconds_bucket{method="GET",route="stores/",le="+Inf"} 2', text)
+        self.assertIn('store_api_request_duration_seconds_count{method="GET",route="stores/"} 2', text)
+        self.assertIn("# TYPE store_api_request_db_queries histogram", text)
+        self.assertIn('store_api_response_cache_total{result="hit"}', text)
+
+    def test_histogram_buckets_are_cumulative(self):
+        self.get("/stores/")
+        text = self.client.get("/metrics").content.decode()
+        counts = [int(line.rsplit(" ", 1)[1]) for line in text.splitlines()
+                  if line.startswith('store_api_request_db_queries_bucket{method="GET",route="stores/"')]
+        self.assertEqual(len(counts), 8)
+        self.assertEqual(counts, sorted(counts))
+        self.assertEqual(1, counts[-1])
+
+    @override_settings(STORE_METRICS={**settings.STORE_METRICS, "SLOW_REQUEST_MS": 0, "LOGGED_QUERIES": 1})
+    def test_slow_requests_are_logged_with_their_sql(self):
+        with self.assertLogs("store_api.metrics", "WARNING") as logs:
+            self.get("/stores/?search=store")
+        self.assertIn("Slow request GET /stores/?search=store (route stores/, status 200)", logs.output[0])
+        self.assertIn("SELECT", logs.output[0])
+        self.assertIn("more", logs.output[0])
+
+    @override_settings(STORE_METRICS={**settings.STORE_METRICS, "ENABLED": False})
+    def test_disabled(self):
+        response = self.get("/stores/")
+        self.assertNotIn("Server-Timing", response)
+        self.assertNotIn("route=\"stores/\"", self.client.get("/metrics").content.decode())
+
+@override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": {"token": "5/minute", "token_username": "2/minute"}})
+class TestTokenThrottling(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user(username="user", password="password")
+
+    def test_token_requests_are_throttled_per_address(self):
+        for _ in range(5):
+            self.assertEqual(200, self.client.post("/api/token/", data=USERDATA).status_code)
+        response = self.client.post("/api/token/", data=USERDATA)
+        self.assertEqual(429, response.status_code)
+        self.assertIn("Retry-After", response)
+
+        response = self.client.post("/api/token/", data=USERDATA, REMOTE_ADDR="10.0.0.2")
+        self.assertEqual(200, response.status_code)
+
+    def test_failed_logins_are_throttled_per_username(self):
+        wrong = {"username": "User", "password": "wrong"}
+        for address in ["10.0.0.1", "10.0.0.2"]:
+            self.assertEqual(401, self.client.post("/api/token/", data=wrong, REMOTE_ADDR=address).status_code)
+        with mock.patch("django.contrib.auth.base_user.check_password") as check_password:
+            response = self.client.post("/api/token/", data=USERDATA, REMOTE_ADDR="10.0.0.3")
+        self.assertEqual(429, response.status_code)
+        check_password.assert_not_called()
+
+        response = self.client.post("/api/token/", data={"username": "other", "password": "wrong"}, REMOTE_ADDR="10.0.0.3")
+        self.assertEqual(401, response.status_code)
+
+    def test_successful_logins_are_not_counted_per_username(self):
+        for address in ["10.0.0.1", "10.0.0.2", "10.0.0.3"]:
+            self.assertEqual(200, self.client.post("/api/token/", data=USERDATA, REMOTE_ADDR=address).status_code)
+
+# Logins rehash with slow legacy hashers here, which is not what the slow request log is for.
+@override_settings(STORE_METRICS={**settings.STORE_METRICS, "SLOW_REQUEST_MS": 10000})
+class TestPasswordHashing(TestCase):
+
+    def test_new_passwords_use_scrypt(self):
+        user = User.objects.create_user(username="user", password="password")
+        self.assertTrue(user.password.startswith(f"scrypt${2 ** 15}$"))
+
+    def test_old_hashes_are_upgraded_on_login(self):
+        user = User.objects.create_user(username="user", password="password")
+        User.objects.filter(pk=user.pk).update(password=make_password("password", hasher="pbkdf2_sha256"))
+
+        other_token = StoreRefreshToken.for_user(user).access_token
+        token_response = self.client.post("/api/token/", data=USERDATA)
+        self.assertEqual(200, token_response.status_code)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith("scrypt$"))
+        # A rehash of the same password revokes neither the new nor older tokens.
+        for token in (token_response.json()["access"], other_token):
+            response = self.client.get("/stores/", HTTP_AUTHORIZATION=f"Bearer {token}")
+            self.assertEqual(200, response.status_code)
+
+    def test_changed_costs_rehash_on_login(self):
+        user = User.objects.create_user(username="user", password="password")
+        costs = {**settings.STORE_PASSWORD_HASHING, "SCRYPT_WORK_FACTOR": 2 ** 14}
+        with override_settings(STORE_PASSWORD_HASHING=costs):
+            self.assertEqual(200, self.client.post("/api/token/", data=USERDATA).status_code)
+            user.refresh_from_db()
+            self.assertTrue(user.password.startswith(f"scrypt${2 ** 14}$"))
+        self.assertTrue(check_password("password", user.password))
+
+class TestRefreshTokenBlacklist(TestCase):
+
+    def setUp(self):
+        User.objects.create_user(username="user", password="password")
+        self.refresh_token = self.client.post("/api/token/", data=USERDATA).json()["refresh"]
+
+    def test_rotated_refresh_tokens_cannot_be_reused(self):
+        response = self.client.post("/api/token/refresh/", data={"refresh": self.refresh_token})
+        self.assertEqual(200, response.status_code)
+        rotated_token = response.json()["refresh"]
+        jti = StoreRefreshToken(self.refresh_token, verify=False)["jti"]
+        self.assertEqual([jti], list(BlacklistedRefreshToken.objects.values_list("jti", flat=True)))
+
+        response = self.client.post("/api/token/refresh/", data={"refresh": self.refresh_token})
+        self.assertEqual(401, response.status_code)
+        self.assertEqual("Token is blacklisted", response.json()["detail"])
+
+        response = self.client.post("/api/token/refresh/", data={"refresh": rotated_token})
+        self.assertEqual(200, response.status_code)
+
+    def test_blacklisting_twice_fails(self):
+        token = StoreRefreshToken(self.refresh_token)
+        token.blacklist()
+        with self.assertRaises(TokenError):
+            token.blacklist()
+
+    def test_prune_token_blacklist(self):
+        now = timezone.now()
+        BlacklistedRefreshToken.objects.create(jti="expired", expires_at=now - datetime.timedelta(seconds=1))
+        BlacklistedRefreshToken.objects.create(jti="valid", expires_at=now + datetime.timedelta(days=1))
+
+        output = io.StringIO()
+        call_command("prune_token_blacklist", stdout=output)
+        self.assertIn("Deleted 1 expired refresh tokens", output.getvalue())
+        self.assertEqual(["valid"], list(BlacklistedRefreshToken.objects.values_list("jti", flat=True)))
+
+class TestStoreChangeFeed(TestCase):
+
+    def setUp(self):
+        user = User.objects.create_user(username="user", password="password")
+        user.groups.set([Group.objects.create(name="manager")])
+        token_response = self.client.post("/api/token/", data=USERDATA)
+        self.authorization = f"Bearer {token_response.json()['access']}"
+
+    def changes(self, query=""):
+        return self.client.get(f"/stores/changes{query}", HTTP_AUTHORIZATION=self.authorization)
+
+    def test_changes_of_store_writes(self):
+        store_id = self.client.post("/stores/", data=STOREDATA, HTTP_AUTHORIZATION=self.authorization).json()["id"]
+        self.client.patch(f"/stores/{store_id}", data={"name": "Store 2"}, content_type="application/json",
+                          HTTP_AUTHORIZATION=self.authorization)
+        self.client.delete(f"/stores/{store_id}", HTTP_AUTHORIZATION=self.authorization)
+
+        data = self.changes().json()
+        self.assertEqual(["created", "updated", "deleted"], [change["action"] for change in data["results"]])
+        self.assertEqual({store_id}, {change["id"] for change in data["results"]})
+        self.assertEqual("Store 1", data["results"][0]["store"]["name"])
+        self.assertEqual("Store 2", data["results"][1]["store"]["name"])
+        self.assertIsNone(data["results"][2]["store"])
+        seqs = [change["seq"] for change in data["results"]]
+        self.assertEqual(seqs, sorted(seqs))
+        self.assertEqual(seqs[-1], data["last_seq"])
+        self.assertFalse(data["has_more"])
+
+        data = self.changes(f"?since={seqs[0]}").json()
+        self.assertEqual(["updated", "deleted"], [change["action"] for change in data["results"]])
+        data = self.changes(f"?since={seqs[-1]}").json()
+        self.assertEqual([], data["results"])
+        self.assertEqual(seqs[-1], data["last_seq"])
+
+    def test_changes_of_bulk_writes(self):
+        store = Store.objects.create(**STOREDATA)
+        since = StoreChange.objects.latest("seq").seq
+        apply_bulk(create=[{**STOREDATA, "name": "New"}], upsert=[{**STOREDATA, "id": store.id, "name": "Changed"}])
+        Store.objects.filter(pk=store.pk).delete()
+
+        results = self.changes(f"?since={since}").json()["results"]
+        self.assertEqual(
+            [("created", "New"), ("updated", "Changed"), ("deleted", None)],
+            [(change["action"], change["store"] and change["store"]["name"]) for change in results],
+        )
+
+    def test_failed_writes_leave_no_changes(self):
+        with self.assertRaises(ValueError):
+            with transaction.atomic():
+                Store.objects.create(**STOREDATA)
+                raise ValueError
+        self.assertFalse(StoreChange.objects.exists())
+
+    def test_paging(self):
+        for i in range(5):
+            Store.objects.create(**{**STOREDATA, "name": f"Store {i}"})
+        data = self.changes("?limit=3").json()
+        self.assertEqual(3, len(data["results"]))
+        self.assertTrue(data["has_more"])
+        self.assertIn(f"since={data['last_seq']}", data["next"])
+
+        data = self.client.get(data["next"], HTTP_AUTHORIZATION=self.authorization).json()
+        self.assertEqual(["Store 3", "Store 4"], [change["store"]["name"] for change in data["results"]])
+        self.assertFalse(data["has_more"])
+
+    def test_invalid_parameters(self):
+        for query in ["?since=-1", "?since=x", "?limit=0", "?limit=100000"]:
+            self.assertEqual(400, self.changes(query).status_code, query)
+        self.assertEqual(401, self.client.get("/stores/changes").status_code)
+
+    def test_compaction(self):
+        kept = Store.objects.create(**STOREDATA)
+        kept.name = "Kept"
+        kept.save()
+        deleted = Store.objects.create(**STOREDATA)
+        deleted_id = deleted.id
+        deleted.delete()
+        since = StoreChange.objects.order_by("seq").first().seq
+
+        call_command("compact_store_changes", "--keep-tombstones", stdout=io.StringIO())
+        self.assertEqual([(kept.id, "updated"), (deleted_id, "deleted")],
+                         list(StoreChange.objects.order_by("seq").values_list("store_id", "action")))
+        self.assertEqual(200, self.changes(f"?since={since}").status_code)
+
+        with mock.patch("store_api.management.commands.compact_store_changes.timezone.now",
+                        return_value=timezone.now() + datetime.timedelta(days=31)):
+            call_command("compact_store_changes", stdout=io.StringIO())
+        self.assertEqual([kept.id], list(StoreChange.objects.values_list("store_id", flat=True)))
+        response = self.changes(f"?since={since}")
+        self.assertEqual(410, response.status_code)
+        self.assertEqual(["Kept"], [change["store"]["name"] for change in self.changes().json()["results"]])
+
+    def test_seed_starts_mirrors_over(self):
+        Store.objects.create(**STOREDATA)
+        since = StoreChange.objects.latest("seq").seq
+        call_command("seed", stdout=io.StringIO())
+        token_response = self.client.post("/api/token/", data={"username": "store", "password": "store"})
+        self.authorization = f"Bearer {token_response.json()['access']}"
+        self.assertEqual(410, self.changes(f"?since={since}").status_code)
+        self.assertEqual(Store.objects.count(), len(self.changes("?limit=1000").json()["results"]))
+
+# The schema modules import drf_spectacular, which STORE_APP_PROFILE=api leaves out.
+@skipUnless(apps.is_installed("drf_spectacular"), "the schema is not served by the api profile")
+class TestSchemaServing(TestCase):
+
+    def setUp(self):
+        from store_api.schema import get_schema_documents
+        get_schema_documents.cache_clear()
+        self.addCleanup(get_schema_documents.cache_clear)
+        self.checked_in = (Path(settings.BASE_DIR) / "schema.yml").read_bytes()
+
+    def test_checked_in_schema_is_up_to_date(self):
+        output = io.StringIO()
+        call_command("spectacular", stdout=output)
+        self.assertEqual(self.checked_in.decode().strip(), output.getvalue().strip(),
+                         "Run python manage.py spectacular --file schema.yml")
+
+    def test_schema_is_served_from_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "schema.yml"
+            path.write_text("openapi: 3.0.3\ninfo:\n  title: From file\n")
+            with override_settings(STORE_SCHEMA={"FILE": path}):
+                response = self.client.get("/schema/")
+                self.assertEqual(b"openapi: 3.0.3\ninfo:\n  title: From file\n", response.content)
+                response = self.client.get("/schema/?format=json")
+                self.assertEqual({"openapi": "3.0.3", "info": {"title": "From file"}}, response.json())
+
+    @override_settings(STORE_SCHEMA={"FILE": None})
+    def test_schema_is_generated_once(self):
+        from drf_spectacular.generators import SchemaGenerator
+        with mock.patch("store_api.schema.SchemaGenerator.get_schema", wraps=SchemaGenerator().get_schema) as get_schema:
+            first = self.client.get("/schema/")
+            second = self.client.get("/schema/")
+        self.assertEqual(1, get_schema.call_count)
+        self.assertEqual(self.checked_in, first.content)
+        self.assertEqual(first.content, second.content)
+
+    def test_etag_and_compressed_variants(self):
+        response = self.client.get("/schema/")
+        self.assertEqual(self.checked_in, response.content)
+        self.assertEqual("application/vnd.oai.openapi", response["Content-Type"])
+        self.assertIn("Accept-Encoding", response["Vary"])
+        etag = response["ETag"]
+
+        compressed = self.client.get("/schema/", HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual("gzip", compressed["Content-Encoding"])
+        self.assertEqual(self.checked_in, gzip.decompress(compressed.content))
+        self.assertNotEqual(etag, compressed["ETag"])
+
+        for validator in [etag, compressed["ETag"]]:
+            response = self.client.get("/schema/", HTTP_IF_NONE_MATCH=validator, HTTP_ACCEPT_ENCODING="gzip")
+            self.assertEqual(304, response.status_code)
+            self.assertEqual(b"", response.content)
+
+        response = self.client.get("/schema/", HTTP_ACCEPT="application/json")
+        self.assertEqual(yaml.safe_load(self.checked_in), response.json())
+        self.assertNotEqual(etag, response["ETag"])
+
+
+class TestStoreMultiGet(TestCase):
+
+    def setUp(self):
+        User.objects.create_user(username="user", password="password")
+        token_response = self.client.post("/api/token/", data=USERDATA)
+        self.authorization = f"Bearer {token_response.json()['access']}"
+        self.stores = [
+            Store.objects.create(name=f"Store {i}", address=f"{i} Main St", opening_hours="9am-5pm") for i in range(3)
+        ]
+
+    def get(self, query):
+        return self.client.get(f"/stores/{query}", HTTP_AUTHORIZATION=self.authorization)
+
+    def lookup(self, data, query=""):
+        return self.client.post(f"/stores/lookup{query}", data=json.dumps(data), content_type="application/json",
+                                HTTP_AUTHORIZATION=self.authorization)
+
+    def test_stores_in_requested_order_with_not_found(self):
+        first, second, third = self.stores
+        response = self.get(f"?ids={third.id},999,{first.id}")
+        self.assertEqual(200, response.status_code)
+        self.assertEqual({"results": [
+            {"id": third.id, "status": 200, "store": StoreSerializer(third).data},
+            {"id": 999, "status": 404, "errors": {"id": ["No Store matches the given query."]}},
+            {"id": first.id, "status": 200, "store": StoreSerializer(first).data},
+        ]}, response.json())
+
+    def test_one_query(self):
+        ids = ",".join(str(store.id) for store in self.stores)
+        cache.clear()
+        # One query loads the JWT user, one computes the ETag and one fetches the stores.
+        with self.assertNumQueries(3):
+            response = self.get(f"?ids={ids}")
+        self.assertEqual(3, len(response.json()["results"]))
+
+    def test_fields(self):
+        store = self.stores[0]
+        response = self.get(f"?ids={store.id}&fields=name")
+        self.assertEqual([{"id": store.id, "status": 200, "store": {"name": store.name}}], response.json()["results"])
+
+    def test_ignores_other_filters(self):
+        store = self.stores[1]
+        response = self.get(f"?ids={store.id}&search=nothing+like+it")
+        self.assertEqual(200, response.json()["results"][0]["status"])
+
+    def test_etag_covers_requested_stores(self):
+        first, second, _ = self.stores
+        etag = self.get(f"?ids={first.id}")["ETag"]
+        second.name = "Renamed"
+        second.save()
+        self.assertEqual(304, self.client.get(f"/stores/?ids={first.id}", HTTP_AUTHORIZATION=self.authorization,
+                                              HTTP_IF_NONE_MATCH=etag).status_code)
+        first.name = "Renamed"
+        first.save()
+        self.assertEqual(200, self.client.get(f"/stores/?ids={first.id}", HTTP_AUTHORIZATION=self.authorization,
+                                              HTTP_IF_NONE_MATCH=etag).status_code)
+
+    def test_invalid_ids(self):
+        self.assertIn("ids", self.get("?ids=1,x").json())
+        self.assertIn("ids", self.get("?ids=").json())
+        self.assertEqual(400, self.get("?ids=0").status_code)
+
+    @override_settings(STORE_MULTIGET={"MAX_IDS": 2})
+    def test_max_ids(self):
+        response = self.get("?ids=1,2,3")
+        self.assertEqual(400, response.status_code)
+        self.assertEqual({"ids": ["At most 2 ids can be fetched at once."]}, response.json())
+        self.assertEqual(400, self.lookup({"ids": [1, 2, 3]}).status_code)
+
+    def test_lookup(self):
+        first, _, third = self.stores
+        response = self.lookup({"ids": [third.id, 999, first.id]}, "?fields=id,name")
+        self.assertEqual(200, response.status_code)
+        self.assertEqual([
+            {"id": third.id, "status": 200, "store": {"id": third.id, "name": third.name}},
+            {"id": 999, "status": 404, "errors": {"id": ["No Store matches the given query."]}},
+            {"id": first.id, "status": 200, "store": {"id": first.id, "name": first.name}},
+        ], response.json()["results"])
+
+    def test_lookup_requires_ids(self):
+        self.assertEqual(400, self.lookup({}).status_code)
+        self.assertEqual(400, self.lookup({"ids": []}).status_code)
+        self.assertEqual(401, self.client.post("/stores/lookup", {"ids": [1]}).status_code)
+
+
+class TestStoreFuzzySearch(TestCase):
+
+    def setUp(self):
+        # The index lives in the process and would keep the stores of rolled back tests.
+        reset_trigram_indexes()
+        self.addCleanup(reset_trigram_indexes)
+        Store.objects.create(name="Store 1", address="Badstraße 1, 12345 Monopolis", opening_hours="Mo-Fr 6:00 - 18:00")
+        Store.objects.create(name="Top Store", address="Megastraße 4, 54321 Wowstadt", opening_hours="Mo-Fr 8:00 - 14:00")
+        Store.objects.create(name="Amazing Store", address="Grandiosallee 10, 54321 Wowstadt", opening_hours="Mo-Fr 6:00 - 21:00")
+        User.objects.create_user(username="user", password="password")
+        token_response = self.client.post("/api/token/", data=USERDATA)
+        self.access_token = token_response.json()["access"]
+
+    def fuzzy(self, text, query=""):
+        response = self.client.get(f"/stores/?fuzzy={text}{query}", HTTP_AUTHORIZATION=f"Bearer {self.access_token}")
+        self.assertEqual(response.status_code, 200)
+        return [store["name"] for store in response.json()["results"]]
+
+    def test_trigrams(self):
+        self.assertEqual({"  b", " ba", "bad", "ad "}, trigrams("BAD!"))
+        self.assertEqual(set(), trigrams("--"))
+
+    def test_tolerates_typos(self):
+        self.assertEqual(["Store 1"], self.fuzzy("Badstrase"))
+        self.assertEqual(["Top Store"], self.fuzzy("Megastr"))
+        self.assertEqual(["Amazing Store"], self.fuzzy("amazin"))
+        self.assertEqual([], self.fuzzy("Xylophon"))
+
+    def test_ranks_most_similar_first(self):
+        Store.objects.create(name="Badstrase Kiosk", address="Elsewhere", opening_hours="Mo-Fr 6:00 - 18:00")
+        self.assertEqual(["Badstrase Kiosk", "Store 1"], self.fuzzy("Badstrase"))
+
+    def test_combines_with_other_filters(self):
+        self.assertEqual(["Amazing Store"], self.fuzzy("Wowstadt", "&search=grandios"))
+
+    @override_settings(STORE_FUZZY={**settings.STORE_FUZZY, "MAX_RESULTS": 1})
+    def test_filters_apply_before_max_results(self):
+        Store.objects.create(name="Badstrase Kiosk", address="Elsewhere", opening_hours="Mo-Fr 6:00 - 18:00")
+        self.assertEqual(["Badstrase Kiosk"], self.fuzzy("Badstrase"))
+        self.assertEqual(["Store 1"], self.fuzzy("Badstrase", "&search=monopolis"))
+
+    @override_settings(STORE_FUZZY={**settings.STORE_FUZZY, "MAX_RESULTS": 1})
+    def test_max_results(self):
+        self.assertEqual(1, len(self.fuzzy("Store")))
+
+    def test_index_follows_writes(self):
+        self.assertEqual([], self.fuzzy("Xylophon"))
+        store = Store.objects.get(name="Top Store")
+        store.name = "Xylophon"
+        store.save()
+        self.assertEqual(["Xylophon"], self.fuzzy("Xylofon"))
+        apply_bulk(create=[{"name": "Xylophone Shop", "address": "Elsewhere", "opening_hours": "Mo 8:00 - 9:00"}])
+        self.assertEqual(["Xylophon", "Xylophone Shop"], self.fuzzy("Xylofon"))
+        store.delete()
+        self.assertEqual(["Xylophone Shop"], self.fuzzy("Xylofon"))
+
+    def test_index_is_rebuilt_after_compaction(self):
+        self.fuzzy("Store")
+        index = get_trigram_index("default")
+        with mock.patch.object(index, "rebuild", wraps=index.rebuild) as rebuild:
+            self.fuzzy("Store")
+            rebuild.assert_not_called()
+            StoreChangeCompaction.objects.create(horizon=index.last_seq + 1)
+            self.assertEqual(["Store 1"], self.fuzzy("Badstrase"))
+            rebuild.assert_called_once()
+
+    def test_only_candidates_are_scored(self):
+        for i in range(50):
+            Store.objects.create(name=f"Kiosk {i}", address="Hauptstraße 1", opening_hours="Mo-Fr 6:00 - 18:00")
+        with mock.patch("store_api.fuzzy.similarity", wraps=similarity) as scored:
+            self.assertEqual(["Store 1"], self.fuzzy("Badstrase"))
+        # Two fields of the one store sharing a rare trigram with the text.
+        self.assertEqual(2, scored.call_count)
+
+
+class TestJobs(TestCase):
+
+    def setUp(self):
+        self.manager = User.objects.create_user(username="user", password="password")
+        self.manager.groups.set([Group.objects.create(name="manager")])
+        token_response = self.client.post("/api/token/", data=USERDATA)
+        self.authorization = f"Bearer {token_response.json()['access']}"
+
+    def submit(self, kind, params=None, authorization=None):
+        data = {"kind": kind} if params is None else {"kind": kind, "params": params}
+        return self.client.post("/jobs/", data=json.dumps(data), content_type="application/json",
+                                HTTP_AUTHORIZATION=authorization or self.authorization)
+
+    def poll(self, job_id):
+        return self.client.get(f"/jobs/{job_id}", HTTP_AUTHORIZATION=self.authorization).json()
+
+    def run_queued_jobs(self):
+        for job in claim_jobs("test", 10):
+            run_job(job.pk)
+
+    def test_submit_and_poll(self):
+        stores = [{"name": f"Store {i}", "address": "Main St", "opening_hours": "Mo-Fr 8:00 - 18:00"} for i in range(5)]
+        response = self.submit("import_stores", {"stores": [*stores, {"name": "No address"}]})
+        self.assertEqual(202, response.status_code)
+        job = response.json()
+        self.assertEqual(f"/jobs/{job['id']}", response["Location"])
+        self.assertEqual(("import_stores", "queued", 0), (job["kind"], job["status"], job["progress"]))
+        self.assertEqual(self.manager.pk, Job.objects.get(pk=job["id"]).created_by_id)
+
+        with override_settings(STORE_JOBS={**settings.STORE_JOBS, "BATCH_SIZE": 2}):
+            self.run_queued_jobs()
+        job = self.poll(job["id"])
+        self.assertEqual(("succeeded", 6, 6, 1), (job["status"], job["progress"], job["total"], job["attempts"]))
+        self.assertEqual(5, job["result"]["created"])
+        self.assertEqual([5], [error["index"] for error in job["result"]["errors"]])
+        self.assertEqual(5, Store.objects.count())
+        self.assertEqual(5, StoreChange.objects.filter(action=StoreChange.CREATED).count())
+
+    def test_export_job(self):
+        Store.objects.create(name="Store 1", address="Main St", opening_hours="Mo-Fr 8:00 - 18:00")
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(STORE_JOBS={**settings.STORE_JOBS, "EXPORT_DIR": directory}):
+            job_id = self.submit("export_stores", {"format": "csv"}).json()["id"]
+            self.assertEqual(404, self.client.get(f"/jobs/{job_id}/download", HTTP_AUTHORIZATION=self.authorization).status_code)
+            self.run_queued_jobs()
+            job = self.poll(job_id)
+            self.assertEqual({"download": f"/jobs/{job_id}/download", "stores": 1}, job["result"])
+
+            response = self.client.get(job["result"]["download"], HTTP_AUTHORIZATION=self.authorization)
+            self.assertEqual(200, response.status_code)
+            self.assertEqual("text/csv; charset=utf-8", response["Content-Type"])
+            self.assertIn(f'filename="stores-{job_id}.csv"', response["Content-Disposition"])
+            self.assertEqual(2, len(b"".join(response.streaming_content).decode().splitlines()))
+            self.assertEqual(401, self.client.get(job["result"]["download"]).status_code)
+
+            os.remove(os.path.join(directory, f"stores-{job_id}.csv"))
+            response = self.client.get(job["result"]["download"], HTTP_AUTHORIZATION=self.authorization)
+            self.assertEqual(404, response.status_code)
+
+    def test_failed_job(self):
+        job_id = self.submit("rebuild_search_index").json()["id"]
+        with mock.patch("store_api.jobs.rebuild_search_index", side_effect=RuntimeError("disk full")), \
+                self.assertLogs("store_api.jobs", "ERROR"):
+            self.run_queued_jobs()
+        job = self.poll(job_id)
+        self.assertEqual(("failed", "RuntimeError: disk full"), (job["status"], job["error"]))
+
+    def test_invalid_submissions(self):
+        self.assertIn("kind", self.submit("unknown").json())
+        self.assertEqual({"params": {"stores": ["This field is required."]}}, self.submit("import_stores", {}).json())
+        self.assertIn("kind", self.submit("seed", {"count": 10}).json())
+        self.assertFalse(Job.objects.exists())
+
+    def test_requires_manager(self):
+        User.objects.create_user(username="reader", password="password")
+        token_response = self.client.post("/api/token/", data={"username": "reader", "password": "password"})
+        authorization = f"Bearer {token_response.json()['access']}"
+        self.assertEqual(403, self.submit("rebuild_search_index", authorization=authorization).status_code)
+        self.assertEqual(403, self.client.get("/jobs/", HTTP_AUTHORIZATION=authorization).status_code)
+
+    def test_jobs_are_claimed_once(self):
+        first, second = submit_job("rebuild_search_index"), submit_job("rebuild_search_index")
+        self.assertEqual([first], claim_jobs("one", 1))
+        self.assertEqual([second], claim_jobs("two", 5))
+        self.assertEqual([], claim_jobs("three", 5))
+        self.assertEqual("one", Job.objects.get(pk=first.pk).worker)
+
+    @override_settings(STORE_JOBS={**settings.STORE_JOBS, "STALE_SECONDS": 60, "MAX_ATTEMPTS": 2})
+    def test_stale_jobs_are_queued_again(self):
+        job = submit_job("rebuild_search_index")
+        claim_jobs("gone", 1)
+        self.assertEqual(0, requeue_stale_jobs())
+        Job.objects.update(heartbeat_at=timezone.now() - datetime.timedelta(seconds=61))
+        self.assertEqual(1, requeue_stale_jobs())
+        self.assertEqual(("queued", ""), Job.objects.values_list("status", "worker").get(pk=job.pk))
+
+        claim_jobs("gone too", 1)
+        Job.objects.update(heartbeat_at=timezone.now() - datetime.timedelta(seconds=61))
+        self.assertEqual(0, requeue_stale_jobs())
+        self.assertEqual("failed", Job.objects.get(pk=job.pk).status)
+
+    def test_list(self):
+        first, second = submit_job("rebuild_search_index"), submit_job("rebuild_search_index")
+        response = self.client.get("/jobs/", HTTP_AUTHORIZATION=self.authorization)
+        self.assertEqual([second.pk, first.pk], [job["id"] for job in response.json()["results"]])
+
+
+# The in-memory SQLite test database shares one cache between connections, where a
+# second writer fails at once instead of waiting. Jobs run one at a time here, and
+# the long poll interval keeps heartbeats from writing while a job does.
+@override_settings(STORE_JOBS={**settings.STORE_JOBS, "POLL_INTERVAL": 60})
+class TestRunWorker(TransactionTestCase):
+
+    def test_runs_queued_jobs(self):
+        Store.objects.create(name="Store 1", address="Main St", opening_hours="Mo-Fr 8:00 - 18:00")
+        stores = [{**STOREDATA, "name": f"Imported {i}"} for i in range(30)]
+        imported = submit_job("import_stores", {"stores": stores})
+        reindex = submit_job("rebuild_search_index")
+        output = io.StringIO()
+        call_command("runworker", once=True, workers=1, stdout=output)
+
+        self.assertIn(f"Job {imported.pk} (import_stores) succeeded", output.getvalue())
+        self.assertIn(f"Job {reindex.pk} (rebuild_search_index) succeeded", output.getvalue())
+        imported.refresh_from_db()
+        self.assertEqual((30, 30, {"created": 30, "errors": []}), (imported.progress, imported.total, imported.result))
+        self.assertEqual(31, Store.objects.count())
+
+    def test_survives_database_errors(self):
+        job = submit_job("rebuild_search_index")
+        output = io.StringIO()
+        with mock.patch("store_api.management.commands.runworker.claim_jobs",
+                        side_effect=[OperationalError("database is locked"), [job], []]), \
+                mock.patch("store_api.management.commands.runworker.time.sleep"), \
+                self.assertLogs("store_api.jobs", "ERROR") as logs:
+            call_command("runworker", once=True, workers=1, stdout=output)
+        self.assertIn("could not claim jobs", logs.output[0])
+        self.assertIn(f"Job {job.pk} (rebuild_search_index) succeeded", output.getvalue())
+
+    def test_rejects_no_workers(self):
+        with self.assertRaises(CommandError):
+            call_command("runworker", once=True, workers=-1)
+
+
+API_PROFILE_SCRIPT = """
+import json
+import django
+django.setup()
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import Client
+from django.test.utils import setup_test_environment
+setup_test_environment()
+settings.ALLOWED_HOSTS = ["testserver"]
+call_command("migrate", verbosity=0)
+User.objects.create_user(username="user", password="password")
+client = Client()
+access = client.post("/api/token/", {"username": "user", "password": "password"}).json()["access"]
+print(json.dumps({
+    "apps": settings.INSTALLED_APPS,
+    "middleware": settings.MIDDLEWARE,
+    "stores": client.get("/stores/", HTTP_AUTHORIZATION=f"Bearer {access}").status_code,
+    "async_stores": client.get("/async/stores/", HTTP_AUTHORIZATION=f"Bearer {access}").status_code,
+    "anonymous": client.get("/async/stores/").status_code,
+    "admin": client.get("/admin/").status_code,
+    "schema": client.get("/schema/").status_code,
+}))
+"""
+
+
+class TestStartup(TestCase):
+
+    def run_api_profile(self, **environ):
+        environ = {**os.environ, "DJANGO_SETTINGS_MODULE": "store_api.settings", "STORE_DB_NAME": ":memory:",
+                   "STORE_APP_PROFILE": "api", **environ}
+        return subprocess.run([sys.executable, "-c", API_PROFILE_SCRIPT], env=environ, cwd=settings.BASE_DIR,
+                              capture_output=True, text=True)
+
+    def test_api_profile(self):
+        result = self.run_api_profile()
+        self.assertEqual(0, result.returncode, result.stderr)
+        output = json.loads(result.stdout.splitlines()[-1])
+        self.assertEqual(["django.contrib.auth", "django.contrib.contenttypes", "rest_framework", "store_api"],
+                         output["apps"])
+        self.assertNotIn("django.contrib.sessions.middleware.SessionMiddleware", output["middleware"])
+        self.assertEqual(200, output["stores"])
+        self.assertEqual(200, output["async_stores"])
+        self.assertEqual(401, output["anonymous"])
+        self.assertEqual(404, output["admin"])
+        self.assertEqual(404, output["schema"])
+
+    def test_unknown_profile(self):
+        result = self.run_api_profile(STORE_APP_PROFILE="minimal")
+        self.assertNotEqual(0, result.returncode)
+        self.assertIn("STORE_APP_PROFILE must be one of full, api", result.stderr)
+
+    @skipUnless(apps.is_installed("django.contrib.admin") and apps.is_installed("drf_spectacular"),
+                "the api profile serves neither the admin nor the schema")
+    def test_full_profile_serves_admin_and_schema(self):
+        self.assertEqual(302, self.client.get("/admin/").status_code)
+        self.assertEqual(200, self.client.get("/schema/").status_code)
+
+    def test_warm_up_does_not_connect_to_the_database(self):
+        with mock.patch.object(connection, "ensure_connection") as ensure_connection:
+            warm_up()
+        ensure_connection.assert_not_called()
+
+    def test_middleware_overhead(self):
+        self.assertGreater(middleware_overhead(requests=10), 0)
+
+    def test_measure_startup(self):
+        result = measure_startup("api", repeat=1)
+        self.assertEqual({"startup_ms", "modules", "warm_up_ms", "middleware_us"}, set(result))
+        self.assertGreater(result["modules"], 0)
@@ -0,0 +1,57 @@
+import hashlib
+
+from django.contrib.auth import get_user_model
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class StoreRateThrottle(SimpleRateThrottle):
+    """
+    ``SimpleRateThrottle`` that looks its rate up in the current
+    ``DEFAULT_THROTTLE_RATES`` whenever it is created, so rates can be changed
+    with the settings, and that throttles nothing for a rate of None.
+    """
+
+    def get_rate(self):
+        return api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+
+
+class TokenRateThrottle(StoreRateThrottle):
+    """
+    Limits the token requests of a client IP address.
+    """
+    scope = 'token'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class TokenUsernameRateThrottle(StoreRateThrottle):
+    """
+    Limits the failed logins for a username, whatever address they come from.
+    Only failures are counted, reported by the view with ``record_failure()``.
+    Once the limit is reached, logins for the username are refused without
+    hashing the password until the oldest failure leaves the window.
+    """
+    scope = 'token_username'
+
+    def get_cache_key(self, request, view):
+        username = request.data.get(get_user_model().USERNAME_FIELD)
+        if not isinstance(username, str) or not username:
+            return None
+        # Usernames may contain characters cache backends do not accept in keys.
+        ident = hashlib.sha256(username.casefold().encode()).hexdigest()
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+    def throttle_success(self):
+        return True
+
+    def record_failure(self, request, view):
+        if self.rate is None:
+            return
+        key = self.get_cache_key(request, view)
+        if key is None:
+            return
+        now = self.timer()
+        history = [moment for moment in self.cache.get(key, []) if moment > now - self.duration]
+        self.cache.set(key, [now, *history], self.duration)
@@ -0,0 +1,85 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+from .authentication import is_token_revoked, set_issued_at_ms
+from .models import BlacklistedRefreshToken
+from .permissions import get_user_roles
+
+
+def get_user_claims(user):
+    claims = {
+        'username': user.get_username(),
+        'is_staff': user.is_staff,
+        'is_superuser': user.is_superuser,
+    }
+    claim = settings.STORE_ROLES['TOKEN_CLAIM']
+    if claim:
+        claims[claim] = get_user_roles(user.pk)
+    return claims
+
+
+class StoreRefreshToken(RefreshToken):
+    """
+    Refresh token that signs the user's name, admin flags and roles into itself
+    and into every access token derived from it, so neither permission checks
+    nor stateless authentication need to query the user.
+
+    Refresh tokens are rejected once they are revoked or blacklisted, which
+    happens when they are rotated.
+    """
+
+    # Set on tokens issued by for_user(), whose claims were just read from the user.
+    has_current_claims = False
+
+    def verify(self):
+        super().verify()
+        if is_token_revoked(self):
+            raise TokenError(_('Token has been revoked'))
+        # Replicas may not have seen a token that was rotated a moment ago.
+        blacklist = BlacklistedRefreshToken.objects.using(DEFAULT_DB_ALIAS)
+        if blacklist.filter(jti=self[api_settings.JTI_CLAIM]).exists():
+            raise TokenError(_('Token is blacklisted'))
+
+    def blacklist(self):
+        """
+        Blacklists the token until it expires. Fails if it already is, so of two
+        concurrent rotations of the same token only one succeeds.
+        """
+        try:
+            with transaction.atomic(using=DEFAULT_DB_ALIAS):
+                return BlacklistedRefreshToken.objects.using(DEFAULT_DB_ALIAS).create(
+                    jti=self[api_settings.JTI_CLAIM], expires_at=datetime_from_epoch(self['exp'])
+                )
+        except IntegrityError:
+            raise TokenError(_('Token is blacklisted'))
+
+    def set_iat(self, claim='iat', at_time=None):
+        super().set_iat(claim, at_time)
+        set_issued_at_ms(self, at_time)
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        for claim, value in get_user_claims(user).items():
+            token[claim] = value
+        token.has_current_claims = True
+        return token
+
+    @property
+    def access_token(self):
+        access = super().access_token
+        set_issued_at_ms(access)
+        if self.has_current_claims:
+            return access
+        user_id = self.payload.get(api_settings.USER_ID_CLAIM)
+        # Re-resolve on refresh so user changes reach the next access token.
+        user = get_user_model().objects.filter(**{api_settings.USER_ID_FIELD: user_id}).first()
+        if user is not None:
+            for claim, value in get_user_claims(user).items():
+                access[claim] = value
+        return access
@@ -1,16 +1,38 @@
-from django.contrib import admin
+from django.apps import apps
 from django.urls import path
-from store_api import views
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
-from drf_spectacular.views import SpectacularAPIView, SpectacularRedocView, SpectacularSwaggerView
+from store_api import async_views, metrics, views
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
     path('stores/', views.StoreListCreateAPIView.as_view()),
+    path('stores/changes', views.StoreChangeListAPIView.as_view()),
+    path('stores/bulk', views.StoreBulkAPIView.as_view()),
+    path('stores/lookup', views.StoreLookupAPIView.as_view()),
+    path('stores/export', views.StoreExportAPIView.as_view()),
+    path('stores/stream', views.StoreStreamAPIView.as_view()),
     path('stores/<int:pk>', views.StoreRetrieveUpdateDestroyAPIView.as_view()),
-    path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
-    path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
-    path('schema/', SpectacularAPIView.as_view(), name='schema'),
-    path('schema/swagger-ui/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
-    path('schema/redoc/', SpectacularRedocView.as_view(url_name='schema'), name='redoc'),
+    path('async/stores/', async_views.AsyncStoreListView.as_view()),
+    path('async/stores/<int:pk>', async_views.AsyncStoreDetailView.as_view()),
+    path('jobs/', views.JobListCreateAPIView.as_view()),
+    path('jobs/<int:pk>', views.JobRetrieveAPIView.as_view()),
+    path('jobs/<int:pk>/download', views.JobDownloadAPIView.as_view()),
+    path('metrics', metrics.metrics_view),
+    path('api/token/', views.StoreTokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('api/token/refresh/', views.StoreTokenRefreshView.as_view(), name='token_refresh'),
 ]
+
+# The admin and the schema docs are only imported when their apps are installed,
+# see STORE_APP_PROFILE in store_api/settings.py.
+if apps.is_installed('django.contrib.admin'):
+    from django.contrib import admin
+
+    urlpatterns.append(path('admin/', admin.site.urls))
+
+if apps.is_installed('drf_spectacular'):
+    from drf_spectacular.views import SpectacularRedocView, SpectacularSwaggerView
+    from store_api.schema import StoreSchemaView
+
+    urlpatterns += [
+        path('schema/', StoreSchemaView.as_view(), name='schema'),
+        path('schema/swagger-ui/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
+        path('schema/redoc/', SpectacularRedocView.as_view(url_name='schema'), name='redoc'),
+    ]
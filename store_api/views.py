@@ -1,36 +1,189 @@
+from django.http import FileResponse
 from rest_framework.pagination import PageNumberPagination
-from rest_framework import generics
-from rest_framework.filters import SearchFilter
-from rest_framework.permissions import IsAuthenticated, IsAdminUser
-from .models import Store
-from .serializers import StoreSerializer
+from rest_framework import generics, status
+from drf_spectacular.utils import OpenApiParameter, extend_schema, extend_schema_view
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import AuthenticationFailed, NotFound
+from rest_framework.response import Response
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from .bulk import apply_bulk
+from .cache import StoreCacheMixin
+from .changes import changes_response_data
+from .conditional import StoreConditionalMixin
+from .export import CSVRenderer, NDJSONRenderer, export_response
+from .fuzzy import StoreFuzzyFilter
+from .geo import StoreGeoFilter
+from .jobs import EXPORT_RENDERERS, export_file, submit_job
+from .models import Job, Store
+from .multiget import IDS_PARAMETER, StoreMultiGetMixin, get_stores
+from .opening_hours import OpeningHoursFilter
+from .pagination import StoreCursorPagination
+from .permissions import IsManager, IsManagerOrAdmin
+from .search import StoreSearchFilter
+from .serializers import (
+    JobSerializer, JobSubmitSerializer, StoreBulkResultSerializer, StoreBulkSerializer, StoreChangeFeedSerializer, StoreLookupResultSerializer,
+    StoreLookupSerializer, StoreSerializer,
+)
+from .sparse import FIELDS_PARAMETER, StoreSparseFieldsMixin, get_requested_fields
+from .throttling import TokenRateThrottle, TokenUsernameRateThrottle
 
-class StoreListCreateAPIView(generics.ListCreateAPIView):
+@extend_schema_view(get=extend_schema(parameters=[FIELDS_PARAMETER, IDS_PARAMETER]))
+class StoreListCreateAPIView(StoreConditionalMixin, StoreCacheMixin, StoreMultiGetMixin, StoreSparseFieldsMixin,
+                             generics.ListCreateAPIView):
+    """
+    Lists stores page by page, or the stores given with ?ids=, or creates a
+    store. Creating requires the manager role.
+    """
     queryset = Store.objects.all().order_by('id')
     serializer_class = StoreSerializer
     pagination_class = PageNumberPagination
-    filter_backends = [SearchFilter]
+    filter_backends = [StoreSearchFilter, OpeningHoursFilter, StoreGeoFilter, StoreFuzzyFilter]
     search_fields = ['name', 'address', 'opening_hours']
+    permission_classes = [IsManagerOrAdmin]
 
-    def get_permissions(self):
-        self.permission_classes = [IsAuthenticated]
-        if self.request.method == 'POST':
-          if self.request.user.groups.filter(name='manager').exists():
-            self.permission_classes = [IsAuthenticated]
-          else:
-            self.permission_classes = [IsAdminUser]
-        return super().get_permissions()
+@extend_schema_view(get=extend_schema(parameters=[FIELDS_PARAMETER]))
+class StoreStreamAPIView(StoreSparseFieldsMixin, generics.ListAPIView):
+    """
+    Lists stores ordered by id with cursor links instead of page numbers.
+    """
+    queryset = Store.objects.all().order_by('id')
+    serializer_class = StoreSerializer
+    pagination_class = StoreCursorPagination
+    permission_classes = [IsAuthenticated]
+    filter_backends = [StoreSearchFilter, OpeningHoursFilter]
+    search_fields = ['name', 'address', 'opening_hours']
 
-class StoreRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
+@extend_schema_view(get=extend_schema(parameters=[FIELDS_PARAMETER]))
+class StoreRetrieveUpdateDestroyAPIView(StoreConditionalMixin, StoreCacheMixin, StoreSparseFieldsMixin,
+                                        generics.RetrieveUpdateDestroyAPIView):
+    """
+    Retrieves, updates or deletes a store. Changes require the manager role.
+    """
     queryset = Store.objects.all()
     serializer_class = StoreSerializer
+    permission_classes = [IsManagerOrAdmin]
+
+class StoreBulkAPIView(generics.GenericAPIView):
+    """
+    Creates, upserts and deletes many stores in one transaction and reports the
+    result of every item. Requires the manager role.
+    """
+    serializer_class = StoreBulkSerializer
+    permission_classes = [IsManagerOrAdmin]
+
+    @extend_schema(responses=StoreBulkResultSerializer)
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(apply_bulk(**serializer.validated_data))
+
+@extend_schema_view(post=extend_schema(parameters=[FIELDS_PARAMETER]))
+class StoreLookupAPIView(generics.GenericAPIView):
+    """
+    Fetches the stores with the ids in the body, for lists too long for
+    GET /stores/?ids=. Returns one result per id, in the order of the ids.
+    """
+    queryset = Store.objects.all()
+    serializer_class = StoreLookupSerializer
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(responses=StoreLookupResultSerializer)
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(get_stores(self.get_queryset(), serializer.validated_data['ids'], get_requested_fields(request)))
+
+class StoreExportAPIView(generics.GenericAPIView):
+    """
+    Streams all stores as NDJSON (the default) or CSV, selected with the Accept
+    header or ?format=ndjson|csv. Sends gzip if the client accepts it.
+    """
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [NDJSONRenderer, CSVRenderer]
+
+    @extend_schema(responses={(200, 'application/x-ndjson'): str, (200, 'text/csv'): str})
+    def get(self, request, *args, **kwargs):
+        return export_response(request, request.accepted_renderer)
+
+class StoreChangeListAPIView(generics.GenericAPIView):
+    """
+    Lists the store changes after ?since=<seq>, oldest first, including
+    deletions. Mirrors of the catalogue poll it with the last_seq they have seen.
+    """
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter('since', int, description='Sequence number of the last change already seen (default 0).'),
+            OpenApiParameter('limit', int, description='Number of changes to return.'),
+        ],
+        responses=StoreChangeFeedSerializer,
+    )
+    def get(self, request, *args, **kwargs):
+        return Response(changes_response_data(request))
+
+class JobListCreateAPIView(generics.ListCreateAPIView):
+    """
+    Lists the background jobs, newest first, or queues a job for runworker.
+    Requires the manager role.
+    """
+    queryset = Job.objects.order_by('-id')
+    serializer_class = JobSerializer
+    permission_classes = [IsManager]
+
+    @extend_schema(request=JobSubmitSerializer, responses={202: JobSerializer})
+    def post(self, request, *args, **kwargs):
+        serializer = JobSubmitSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        job = submit_job(serializer.validated_data['kind'], serializer.validated_data['params'], request.user)
+        return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED, headers={'Location': f'/jobs/{job.pk}'})
+
+class JobRetrieveAPIView(generics.RetrieveAPIView):
+    """
+    Returns the status, progress and result of a background job. Requires the
+    manager role.
+    """
+    queryset = Job.objects.all()
+    serializer_class = JobSerializer
+    permission_classes = [IsManager]
+
+class JobDownloadAPIView(generics.GenericAPIView):
+    """
+    Sends the file written by a succeeded export_stores job. Answers 404 while
+    the job has not finished. Requires the manager role.
+    """
+    queryset = Job.objects.filter(kind='export_stores', status=Job.SUCCEEDED)
+    permission_classes = [IsManager]
+
+    @extend_schema(responses={(200, 'application/x-ndjson'): str, (200, 'text/csv'): str})
+    def get(self, request, *args, **kwargs):
+        job = self.get_object()
+        path = export_file(job)
+        try:
+            file = open(path, 'rb')
+        except FileNotFoundError:
+            raise NotFound('The export file no longer exists.')
+        renderer = EXPORT_RENDERERS[job.params['format']]
+        return FileResponse(file, as_attachment=True, filename=path.name,
+                            content_type=f'{renderer.media_type}; charset={renderer.charset}')
+
+class StoreTokenObtainPairView(TokenObtainPairView):
+    """
+    Issues a token pair for a username and password. Throttled per client
+    address and, for failed logins, per username.
+    """
+    throttle_classes = [TokenRateThrottle, TokenUsernameRateThrottle]
+
+    def post(self, request, *args, **kwargs):
+        try:
+            return super().post(request, *args, **kwargs)
+        except AuthenticationFailed:
+            TokenUsernameRateThrottle().record_failure(request, self)
+            raise
 
-    def get_permissions(self):
-        if self.request.method == 'GET':
-          self.permission_classes = [IsAuthenticated]
-        else:
-          if self.request.user.groups.filter(name='manager').exists():
-            self.permission_classes = [IsAuthenticated]
-          else:
-            self.permission_classes = [IsAdminUser]
-        return super().get_permissions()
+class StoreTokenRefreshView(TokenRefreshView):
+    """
+    Issues a new access token, and a new refresh token, for a refresh token.
+    Throttled per client address.
+    """
+    throttle_classes = [TokenRateThrottle]